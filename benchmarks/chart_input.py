@@ -0,0 +1,87 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Encode time and payload size of the dataframe sent by ChartImpl.generate_chart for a large dataframe: the previous
+# encoding (records validated by the request model) vs the chart input pipeline. Run from the repository root:
+#
+#     python -m benchmarks.chart_input [n_rows]
+
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from waii_sdk_py.chart import ChartGenerationRequest, ChartInputOptions, ChartDownsampling, prepare_chart_input
+from waii_sdk_py.database import ColumnDefinition
+
+
+def dataframe(n_rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "day": pd.date_range("2020-01-01", periods=n_rows, freq="min"),
+        "region": rng.choice(["north", "south", "east", "west"], size=n_rows),
+        "orders": rng.integers(0, 100, size=n_rows),
+        "revenue": rng.normal(1000, 250, size=n_rows).round(2),
+    })
+
+
+def previous_encoding(df):
+    cols = [ColumnDefinition(name=c, type=df[c][0].__class__.__name__) for c in df.columns]
+    # the previous code sent pandas Timestamps, which are not json serializable: convert them up front
+    rows = df.assign(day=df["day"].astype(str)).to_dict(orient="records")
+    params = ChartGenerationRequest(dataframe_cols=cols, dataframe_rows=rows, ask="revenue per day")
+    params.check_extra_fields()
+    return json.dumps({k: v for k, v in params.dict().items() if v is not None}, default=vars)
+
+
+def pipeline_encoding(df, options):
+    chart_input = prepare_chart_input(df, options)
+    payload = {"dataframe_columns": chart_input.columns} if chart_input.columns is not None \
+        else {"dataframe_rows": chart_input.rows}
+    return json.dumps(payload)
+
+
+def timed(func):
+    start = time.perf_counter()
+    body = func()
+    return time.perf_counter() - start, len(body.encode("utf-8"))
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    df = dataframe(n_rows)
+    cases = [
+        ("previous: records + request validation", lambda: previous_encoding(df)),
+        ("records", lambda: pipeline_encoding(df, ChartInputOptions())),
+        ("columnar", lambda: pipeline_encoding(df, ChartInputOptions(columnar=True))),
+        ("reservoir 5000 rows, columnar", lambda: pipeline_encoding(df, ChartInputOptions(
+            downsampling=ChartDownsampling.reservoir, max_rows=5000, columnar=True))),
+        ("lttb 5000 rows, columnar", lambda: pipeline_encoding(df, ChartInputOptions(
+            downsampling=ChartDownsampling.lttb, max_rows=5000, x_column="day", y_column="revenue", columnar=True))),
+        ("group_by region, columnar", lambda: pipeline_encoding(df, ChartInputOptions(
+            downsampling=ChartDownsampling.group_by, group_by=["region"], columnar=True))),
+        ("1 MB budget, records", lambda: pipeline_encoding(df, ChartInputOptions(max_bytes=1_000_000))),
+    ]
+    print(f"{n_rows} rows:")
+    for name, func in cases:
+        seconds, size = timed(func)
+        print(f"  {name:40s} {seconds * 1000:9.1f} ms {size / 1_000_000:9.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Parse time of ChatResponse with large response_data payloads: shape-based dispatch of response_data vs validating
+# the Union[ChatResponseData, ChatResponseDataV2] field. Run from the repository root:
+#
+#     python -m benchmarks.chat_response_parse [n_rows]
+
+import sys
+import time
+
+from waii_sdk_py.chat import ChatResponse
+from waii_sdk_py.my_pydantic import BaseModel
+
+
+class UnionChatResponse(ChatResponse):
+    # ChatResponse without the shape-based dispatch, response_data is validated against the union
+    def __init__(self, **data):
+        BaseModel.__init__(self, **data)
+
+
+
+def _columns():
+    return [{"name": f"col_{i}", "type": "VARCHAR"} for i in range(8)]
+
+
+def _rows(n_rows):
+    return [{f"col_{i}": f"value {r} {i}" for i in range(8)} for r in range(n_rows)]
+
+
+def v1_payload(n_rows):
+    return {
+        "chat_uuid": "chat",
+        "response": "done",
+        "response_data": {
+            "data": {"rows": _rows(n_rows), "column_definitions": _columns(), "query_uuid": "q"},
+            "query": {"uuid": "q", "query": "SELECT * FROM t"},
+        },
+    }
+
+
+def v2_payload(n_rows, n_modules=4):
+    return {
+        "chat_uuid": "chat",
+        "response": "done",
+        "response_data": {
+            "data": {f"d{m}": {"rows": _rows(n_rows // n_modules), "column_definitions": _columns()}
+                     for m in range(n_modules)},
+            "query": {f"q{m}": {"uuid": f"q{m}", "query": "SELECT * FROM t"} for m in range(n_modules)},
+        },
+    }
+
+
+def timed(cls, payload, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = cls(**payload)
+        best = min(best, time.perf_counter() - start)
+    return best, type(result.response_data).__name__
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for name, payload in (("v1", v1_payload(n_rows)), ("v2", v2_payload(n_rows))):
+        union_time, union_type = timed(UnionChatResponse, payload)
+        dispatch_time, dispatch_type = timed(ChatResponse, payload)
+        print(f"{name} payload, {n_rows} rows:")
+        print(f"  union validation: {union_time * 1000:8.1f} ms -> {union_type}")
+        print(f"  shape dispatch:   {dispatch_time * 1000:8.1f} ms -> {dispatch_type}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Construction time of GetHistoryResponse for a page of history entries, eager (pydantic models) vs lazy entries,
+# and the time to list the entries (type, timestamp, uuid). Run from the repository root:
+#
+#     python -m benchmarks.history_parse [n_entries]
+
+import sys
+import time
+
+from waii_sdk_py.history import GetHistoryResponse
+
+
+def _query_entry(i):
+    return {
+        "history_type": "query",
+        "timestamp_ms": i,
+        "request": {"ask": f"how many orders in month {i}?", "tweak_history": []},
+        "query": {
+            "uuid": f"q{i}",
+            "query": f"SELECT COUNT(*) FROM orders WHERE month = {i}",
+            "tables": [{"database_name": "db", "schema_name": "s", "table_name": "orders"}],
+            "detailed_steps": ["step 1", "step 2", "step 3"],
+            "semantic_context": [{"statement": "orders are sales", "labels": ["sales"], "scope": "db.s"}],
+        },
+    }
+
+
+def _chat_entry(i):
+    return {
+        "history_type": "chat",
+        "timestamp_ms": i,
+        "request": {"ask": f"plot sales of month {i}"},
+        "response": {
+            "chat_uuid": f"c{i}",
+            "response": "here is the chart",
+            "response_data": {
+                "query": {f"q{i}": {"uuid": f"q{i}", "query": "SELECT 1"}},
+                "data": {f"d{i}": {"rows": [{"a": r} for r in range(20)], "column_definitions": [{"name": "a", "type": "INT"}]}},
+            },
+            "status_update_events": [{"title": "done", "timestamp": i, "step_status": "completed"}],
+        },
+    }
+
+
+def page(n_entries):
+    return {"history": [_query_entry(i) if i % 2 else _chat_entry(i) for i in range(n_entries)]}
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    n_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    objs = page(n_entries)
+
+    def list_entries(lazy):
+        response = GetHistoryResponse(objs, lazy=lazy)
+        return [(e.history_type, e.timestamp_ms) for e in response.history]
+
+    eager = timed(lambda: list_entries(False))
+    lazy = timed(lambda: list_entries(True))
+    lazy_full = timed(lambda: [e.entry for e in GetHistoryResponse(objs, lazy=True).history])
+    print(f"{n_entries} entries:")
+    print(f"  eager construction + listing:    {eager * 1000:8.1f} ms")
+    print(f"  lazy construction + listing:     {lazy * 1000:8.1f} ms")
+    print(f"  lazy, materializing every entry: {lazy_full * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Decoding time of a get-knowledge-graph response, pydantic validation (GetKnowledgeGraphResponse(**json)) vs
+# decode_knowledge_graph. Run from the repository root:
+#
+#     python -m benchmarks.kg_decode [n_nodes]
+
+import sys
+import time
+
+from waii_sdk_py.kg import GetKnowledgeGraphResponse
+from waii_sdk_py.kg.kg_decoder import decode_knowledge_graph
+
+COLUMNS_PER_TABLE = 20
+TABLES_PER_SCHEMA = 50
+
+
+def _table(t):
+    name = {"database_name": "db", "schema_name": f"s{t // TABLES_PER_SCHEMA}", "table_name": f"t{t}"}
+    return {
+        "entity_type": "table",
+        "name": name,
+        "columns": [{"entity_type": "column", "name": f"c{c}", "type": "int", "description": f"column {c}"}
+                    for c in range(COLUMNS_PER_TABLE)],
+        "constraints": [{"entity_type": "constraint", "source": "database", "constraint_type": "foreign",
+                         "table": name, "cols": ["c0"],
+                         "src_table": {**name, "table_name": f"t{max(t - 1, 0)}"}, "src_cols": ["c1"]}],
+        "description": f"table {t}",
+    }
+
+
+def graph(n_nodes):
+    nodes, edges = [], []
+    n_tables = max(n_nodes // (COLUMNS_PER_TABLE + 2), 1)
+    tables = [_table(t) for t in range(n_tables)]
+    for s in range((n_tables + TABLES_PER_SCHEMA - 1) // TABLES_PER_SCHEMA):
+        nodes.append({"id": f"s{s}", "display_name": f"s{s}", "entity_type": "schema",
+                      "entity": {"entity_type": "schema", "name": {"database_name": "db", "schema_name": f"s{s}"}}})
+    for t, table in enumerate(tables):
+        schema_id = f"s{t // TABLES_PER_SCHEMA}"
+        nodes.append({"id": f"t{t}", "display_name": f"t{t}", "entity_type": "table", "entity": table,
+                      "parent_entity": nodes[t // TABLES_PER_SCHEMA]["entity"]})
+        edges.append({"edge_type": "schema_to_table", "source_id": schema_id, "target_id": f"t{t}", "directed": True})
+        for column in table["columns"]:
+            column_id = f"t{t}.{column['name']}"
+            nodes.append({"id": column_id, "display_name": column["name"], "entity_type": "column",
+                          "entity": column, "parent_entity": table})
+            edges.append({"edge_type": "table_to_column", "source_id": f"t{t}", "target_id": column_id,
+                          "directed": True})
+        if t:
+            edges.append({"edge_type": "constraint", "source_id": f"t{t - 1}", "target_id": f"t{t}", "directed": True,
+                          "edge_entity": table["constraints"][0]})
+        statement = {"entity_type": "semantic_statement", "id": f"st{t}", "statement": f"t{t} holds sales",
+                     "labels": ["sales"], "scope": f"db.s{t // TABLES_PER_SCHEMA}.t{t}"}
+        nodes.append({"id": f"st{t}", "display_name": f"st{t}", "entity_type": "semantic_statement",
+                      "entity": statement})
+        edges.append({"edge_type": "semantic_statement_reference", "source_id": f"st{t}", "target_id": f"t{t}",
+                      "directed": True, "edge_entity": statement})
+    return {"graph": {"nodes": nodes, "edges": edges}}
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    response = graph(n_nodes)
+    n_nodes, n_edges = len(response["graph"]["nodes"]), len(response["graph"]["edges"])
+
+    validated_time, validated = timed(lambda: GetKnowledgeGraphResponse(**response))
+    decoded_time, decoded = timed(lambda: decode_knowledge_graph(response["graph"]))
+    distinct_tables = lambda g: len({id(n.parent_entity) for n in g.nodes if n.entity_type == "column"})
+    print(f"{n_nodes} nodes, {n_edges} edges:")
+    print(f"  pydantic validation:    {validated_time * 1000:8.1f} ms")
+    print(f"  decode_knowledge_graph: {decoded_time * 1000:8.1f} ms")
+    print(f"  TableDefinition objects for column parents: {distinct_tables(validated.graph)} -> "
+          f"{distinct_tables(decoded)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+import pytest
+
+from waii_sdk_py.access_rules import (
+    AccessRuleImpl,
+    TableAccessRuleIndex,
+    TableAccessRule,
+    TableAccessRuleType,
+    UpdateTableAccessRuleRequest,
+    RemoveTableAccessRuleRequest,
+)
+from waii_sdk_py.database import TableName
+from waii_sdk_py.query import QueryImpl, ApplyTableAccessRulesRequest, AccessRuleProtectionState
+from waii_sdk_py.user import User
+
+
+def rule(rule_id, table, schema=None, database=None, **kwargs):
+    return {"id": rule_id, "name": rule_id, "type": "filter", "expression": "region = 'us'",
+            "table": {"table_name": table, "schema_name": schema, "database_name": database}, **kwargs}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestTableAccessRuleIndex(unittest.TestCase):
+    def setUp(self):
+        self.rules = {r["id"]: r for r in [
+            rule("orders", "ORDERS", "SALES", "PROD"),
+            rule("bob", "customers", user_id="bob"),
+            rule("acme", "payments", "finance", org_id="acme"),
+        ]}
+        self.server.route("list-table-access-rules", lambda body, headers: {"rules": list(self.rules.values())})
+        self.server.route("update-table-access-rules", self.update_rules)
+        self.server.route("remove-table-access-rules", self.remove_rules)
+        self.server.route("apply-table-access-rules", lambda body, headers: {
+            "query": body["query"] + " WHERE region = 'us'", "status": {"state": "protected"}})
+
+        self.http_client = self.server.client(user_id="alice")
+        self.now = 0.0
+        self.index = TableAccessRuleIndex(AccessRuleImpl(self.http_client), ttl_seconds=60, clock=lambda: self.now)
+
+    def update_rules(self, body, headers):
+        self.rules.update({r["id"]: r for r in body["rules"]})
+        return {}
+
+    def remove_rules(self, body, headers):
+        for rule_id in body["rules"]:
+            self.rules.pop(rule_id, None)
+        return {}
+
+    def matched(self, query, user=None):
+        return sorted(r.id for r in self.index.rules_for_query(query, user))
+
+    def test_rules_for_query(self):
+        self.assertEqual(self.matched("select * from prod.sales.orders"), ["orders"])
+        self.assertEqual(self.matched('select o.id from "SALES"."ORDERS" o'), ["orders"])
+        # unqualified: may be the table of the rule
+        self.assertEqual(self.matched("select orders.id from orders"), ["orders"])
+        self.assertEqual(self.matched("select * from dev.sales.orders join other.orders using (id)"), [])
+        self.assertEqual(self.matched("select * from lineitems"), [])
+        # rule of another user, rule of an org (unknown for the current user)
+        self.assertEqual(self.matched("select * from customers"), [])
+        self.assertEqual(self.matched("select * from customers", User(id="bob")), ["bob"])
+        self.assertEqual(self.matched("select * from finance.payments"), ["acme"])
+        self.assertEqual(self.matched("select * from finance.payments", User(id="carol", org_id="other")), [])
+        # rules are loaded once
+        self.assertEqual(self.server.endpoints(), ["list-table-access-rules"])
+
+    def test_rules_for_tables(self):
+        tables = [TableName(table_name="orders", schema_name="sales"), TableName(table_name="sales")]
+        self.assertEqual([r.id for r in self.index.rules_for_tables(tables)], ["orders"])
+        self.assertEqual(self.index.rules_for_tables([TableName(table_name="orders", schema_name="hr")]), [])
+
+    def test_apply_skips_server_call(self):
+        query_impl = QueryImpl(self.http_client)
+        response = self.index.apply_table_access_rules(query_impl,
+                                                       ApplyTableAccessRulesRequest(query="select * from items"))
+        self.assertEqual(response.query, "select * from items")
+        self.assertEqual(response.status.state, AccessRuleProtectionState.not_checked)
+        self.assertNotIn("apply-table-access-rules", self.server.endpoints())
+
+        response = self.index.apply_table_access_rules(query_impl,
+                                                       ApplyTableAccessRulesRequest(query="select * from orders"))
+        self.assertEqual(response.query, "select * from orders WHERE region = 'us'")
+        self.assertEqual(response.status.state, AccessRuleProtectionState.protected)
+        self.assertEqual(self.server.endpoints()[-1], "apply-table-access-rules")
+
+    def test_ttl_and_invalidation(self):
+        self.assertEqual(self.matched("select * from items"), [])
+        self.index.update_table_access_rules(UpdateTableAccessRuleRequest(rules=[TableAccessRule(
+            id="items", name="items", table=TableName(table_name="items"), type=TableAccessRuleType.block)]))
+        self.assertEqual(self.matched("select * from items"), ["items"])
+
+        self.index.remove_table_access_rules(RemoveTableAccessRuleRequest(rules=["items"]))
+        self.assertEqual(self.matched("select * from items"), [])
+        self.assertEqual(self.server.endpoints().count("list-table-access-rules"), 3)
+
+        # changed by another client: seen after the TTL
+        self.rules["items"] = rule("items", "items")
+        self.now = 30
+        self.assertEqual(self.matched("select * from items"), [])
+        self.now = 61
+        self.assertEqual(self.matched("select * from items"), ["items"])
+
+        # another connection
+        self.rules.pop("items")
+        self.http_client.set_scope("other_scope")
+        self.assertEqual(self.matched("select * from items"), [])
+
@@ -0,0 +1,179 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from waii_sdk_py.chart import (
+    ChartImpl,
+    ChartType,
+    ChartTweak,
+    ChartGenerationResponse,
+    VegaliteChartSpec,
+    ChartInputOptions,
+    ChartSpecCache,
+    SqliteChartSpecStore,
+    dataframe_fingerprint,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def sales_df(n_rows=10000):
+    return pd.DataFrame({"day": pd.date_range("2024-01-01", periods=n_rows, freq="h"),
+                         "revenue": np.arange(n_rows, dtype=float),
+                         "region": [f"r{i % 5}" for i in range(n_rows)]})
+
+
+class TestDataframeFingerprint(unittest.TestCase):
+    def test_same_content_same_fingerprint(self):
+        self.assertEqual(dataframe_fingerprint(sales_df()), dataframe_fingerprint(sales_df()))
+        # the index is not part of the data sent to the server
+        self.assertEqual(dataframe_fingerprint(sales_df()),
+                         dataframe_fingerprint(sales_df().set_index(np.arange(10000) + 7)))
+
+    def test_changes(self):
+        df = sales_df()
+        fingerprint = dataframe_fingerprint(df)
+
+        changed = df.copy()
+        changed.loc[len(df) - 1, "revenue"] = -1.0
+        self.assertNotEqual(dataframe_fingerprint(changed), fingerprint)
+        self.assertNotEqual(dataframe_fingerprint(df.rename(columns={"revenue": "sales"})), fingerprint)
+        self.assertNotEqual(dataframe_fingerprint(df.astype({"revenue": "float32"})), fingerprint)
+        self.assertNotEqual(dataframe_fingerprint(df.iloc[:-1]), fingerprint)
+
+    def test_unhashable_and_empty(self):
+        df = pd.DataFrame({"tags": [["a", "b"], ["c"]], "meta": [{"k": 1}, {"k": 2}]})
+        self.assertEqual(dataframe_fingerprint(df), dataframe_fingerprint(df.copy()))
+        self.assertNotEqual(dataframe_fingerprint(df.iloc[:0]), dataframe_fingerprint(df))
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestChartSpecCache(unittest.TestCase):
+    def setUp(self):
+        # every generated chart is a new spec
+        self.server.route("generate-chart", lambda body, headers: {"uuid": f"chart-{self.n_calls}", "chart_spec": {
+            "spec_type": "vegalite", "chart": f'{{"mark": "bar", "n": {self.n_calls}}}'}})
+        self.http_client = self.server.client(scope="conn-1")
+        self.chart = ChartImpl(self.http_client)
+
+    @property
+    def n_calls(self):
+        return len(self.server.bodies("generate-chart"))
+
+    def test_generate_chart_uses_cache(self):
+        cache = ChartSpecCache()
+        df = sales_df()
+
+        first = self.chart.generate_chart(df, ask="revenue per day", chart_type=ChartType.VEGALITE, cache=cache)
+        second = self.chart.generate_chart(sales_df(), ask="revenue per day", chart_type=ChartType.VEGALITE,
+                                           cache=cache)
+
+        self.assertEqual(self.n_calls, 1)
+        self.assertEqual(second, first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # the cached spec can't be changed through a returned response
+        second.chart_spec.chart = "changed"
+        third = self.chart.generate_chart(df, ask="revenue per day", chart_type=ChartType.VEGALITE, cache=cache)
+        self.assertEqual(third.chart_spec.chart, first.chart_spec.chart)
+
+    def test_scopes_share_cache(self):
+        cache = ChartSpecCache()
+        df = sales_df(100)
+        other = self.server.client(scope="conn-2")
+
+        first = self.chart.generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE, cache=cache)
+        ChartImpl(other).generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE, cache=cache)
+        self.assertEqual(self.n_calls, 2)
+
+        # same for another user, or when impersonating one, in the same scope
+        other.set_scope("conn-1")
+        other.set_user_id("someone-else")
+        ChartImpl(other).generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE, cache=cache)
+        other.set_user_id("")
+        other.set_impersonate_user_id("someone-else")
+        ChartImpl(other).generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE, cache=cache)
+        self.assertEqual(self.n_calls, 4)
+
+        # and it's shared again with the same context
+        other.set_impersonate_user_id("")
+        self.assertEqual(ChartImpl(other).generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE,
+                                                         cache=cache), first)
+        self.assertEqual(self.n_calls, 4)
+
+    def test_key_parts(self):
+        cache = ChartSpecCache()
+        df = sales_df(100)
+        key = cache.key(df, ask="revenue", chart_type=ChartType.VEGALITE)
+
+        self.assertEqual(key, cache.key(df, ask="revenue", chart_type="vegalite"))
+        self.assertNotEqual(key, cache.key(df, ask="revenue per region", chart_type=ChartType.VEGALITE))
+        self.assertNotEqual(key, cache.key(df, ask="revenue", chart_type=ChartType.PLOTLY))
+        self.assertNotEqual(key, cache.key(df, ask="revenue", chart_type=ChartType.VEGALITE,
+                                           tweak_history=[ChartTweak(ask="make it red")]))
+        self.assertNotEqual(key, cache.key(df, ask="revenue", chart_type=ChartType.VEGALITE,
+                                           input_options=ChartInputOptions(max_rows=10)))
+        self.assertNotEqual(key, cache.key(df, ask="revenue", chart_type=ChartType.VEGALITE,
+                                           context=self.http_client.context_key()))
+
+    def test_lru_and_ttl(self):
+        clock = FakeClock()
+        cache = ChartSpecCache(max_entries=2, ttl_seconds=60, clock=clock)
+        for i in range(3):
+            cache.put(f"k{i}", ChartGenerationResponse(uuid=f"chart-{i}"))
+
+        self.assertIsNone(cache.get("k0"))
+        self.assertEqual(cache.get("k2").uuid, "chart-2")
+
+        clock.now += 61
+        self.assertIsNone(cache.get("k2"))
+        self.assertIsNone(cache.get("k1"))
+
+    def test_persistent_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "charts.db")
+            clock = FakeClock()
+            cache = ChartSpecCache(store=SqliteChartSpecStore(path), ttl_seconds=60, clock=clock)
+            df = sales_df()
+            first = self.chart.generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE, cache=cache)
+            cache.close()
+
+            # e.g. after a restart
+            cache = ChartSpecCache(store=SqliteChartSpecStore(path), ttl_seconds=60, clock=clock)
+            second = self.chart.generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE, cache=cache)
+            self.assertEqual(self.n_calls, 1)
+            self.assertEqual(second, first)
+            self.assertIsInstance(second.chart_spec, VegaliteChartSpec)
+
+            # the age of a spec loaded from the store counts from when it was generated
+            clock.now += 61
+            self.chart.generate_chart(df, ask="revenue", chart_type=ChartType.VEGALITE, cache=cache)
+            self.assertEqual(self.n_calls, 2)
+            cache.close()
+
@@ -0,0 +1,91 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import unittest
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from waii_sdk_py.chart import (
+    ChartImpl,
+    ChartInputOptions,
+    ChartDownsampling,
+    prepare_chart_input,
+)
+
+
+def series_df(n_rows):
+    x = np.arange(n_rows)
+    y = np.sin(x / 50.0)
+    y[n_rows // 3] = 10.0  # spike, must survive lttb
+    return pd.DataFrame({"x": x, "y": y, "label": [f"l{i % 7}" for i in x]})
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestChartInput(unittest.TestCase):
+    def test_default_sends_all_rows(self):
+        df = pd.DataFrame({"a": [1.0, None], "t": pd.to_datetime(["2024-01-02 03:04:05", None])})
+        chart_input = prepare_chart_input(df)
+        self.assertEqual(chart_input.rows, [{"a": 1.0, "t": "2024-01-02T03:04:05.000"}, {"a": None, "t": None}])
+        self.assertEqual(chart_input.n_rows, 2)
+        json.dumps(chart_input.rows, allow_nan=False)
+
+    def test_reservoir_keeps_order(self):
+        df = series_df(10000)
+        chart_input = prepare_chart_input(df, ChartInputOptions(
+            downsampling=ChartDownsampling.reservoir, max_rows=500, columnar=True))
+        self.assertEqual(chart_input.n_rows, 500)
+        self.assertEqual(chart_input.n_original_rows, 10000)
+        self.assertEqual(chart_input.columns["x"], sorted(chart_input.columns["x"]))
+
+    def test_lttb_keeps_shape(self):
+        df = series_df(10000).sample(frac=1.0, random_state=1)
+        chart_input = prepare_chart_input(df, ChartInputOptions(
+            downsampling=ChartDownsampling.lttb, max_rows=200, x_column="x", y_column="y", columnar=True))
+        xs = chart_input.columns["x"]
+        self.assertEqual(len(xs), 200)
+        self.assertEqual((xs[0], xs[-1]), (0, 9999))
+        self.assertIn(10.0, chart_input.columns["y"])
+
+    def test_group_by(self):
+        df = pd.DataFrame({"region": ["a", "b", "a"], "orders": [1, 2, 3], "name": ["x", "y", "z"]})
+        chart_input = prepare_chart_input(df, ChartInputOptions(
+            downsampling=ChartDownsampling.group_by, group_by=["region"]))
+        self.assertEqual(chart_input.rows, [{"region": "a", "orders": 4, "name": "x"},
+                                            {"region": "b", "orders": 2, "name": "y"}])
+
+    def test_byte_budget(self):
+        df = series_df(20000)
+        for columnar in (False, True):
+            chart_input = prepare_chart_input(df, ChartInputOptions(max_bytes=50000, columnar=columnar))
+            payload = chart_input.columns if columnar else chart_input.rows
+            self.assertLessEqual(len(json.dumps(payload).encode("utf-8")), 50000)
+            self.assertGreater(chart_input.n_rows, 100)
+
+        with self.assertRaises(ValueError):
+            prepare_chart_input(df, ChartInputOptions(max_bytes=5))
+
+    def test_generate_chart_columnar(self):
+        self.server.route("generate-chart", lambda body, headers: {"uuid": "chart"})
+        df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        ChartImpl(self.server.client()).generate_chart(df, ask="plot", input_options=ChartInputOptions(columnar=True))
+
+        [params] = self.server.bodies("generate-chart")
+        self.assertEqual(params["dataframe_columns"], {"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        self.assertNotIn("dataframe_rows", params)
+        self.assertEqual(params["ask"], "plot")
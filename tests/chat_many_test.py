@@ -0,0 +1,197 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import gc
+import threading
+import time
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+import pytest
+
+from waii_sdk_py.chat import ChatImpl, AsyncChatImpl, ChatRequest, ChatResponseStep
+from waii_sdk_py.chat.chat import _tenant_key, SUBMIT_CHAT_MESSAGE_ENDPOINT, GET_CHAT_RESPONSE_ENDPOINT
+from waii_sdk_py.utils import ConcurrencyBudget, OperationPoller
+from waii_sdk_py.waii_http_client import WaiiHttpClient
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+    assert condition()
+
+
+class FakeChats:
+    """
+    Chats served by `server`, each chat completes after `polls` get_chat_response calls, asks starting with "fail"
+    fail on submit
+    """
+
+    def __init__(self, server, polls=2):
+        self.polls = polls
+        self.submitted = []
+        self.calls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server.route(SUBMIT_CHAT_MESSAGE_ENDPOINT, self.submit_chat_message)
+        server.route(GET_CHAT_RESPONSE_ENDPOINT, self.get_chat_response)
+
+    def submit_chat_message(self, body, headers):
+        if body["ask"].startswith("fail"):
+            raise Exception("cannot submit")
+        with self.lock:
+            self.submitted.append(body["ask"])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return {"uuid": body["ask"]}
+
+    def get_chat_response(self, body, headers):
+        uuid = body["uuid"]
+        with self.lock:
+            self.calls[uuid] = self.calls.get(uuid, 0) + 1
+            done = self.calls[uuid] >= self.polls
+            if done:
+                self.in_flight -= 1
+        step = ChatResponseStep.completed if done else ChatResponseStep.generating_query
+        return {"chat_uuid": uuid, "response": f"answer to {uuid}", "current_step": step.value}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestChatMany(unittest.TestCase):
+    def setUp(self):
+        self.impl = ChatImpl(self.server.client())
+        self.backend = FakeChats(self.server)
+
+    def test_all_results_within_budget(self):
+        budget = ConcurrencyBudget.shared("test_all_results", 3)
+        requests = [ChatRequest(ask=f"ask {i}") for i in range(10)] + [ChatRequest(ask="fail 10")]
+        results = list(self.impl.chat_many(requests, max_concurrent=3, poll_interval=0.001,
+                                           budget_key="test_all_results"))
+
+        self.assertEqual(sorted(r.index for r in results), list(range(11)))
+        by_index = {r.index: r for r in results}
+        self.assertEqual(by_index[4].response.response, "answer to ask 4")
+        self.assertEqual(by_index[10].error, "cannot submit")
+        self.assertLessEqual(self.backend.max_in_flight, 3)
+        self.assertEqual(budget.in_flight, 0)
+
+    def test_close_cancels_rest_of_batch(self):
+        budget = ConcurrencyBudget.shared("test_close", 2)
+        requests = [ChatRequest(ask=f"ask {i}") for i in range(10)]
+        results = self.impl.chat_many(requests, max_concurrent=2, poll_interval=0.001, budget_key="test_close")
+        next(results)
+        results.close()
+
+        self.assertLessEqual(len(self.backend.submitted), 4)
+        # the chats still running on the server finish in the background
+        wait_until(lambda: budget.in_flight == 0)
+
+    def test_cancel_wakes_blocked_submitter(self):
+        budget = ConcurrencyBudget.shared("test_wake", 1)
+        budget.acquire()
+        try:
+            batch = self.impl._chat_many_batch(1, "test_wake", 0.001, 0.001)
+            runner = threading.Thread(target=lambda: list(self.impl._run_chat_many(
+                batch, [ChatRequest(ask="ask 0")], 0.001, 0.001, None)))
+            runner.start()
+            time.sleep(0.05)
+            self.assertTrue(runner.is_alive())
+
+            batch.cancel()
+            runner.join(timeout=1)
+            self.assertFalse(runner.is_alive())
+            self.assertEqual(self.backend.submitted, [])
+        finally:
+            budget.release()
+        self.assertEqual(budget.in_flight, 0)
+
+    def test_poller_yields_in_completion_order(self):
+        poller = OperationPoller(is_done=lambda status: True, poll_interval=0.001)
+        poller.add("slow", lambda: time.sleep(0.2) or "slow")
+        poller.add("fast", lambda: "fast")
+        self.assertEqual([key for key, _ in poller.poll()], ["fast", "slow"])
+
+    def test_shared_tenant_budget(self):
+        budget = ConcurrencyBudget.shared("test_shared", 2)
+        budget.acquire()
+        try:
+            results = list(self.impl.chat_many([ChatRequest(ask=f"ask {i}") for i in range(4)], max_concurrent=2,
+                                               poll_interval=0.001, budget_key="test_shared"))
+        finally:
+            budget.release()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(self.backend.max_in_flight, 1)
+
+    def test_shared_budgets_are_evicted(self):
+        http_client = WaiiHttpClient("http://localhost:9859/api/", "secret-api-key")
+        key = _tenant_key(http_client)
+        self.assertNotIn("secret-api-key", repr(key))
+
+        budget = ConcurrencyBudget.shared(key, 2)
+        self.assertIs(ConcurrencyBudget.shared(key, 2), budget)
+        del budget
+        gc.collect()
+        self.assertNotIn(key, ConcurrencyBudget._shared)
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestAsyncChatMany(IsolatedAsyncioTestCase):
+    async def test_async_chat_many(self):
+        impl = AsyncChatImpl(self.server.client())
+        FakeChats(self.server)
+
+        results = [r async for r in impl.chat_many([ChatRequest(ask=f"ask {i}") for i in range(5)],
+                                                   poll_interval=0.001, budget_key="test_async")]
+        self.assertEqual(sorted(r.index for r in results), list(range(5)))
+
+    async def test_cancel_releases_budget(self):
+        impl = AsyncChatImpl(self.server.client())
+        backend = FakeChats(self.server, polls=10 ** 9)
+        budget = ConcurrencyBudget.shared("test_cancel", 2)
+
+        async def consume():
+            async for _ in impl.chat_many([ChatRequest(ask=f"ask {i}") for i in range(5)], max_concurrent=2,
+                                          poll_interval=0.001, max_poll_interval=0.001, budget_key="test_cancel"):
+                pass
+
+        task = asyncio.create_task(consume())
+        while len(backend.submitted) < 2:
+            await asyncio.sleep(0.001)
+        # the batch is waiting for completions in an executor thread
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        # the batch submits nothing more, the chats running on the server keep their slots until they finish
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(backend.submitted), 2)
+        self.assertEqual(budget.in_flight, 2)
+
+        backend.polls = 0
+        for _ in range(1000):
+            if budget.in_flight == 0:
+                break
+            await asyncio.sleep(0.001)
+        self.assertEqual(budget.in_flight, 0)
+
+        # and stop being polled once they are done
+        polls = sum(backend.calls.values())
+        await asyncio.sleep(0.05)
+        self.assertEqual(sum(backend.calls.values()), polls)
+
@@ -0,0 +1,82 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from waii_sdk_py.chat import ChatResponse, ChatResponseData, ChatResponseDataV2
+from waii_sdk_py.chat.chat import _is_response_data_v2
+from waii_sdk_py.query import GeneratedQuery, GetQueryResultResponse
+
+
+class TestChatResponseData(unittest.TestCase):
+    def test_v1_payload(self):
+        response = ChatResponse(chat_uuid="c", response_data={
+            "data": {"rows": [{"a": 1}], "column_definitions": [{"name": "a", "type": "INT"}]},
+            "query": {"uuid": "q1", "query": "SELECT 1"},
+        })
+        self.assertIsInstance(response.response_data, ChatResponseData)
+        self.assertIsInstance(response.response_data.data, GetQueryResultResponse)
+        self.assertEqual(response.response_data.query.query, "SELECT 1")
+
+    def test_v2_payload(self):
+        response = ChatResponse(chat_uuid="c", response_data={
+            "data": {"d1": {"rows": [{"a": 1}], "column_definitions": [{"name": "a", "type": "INT"}]}},
+            "query": {"q1": {"uuid": "q1", "query": "SELECT 1"}, "q2": {"uuid": "q2", "query": "SELECT 2"}},
+        })
+        self.assertIsInstance(response.response_data, ChatResponseDataV2)
+        self.assertIsInstance(response.response_data.data["d1"], GetQueryResultResponse)
+        self.assertIsInstance(response.response_data.query["q2"], GeneratedQuery)
+        self.assertIn("response_data", response.__fields_set__)
+
+    def test_v2_error_info(self):
+        response = ChatResponse(chat_uuid="c", response_data={"error_info": {"message": "failed"}})
+        self.assertIsInstance(response.response_data, ChatResponseDataV2)
+
+    def test_model_instance_and_round_trip(self):
+        data = ChatResponseDataV2(query={"q1": GeneratedQuery(uuid="q1", query="SELECT 1")})
+        response = ChatResponse(chat_uuid="c", response_data=data)
+        self.assertIsInstance(response.response_data, ChatResponseDataV2)
+
+        parsed = ChatResponse(**response.dict())
+        self.assertIsInstance(parsed.response_data, ChatResponseDataV2)
+        self.assertEqual(parsed.response_data.query["q1"].query, "SELECT 1")
+
+    def test_v1_with_empty_module(self):
+        response = ChatResponse(chat_uuid="c", response_data={
+            "query": {}, "data": {"rows": [{"a": 1}], "column_definitions": [{"name": "a", "type": "INT"}]},
+        })
+        self.assertIsInstance(response.response_data, ChatResponseData)
+        self.assertEqual(response.response_data.data.rows, [{"a": 1}])
+
+        # only empty modules: validated like the Union
+        response = ChatResponse(chat_uuid="c", response_data={"query": {}})
+        self.assertIsInstance(response.response_data, ChatResponseData)
+
+    def test_v1_module_with_dict_members_only(self):
+        chart = {"chart_spec": {"spec_type": "vegalite", "chart": "{}"}}
+        self.assertFalse(_is_response_data_v2({"chart": chart}))
+        self.assertFalse(_is_response_data_v2({"chart": chart, "query": {}}))
+        self.assertTrue(_is_response_data_v2({"chart": {"c1": {"uuid": "c1", **chart}}}))
+        # modules which disagree
+        self.assertIsNone(_is_response_data_v2({"chart": chart, "query": {"q1": {"uuid": "q1"}}}))
+
+    def test_no_response_data(self):
+        self.assertIsNone(ChatResponse(chat_uuid="c").response_data)
+        self.assertIsNone(ChatResponse(chat_uuid="c", response_data=None).response_data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from waii_sdk_py.chat import (
+    ChatImpl,
+    ChatRequest,
+    ChatResponseDataV2,
+    ChatSession,
+    SqliteChatSessionStore,
+)
+from waii_sdk_py.chat.chat import CHAT_MESSAGE_ENDPOINT
+from waii_sdk_py.history import HistoryImpl
+from waii_sdk_py.history.history import GET_ENDPOINT as GET_HISTORY_ENDPOINT
+from waii_sdk_py.query import QueryImpl
+from waii_sdk_py.query.query import RESULTS_ENDPOINT
+from waii_sdk_py.utils import LRUCache
+
+
+def serve_chats(server):
+    """The chats of every user are numbered from 1, the answer of chat n generates the query qn"""
+
+    def chat_message(body, headers):
+        n = len([b for b in server.bodies(CHAT_MESSAGE_ENDPOINT) if b["user_id"] == body["user_id"]])
+        return {"chat_uuid": f"chat-{n}", "response": f"answer {n}",
+                "response_data": {"query": {f"q{n}": {"uuid": f"q{n}", "query": f"SELECT {n}"}}}}
+
+    server.route(CHAT_MESSAGE_ENDPOINT, chat_message)
+    server.route(RESULTS_ENDPOINT, lambda body, headers: {"rows": [{"n": body["query_id"]}],
+                                                          "query_uuid": body["query_id"]})
+
+
+def serve_history(server, entries):
+    server.route(GET_HISTORY_ENDPOINT, lambda body, headers: {
+        "history": [e for e in entries if e["response"]["chat_uuid"] == body["uuid_filter"]]})
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestChatSession(unittest.TestCase):
+    def setUp(self):
+        serve_chats(self.server)
+        self.history = HistoryImpl(self.server.client())
+        self.query = QueryImpl(self.server.client())
+
+    def chat(self, user_id="user-1"):
+        return ChatImpl(self.server.client(user_id=user_id))
+
+    def test_send_threads_parent_uuid(self):
+        session = ChatSession(self.chat())
+        session.send("how many movies?")
+        session.send(ChatRequest(ask="per genre?"))
+        session.send("and per year?")
+
+        self.assertEqual([b.get("parent_uuid") for b in self.server.bodies(CHAT_MESSAGE_ENDPOINT)],
+                         [None, "chat-1", "chat-2"])
+        self.assertEqual([t.chat_uuid for t in session.conversation()], ["chat-1", "chat-2", "chat-3"])
+
+    def test_rehydrate_from_store_without_server_calls(self):
+        serve_history(self.server, [])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "chat.db")
+            with ChatSession(self.chat(), store=SqliteChatSessionStore(path)) as session:
+                session.send("first")
+                session.send("second")
+
+            with ChatSession(self.chat(), history=self.history, query=self.query,
+                             store=SqliteChatSessionStore(path)) as session:
+                turns = session.resume("chat-2")
+                self.assertEqual([t.request.ask for t in turns], ["first", "second"])
+                self.assertIsInstance(turns[1].response.response_data, ChatResponseDataV2)
+                self.assertEqual(self.server.bodies(GET_HISTORY_ENDPOINT), [])
+
+                # referenced query results are fetched in the background
+                self.assertEqual(session.get_query_result("q2", timeout=5).rows, [{"n": "q2"}])
+                self.assertEqual(sorted(b["query_id"] for b in self.server.bodies(RESULTS_ENDPOINT)), ["q1", "q2"])
+
+                session.send("third")
+                self.assertEqual(session.conversation()[-1].parent_uuid, "chat-2")
+
+    def test_fallback_to_history(self):
+        serve_history(self.server, [
+            {"history_type": "chat", "timestamp_ms": 1,
+             "request": {"ask": "first"}, "response": {"chat_uuid": "c1"}},
+            {"history_type": "chat", "timestamp_ms": 2,
+             "request": {"ask": "second", "parent_uuid": "c1"}, "response": {"chat_uuid": "c2"}},
+        ])
+        session = ChatSession(self.chat(), history=self.history)
+
+        self.assertEqual([t.request.ask for t in session.resume("c2")], ["first", "second"])
+        self.assertEqual(len(self.server.bodies(GET_HISTORY_ENDPOINT)), 2)
+
+        session.conversation("c2")
+        self.assertEqual(len(self.server.bodies(GET_HISTORY_ENDPOINT)), 2)
+
+    def test_turns_kept_apart_by_user(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "chat.db")
+            with ChatSession(self.chat("alice"), store=SqliteChatSessionStore(path)) as session:
+                session.send("first")
+
+            # another user with the same store (and chat uuids) doesn't see the turns of alice
+            with ChatSession(self.chat("bob"), store=SqliteChatSessionStore(path)) as session:
+                self.assertEqual(session.resume("chat-1"), [])
+                session.send("bob's first")
+
+                # nor does the same session once its client impersonates someone else
+                session.chat.http_client.set_impersonate_user_id("carol")
+                self.assertEqual(session.conversation("chat-1"), [])
+                session.chat.http_client.set_impersonate_user_id("")
+                self.assertEqual([t.request.ask for t in session.conversation("chat-1")], ["bob's first"])
+
+            with ChatSession(self.chat("alice"), store=SqliteChatSessionStore(path)) as session:
+                self.assertEqual([t.request.ask for t in session.resume("chat-1")], ["first"])
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_and_ttl(self):
+        now = [0.0]
+        cache = LRUCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(sorted(cache.keys()), ["a", "c"])
+
+        now[0] = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertNotIn("c", cache)
+
@@ -0,0 +1,81 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+import pytest
+
+from waii_sdk_py.chat import (
+    ChatImpl,
+    AsyncChatImpl,
+    ChatRequest,
+    ChatModule,
+    ChatStreamEventType,
+)
+from waii_sdk_py.chat.chat import SUBMIT_CHAT_MESSAGE_ENDPOINT, GET_CHAT_RESPONSE_ENDPOINT
+
+
+def _event(timestamp, title):
+    return {"title": title, "timestamp": timestamp, "step_status": "completed"}
+
+
+SNAPSHOTS = [
+    {"chat_uuid": "c1", "current_step": "Routing Request", "status_update_events": [_event(1, "Routing Request")]},
+    {"chat_uuid": "c1", "current_step": "Generating Query", "response": "There are ",
+     "status_update_events": [_event(1, "Routing Request")],
+     "response_data": {"query": {"q1": {"uuid": "q1", "query": "select 42"}}}},
+    {"chat_uuid": "c1", "current_step": "Completed", "response": "There are 42 movies",
+     "status_update_events": [_event(1, "Routing Request"), _event(2, "Completed")],
+     "response_data": {"query": {"q1": {"uuid": "q1", "query": "select 42"}}}},
+]
+
+
+def serve_chat(server):
+    """The submit starts chat c1, each poll of its response returns the next snapshot"""
+    server.route(SUBMIT_CHAT_MESSAGE_ENDPOINT, lambda body, headers: {"uuid": "c1"})
+    server.route_sequence(GET_CHAT_RESPONSE_ENDPOINT, SNAPSHOTS)
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestChatMessageStream(unittest.TestCase):
+    def test_events_from_polling(self):
+        serve_chat(self.server)
+        events = list(ChatImpl(self.server.client()).chat_message_stream(
+            ChatRequest(ask="how many movies?"), poll_interval=0.001, max_poll_interval=0.001))
+
+        self.assertEqual(self.server.endpoints(), [SUBMIT_CHAT_MESSAGE_ENDPOINT] + [GET_CHAT_RESPONSE_ENDPOINT] * 3)
+        self.assertEqual([e.event_type for e in events], [
+            ChatStreamEventType.status_update, ChatStreamEventType.response, ChatStreamEventType.module,
+            ChatStreamEventType.status_update, ChatStreamEventType.response, ChatStreamEventType.completed,
+        ])
+        self.assertEqual([e.status_update.title for e in events if e.status_update],
+                         ["Routing Request", "Completed"])
+        self.assertEqual([e.response for e in events if e.response], ["There are ", "There are 42 movies"])
+        self.assertEqual(events[2].module, ChatModule.QUERY)
+        self.assertEqual(events[2].module_data.query['q1'].query, "select 42")
+        self.assertEqual(events[-1].chat_response.chat_uuid, "c1")
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestAsyncChatMessageStream(IsolatedAsyncioTestCase):
+    async def test_async_iterator(self):
+        serve_chat(self.server)
+        chat = AsyncChatImpl(self.server.client())
+        events = [e async for e in chat.chat_message_stream(ChatRequest(ask="how many movies?"), poll_interval=0.001,
+                                                            max_poll_interval=0.001)]
+        self.assertEqual(events[-1].event_type, ChatStreamEventType.completed)
+
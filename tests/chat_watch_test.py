@@ -0,0 +1,110 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+import pytest
+
+from waii_sdk_py.chat import ChatImpl, ChatResponseStep, ChatResponseError
+from waii_sdk_py.chat.chat import GET_CHAT_RESPONSE_ENDPOINT
+
+
+def _event(timestamp, title, **kwargs):
+    return {"title": title, "summary": None, "timestamp": timestamp, "step_status": "completed", "percentage": None,
+            **kwargs}
+
+
+def _query(uuid):
+    return {"uuid": uuid, "query": "SELECT 1"}
+
+
+SNAPSHOTS = [
+    {"chat_uuid": "c1", "current_step": "Routing Request", "status_update_events": [_event(1, "routing")]},
+    {"chat_uuid": "c1", "current_step": "Generating Query", "research_plan": "1. query",
+     "status_update_events": [_event(1, "routing"), _event(2, "planning")]},
+    {"chat_uuid": "c1", "current_step": "Generating Query", "research_plan": "1. query",
+     "status_update_events": [_event(1, "routing"), _event(2, "planning")]},
+    {"chat_uuid": "c1", "current_step": "Running Query", "research_plan": "1. query",
+     "status_update_events": [_event(1, "routing"), _event(2, "planning"), _event(3, "query")],
+     "response_data": {"query": {"q1": _query("q1")}}},
+    {"chat_uuid": "c1", "current_step": "Completed", "research_plan": "1. query", "response": "done",
+     "status_update_events": [_event(1, "routing"), _event(2, "planning"), _event(3, "query"), _event(3, "done")],
+     "response_data": {"query": {"q1": _query("q1"), "q2": _query("q2")}}},
+]
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestWatchChatResponse(unittest.TestCase):
+    def setUp(self):
+        self.chat = ChatImpl(self.server.client())
+
+    def _watch(self, snapshots, **kwargs):
+        self.server.route_sequence(GET_CHAT_RESPONSE_ENDPOINT, snapshots)
+        return self.chat.watch_chat_response("c1", poll_interval=0.001, **kwargs)
+
+    def _check(self, deltas):
+        titles = [[e.title for e in d.status_update_events] for d in deltas]
+        self.assertEqual(titles, [["routing"], ["planning"], ["query"], ["done"]])
+        self.assertEqual([d.research_plan for d in deltas], [None, "1. query", None, None])
+        self.assertEqual(list(deltas[2].response_data.query.keys()), ["q1"])
+        self.assertEqual(list(deltas[3].response_data.query.keys()), ["q2"])
+
+        last = deltas[-1]
+        self.assertEqual(last.current_step, ChatResponseStep.completed)
+        self.assertEqual(last.response, "done")
+        self.assertEqual(len(last.chat_response.status_update_events), 4)
+
+    def test_deltas(self):
+        self._check(list(self._watch(SNAPSHOTS, max_poll_interval=0.001)))
+        # only the fields the server knows are sent
+        self.assertEqual(self.server.bodies(GET_CHAT_RESPONSE_ENDPOINT)[0], {
+            "tags": None, "parameters": None, "uuid": "c1", "scope": "test_scope", "org_id": "", "user_id": ""})
+
+    def test_late_events(self):
+        snapshots = [
+            {"chat_uuid": "c1", "current_step": "Routing Request", "status_update_events": [_event(10, "routing")]},
+            # an event recorded late, before the latest one, an event with the same timestamp and another title, and
+            # an event updated in place (same timestamp and title)
+            {"chat_uuid": "c1", "current_step": "Generating Query",
+             "status_update_events": [_event(10, "routing"), _event(8, "context"), _event(12, "retry"),
+                                      _event(12, "query", step_status="in-progress")]},
+            {"chat_uuid": "c1", "current_step": "Completed",
+             "status_update_events": [_event(10, "routing"), _event(8, "context"), _event(12, "retry"),
+                                      _event(12, "query")]},
+        ]
+        deltas = list(self._watch(snapshots, max_poll_interval=0.001))
+        self.assertEqual([[e.title for e in d.status_update_events] for d in deltas],
+                         [["routing"], ["context", "retry", "query"], []])
+        self.assertEqual(len(deltas[-1].chat_response.status_update_events), 4)
+
+    def test_failed(self):
+        snapshots = [
+            {"chat_uuid": "c1", "current_step": "Routing Request", "status_update_events": [_event(1, "routing")]},
+            {"chat_uuid": "c1", "current_step": "Generating Query", "status_update_events": [_event(1, "routing")],
+             "response_data": {"error_info": {"message": "no tables found"}}},
+        ]
+        deltas = []
+        with self.assertRaises(ChatResponseError) as context:
+            for delta in self._watch(snapshots):
+                deltas.append(delta)
+        self.assertEqual(context.exception.error_info, {"message": "no tables found"})
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_timeout(self):
+        with self.assertRaises(TimeoutError):
+            for _ in self._watch(SNAPSHOTS[:2], timeout=0.05):
+                pass
@@ -0,0 +1,129 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from unittest.mock import patch
+
+import pytest
+
+from waii_sdk_py.waii_http_client import WaiiHttpClient
+
+FAKE_SERVER_URL = "http://localhost:9859/api/"
+
+
+class FakeResponse:
+    """The parts of requests.Response used by WaiiHttpClient and its callers"""
+
+    def __init__(self, body: Any = None, status_code: int = 200, headers: Optional[Dict[str, str]] = None,
+                 content: Optional[bytes] = None, chunks: Optional[Callable[[int], Iterable[bytes]]] = None):
+        self.status_code = status_code
+        self.headers = dict(headers or {})
+        self.content = content if content is not None else json.dumps(body).encode()
+        # produces the streamed body (e.g. to fail mid-way), by default the content in chunks of `chunk_size`
+        self._chunks = chunks
+        self.closed = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterable[bytes]:
+        if self._chunks is not None:
+            return self._chunks(chunk_size)
+        return (self.content[i:i + chunk_size] for i in range(0, len(self.content), chunk_size))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeWaiiServer:
+    """
+    Stands in for the Waii API behind `requests.post`. Requests are dispatched by endpoint (the url after the api
+    prefix) to the handlers added with `route()`, which get the json body and the headers of the request and return
+    the json response, or a FakeResponse (`response()`) for another status, headers or a streamed body. A handler
+    raising an exception answers 500 with the exception as detail, unrouted endpoints answer 404.
+
+    Every request is recorded in `requests` as (endpoint, body, headers).
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, Callable[[Dict[str, Any], Dict[str, str]], Any]] = {}
+        self.requests: List[Tuple[str, Dict[str, Any], Dict[str, str]]] = []
+        self.lock = threading.Lock()
+
+    def route(self, endpoint: str, handler: Callable[[Dict[str, Any], Dict[str, str]], Any]) -> "FakeWaiiServer":
+        self.handlers[endpoint] = handler
+        return self
+
+    def route_sequence(self, endpoint: str, responses: Iterable[Any]) -> "FakeWaiiServer":
+        """Answers the next requests to `endpoint` with `responses` in order, the last one is repeated"""
+        responses = list(responses)
+        start = len(self.bodies(endpoint))
+        return self.route(endpoint, lambda body, headers: responses[min(len(self.bodies(endpoint)) - start,
+                                                                        len(responses)) - 1])
+
+    def response(self, body: Any = None, status_code: int = 200, **kwargs) -> FakeResponse:
+        return FakeResponse(body, status_code, **kwargs)
+
+    def client(self, scope: str = "test_scope", user_id: str = "", api_key: str = "") -> WaiiHttpClient:
+        """A client of this server, which doesn't replace the global WaiiHttpClient instance"""
+        instance = WaiiHttpClient.instance
+        http_client = WaiiHttpClient(FAKE_SERVER_URL, api_key)
+        WaiiHttpClient.instance = instance
+        http_client.set_scope(scope)
+        http_client.set_user_id(user_id)
+        return http_client
+
+    def bodies(self, endpoint: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [body for e, body, _ in self.requests if e == endpoint]
+
+    def endpoints(self) -> List[str]:
+        with self.lock:
+            return [endpoint for endpoint, _, _ in self.requests]
+
+    def post(self, url, headers=None, data=None, timeout=None, stream=False) -> FakeResponse:
+        endpoint = url.split("/api/", 1)[-1]
+        if data is not None and not isinstance(data, (str, bytes)):
+            # streamed request body
+            data = b''.join(data)
+        body = json.loads(data) if data else {}
+        headers = dict(headers or {})
+        with self.lock:
+            self.requests.append((endpoint, body, headers))
+        handler = self.handlers.get(endpoint)
+        if handler is None:
+            return FakeResponse({"detail": f"no route for {endpoint}"}, 404)
+        try:
+            result = handler(body, headers)
+        except Exception as e:
+            return FakeResponse({"detail": str(e)}, 500)
+        return result if isinstance(result, FakeResponse) else FakeResponse(result)
+
+
+@pytest.fixture
+def waii_server(request):
+    """A FakeWaiiServer answering the requests of every WaiiHttpClient, also set as `self.server` of test classes"""
+    server = FakeWaiiServer()
+    with patch('waii_sdk_py.waii_http_client.waii_http_client.requests.post', server.post):
+        if request.instance is not None:
+            request.instance.server = server
+        yield server
@@ -0,0 +1,79 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime
+import decimal
+import unittest
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from waii_sdk_py.dataframe import infer_column_definitions
+
+
+def sample_df():
+    return pd.DataFrame({
+        "i": [1, 2, 3],
+        "f": [1.5, None, 2.0],
+        "s": ["a", "b", None],
+        "t": pd.to_datetime(["2024-01-01", None, "2024-01-03"]),
+        "b": [True, False, True],
+        "n": pd.array([None, 2, 3], dtype="Int64"),
+        "o": [None, decimal.Decimal("1.2"), decimal.Decimal("2")],
+        "d": [datetime.date(2024, 1, 1)] * 3,
+        "c": pd.Categorical(["x", "y", "x"]),
+    }, index=[10, 20, 30])
+
+
+EXPECTED_TYPES = {
+    "i": "int64", "f": "float64", "s": "str", "t": "Timestamp", "b": "bool", "n": "int64", "o": "Decimal",
+    "d": "date", "c": "str",
+}
+
+
+class TestInferColumnDefinitions(unittest.TestCase):
+    def test_pandas_types(self):
+        # non-default index and a null first value: the previous df[col][0] lookup failed on both
+        cols = infer_column_definitions(sample_df())
+        self.assertEqual({c.name: c.type for c in cols}, EXPECTED_TYPES)
+        self.assertTrue(all(c.description is None for c in cols))
+
+    def test_empty_dataframe(self):
+        cols = infer_column_definitions(sample_df().iloc[0:0])
+        self.assertEqual([c.type for c in cols][:5], ["int64", "float64", "str", "Timestamp", "bool"])
+
+    def test_arrow_types(self):
+        cols = infer_column_definitions(pa.Table.from_pandas(sample_df(), preserve_index=False))
+        self.assertEqual({c.name: c.type for c in cols}, EXPECTED_TYPES)
+
+    def test_stats(self):
+        cols = {c.name: c for c in infer_column_definitions(sample_df(), stats=True)}
+        self.assertEqual(cols["i"].description, "nulls: 0.0%, distinct: 3, min: 1, max: 3")
+        self.assertEqual(cols["s"].description, "nulls: 33.3%, distinct: 2")
+
+        arrow_cols = {c.name: c for c in infer_column_definitions(pa.Table.from_pandas(sample_df()), stats=True)}
+        self.assertEqual(arrow_cols["f"].description, "nulls: 33.3%, distinct: 2, min: 1.5, max: 2.0")
+
+    def test_distinct_estimate_on_large_dataframe(self):
+        df = pd.DataFrame({"key": np.arange(300000), "group": np.arange(300000) % 10})
+        cols = {c.name: c for c in infer_column_definitions(df, stats=True)}
+        self.assertIn("distinct: ~300000", cols["key"].description)
+        self.assertIn("distinct: ~10,", cols["group"].description)
+
+
+if __name__ == '__main__':
+    unittest.main()
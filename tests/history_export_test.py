@@ -0,0 +1,96 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import pytest
+
+from waii_sdk_py.history import HistoryImpl, HistoryExporter, FileWatermarkStore
+from waii_sdk_py.history.history import GET_ENDPOINT
+
+
+def make_entry(i):
+    kind = ("query", "chart", "chat")[i % 3]
+    if kind == "query":
+        return {"history_type": "query", "timestamp_ms": i, "query": {"uuid": f"q{i}", "query": f"SELECT {i}"},
+                "request": {"ask": f"ask {i}"}}
+    if kind == "chart":
+        return {"history_type": "chart", "timestamp_ms": i, "request": {"ask": f"chart {i}", "sql": "SELECT 1"},
+                "response": {"uuid": f"c{i}"}}
+    return {"history_type": "chat", "timestamp_ms": i, "request": {"ask": f"chat {i}"},
+            "response": {"chat_uuid": f"h{i}", "response": "ok"}}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestHistoryExport(unittest.TestCase):
+    def setUp(self):
+        self.entries = []
+        self.server.route(GET_ENDPOINT, self.get_history)
+        self.history = HistoryImpl(self.server.client())
+
+    def get_history(self, body, headers):
+        entries = sorted(self.entries, key=lambda e: e["timestamp_ms"], reverse=True)
+        return {"history": entries[body["offset"]:body["offset"] + body["limit"]]}
+
+    def offsets(self):
+        return [body["offset"] for body in self.server.bodies(GET_ENDPOINT)]
+
+    def test_parquet_export_split_by_type(self):
+        self.entries = [make_entry(i) for i in range(1000)]
+        with tempfile.TemporaryDirectory() as directory:
+            result = self.history.export(directory, page_size=64, max_concurrent=3)
+
+            self.assertEqual(result.n_entries, {"query": 334, "chart": 333, "chat": 333})
+            self.assertEqual(result.watermark.timestamp_ms, 999)
+            tables = {os.path.basename(f).split("-")[0]: pq.read_table(f) for f in result.files}
+            self.assertEqual(tables["query"].num_rows, 334)
+            # newest first
+            row = tables["query"].to_pylist()[-1]
+            self.assertEqual(row["uuid"], "q0")
+            self.assertEqual(row["query"], "SELECT 0")
+            self.assertEqual(json.loads(row["entry"]), make_entry(0))
+            self.assertEqual(tables["chat"].column_names,
+                             ["timestamp_ms", "uuid", "ask", "parent_uuid", "response", "entry"])
+            self.assertFalse([f for f in os.listdir(directory) if f.endswith(".part")])
+
+    def test_incremental_export(self):
+        self.entries = [make_entry(i) for i in range(300)]
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileWatermarkStore(os.path.join(directory, "watermark.json"))
+            exporter = HistoryExporter(self.history, directory, format="arrow", page_size=50,
+                                       max_concurrent=2, watermark_store=store)
+            first = exporter.export()
+            self.assertEqual(sum(first.n_entries.values()), 300)
+            self.assertEqual(store.load().timestamp_ms, 299)
+
+            self.entries.extend(make_entry(i) for i in range(300, 320))
+            n_requests = len(self.offsets())
+            second = exporter.export()
+            self.assertEqual(sum(second.n_entries.values()), 20)
+            self.assertEqual(store.load().timestamp_ms, 319)
+            self.assertLessEqual(len(self.offsets()) - n_requests, 2)
+
+            rows = sum(ipc.open_file(f).read_all().num_rows for f in second.files)
+            self.assertEqual(rows, 20)
+
+            third = exporter.export()
+            self.assertEqual(third.files, [])
+
@@ -0,0 +1,129 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+import pytest
+
+from waii_sdk_py.history import (
+    HistoryImpl,
+    AsyncHistoryImpl,
+    HistoryWatermark,
+    FileWatermarkStore,
+    GeneratedQueryHistoryEntry,
+)
+from waii_sdk_py.history.history import GET_ENDPOINT
+
+
+def query_entry(timestamp_ms, uuid):
+    return {"history_type": "query", "timestamp_ms": timestamp_ms, "query": {"uuid": uuid, "query": "SELECT 1"}}
+
+
+class GrowingHistory:
+    """History served by `server`, the entries of the next batch are added on every fetch of the first page"""
+
+    def __init__(self, server, entries, batches):
+        self.entries = list(entries)
+        self.batches = list(batches)
+        self.fetched = 0
+        server.route(GET_ENDPOINT, self.get_history)
+
+    def get_history(self, body, headers):
+        if body["offset"] == 0 and self.batches:
+            self.entries.extend(self.batches.pop(0))
+        ordered = sorted(self.entries, key=lambda e: e["timestamp_ms"], reverse=True)
+        page = ordered[body["offset"]:body["offset"] + body["limit"]]
+        self.fetched += len(page)
+        return {"history": page}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestHistoryFollow(unittest.TestCase):
+    def setUp(self):
+        self.history = HistoryImpl(self.server.client())
+
+    def test_follow_new_entries(self):
+        history = GrowingHistory(
+            self.server,
+            [query_entry(i, f"old-{i}") for i in range(500)],
+            [[], [query_entry(600, "b"), query_entry(600, "a")], [], [query_entry(700, "c")]],
+        )
+        follow = self.history.follow(poll_interval=0.001, page_size=10)
+        uuids = [next(follow).query.uuid for _ in range(3)]
+        follow.close()
+
+        self.assertEqual(uuids, ["a", "b", "c"])
+        # only the first page is read on each poll, the old entries are not re-read
+        self.assertLess(history.fetched, 60)
+
+    def test_resume_from_watermark_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileWatermarkStore(os.path.join(directory, "watermark.json"))
+            store.save(HistoryWatermark(timestamp_ms=5, uuids=["q5"]))
+            GrowingHistory(self.server, [query_entry(i, f"q{i}") for i in range(10)], [])
+
+            follow = self.history.follow(watermark_store=store, poll_interval=0.001, page_size=3)
+            entries = [next(follow) for _ in range(4)]
+            self.assertIsInstance(entries[0], GeneratedQueryHistoryEntry)
+            self.assertEqual([e.query.uuid for e in entries], ["q6", "q7", "q8", "q9"])
+            follow.close()
+
+            # q9 was not acknowledged by requesting the next entry, it is delivered again on resume
+            self.assertEqual(store.load(), HistoryWatermark(timestamp_ms=8, uuids=["q8"]))
+
+    def test_late_entries_at_the_watermark_timestamp(self):
+        # "a" is added after "b", with the same timestamp and a smaller uuid
+        GrowingHistory(self.server, [query_entry(1, "x")], [[], [query_entry(600, "b")], [query_entry(600, "a")]])
+        follow = self.history.follow(poll_interval=0.001)
+        uuids = [next(follow).query.uuid for _ in range(2)]
+        follow.close()
+        self.assertEqual(uuids, ["b", "a"])
+
+    def test_starts_from_the_newest_entries(self):
+        GrowingHistory(self.server, [query_entry(5, "q1"), query_entry(5, "q2"), query_entry(4, "q0")],
+                       [[], [query_entry(5, "q3")]])
+        follow = self.history.follow(poll_interval=0.001)
+        self.assertEqual(next(follow).query.uuid, "q3")
+        follow.close()
+
+    def test_empty_history_starts_from_now(self):
+        now_ms = int(time.time() * 1000)
+        GrowingHistory(self.server, [], [[], [query_entry(1, "old"), query_entry(now_ms + 60000, "new")]])
+        follow = self.history.follow(poll_interval=0.001)
+        self.assertEqual(next(follow).query.uuid, "new")
+        follow.close()
+
+    def test_backfill(self):
+        GrowingHistory(self.server, [query_entry(i, f"q{i}") for i in range(5)], [])
+        follow = self.history.follow(poll_interval=0.001, page_size=2, backfill=True)
+        self.assertEqual([next(follow).query.uuid for _ in range(5)], [f"q{i}" for i in range(5)])
+        follow.close()
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestAsyncHistoryFollow(IsolatedAsyncioTestCase):
+    async def test_async_follow(self):
+        GrowingHistory(self.server, [query_entry(1, "x")], [[], [query_entry(2, "y")]])
+        impl = AsyncHistoryImpl(self.server.client())
+
+        async for entry in impl.follow(poll_interval=0.001):
+            self.assertEqual(entry.query.uuid, "y")
+            break
+
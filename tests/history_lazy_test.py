@@ -0,0 +1,66 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import copy
+import unittest
+
+import pytest
+
+from waii_sdk_py.history import (
+    HistoryImpl,
+    GetHistoryResponse,
+    LazyHistoryEntry,
+    GeneratedChartHistoryEntry,
+    GeneratedChatHistoryEntry,
+)
+from waii_sdk_py.history.history import GET_ENDPOINT
+
+HISTORY = {"history": [
+    {"history_type": "query", "timestamp_ms": 3, "query": {"uuid": "q1", "query": "SELECT 1"}},
+    {"history_type": "chart", "timestamp_ms": 2, "response": {"uuid": "c1"}, "request": {"ask": "plot"}},
+    {"history_type": "chat", "timestamp_ms": 1, "request": {"ask": "hi"}, "response": {"chat_uuid": "h1"}},
+    {"history_type": "unknown", "timestamp_ms": 0},
+]}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestLazyHistory(unittest.TestCase):
+    def test_lazy_entries(self):
+        self.server.route(GET_ENDPOINT, lambda body, headers: HISTORY)
+        response = HistoryImpl(self.server.client()).get(lazy=True)
+
+        self.assertEqual(len(response.history), 3)
+        self.assertTrue(all(isinstance(e, LazyHistoryEntry) for e in response.history))
+        self.assertEqual([(e.history_type, e.timestamp_ms, e.uuid) for e in response.history],
+                         [("query", 3, "q1"), ("chart", 2, "c1"), ("chat", 1, "h1")])
+        self.assertTrue(all(e._entry is None for e in response.history))
+
+        chart, chat = response.history[1], response.history[2]
+        self.assertEqual(chart.request.ask, "plot")
+        self.assertIsInstance(chart.entry, GeneratedChartHistoryEntry)
+        self.assertIsInstance(chat.entry, GeneratedChatHistoryEntry)
+        self.assertEqual(chat.response.chat_uuid, "h1")
+        self.assertIs(chat.entry, chat.entry)
+
+    def test_same_entries_as_eager(self):
+        eager = GetHistoryResponse(copy.deepcopy(HISTORY))
+        lazy = GetHistoryResponse(copy.deepcopy(HISTORY), lazy=True)
+        self.assertEqual([e.dict() for e in eager.history], [e.entry.dict() for e in lazy.history])
+
+    def test_copy_lazy_entry(self):
+        entry = GetHistoryResponse(copy.deepcopy(HISTORY), lazy=True).history[0]
+        self.assertEqual(copy.copy(entry).query.query, "SELECT 1")
+
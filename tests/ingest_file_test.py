@@ -0,0 +1,131 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import base64
+import io
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from waii_sdk_py.database import (
+    DatabaseImpl,
+    IngestDocumentRequest,
+    IngestDocumentResponse,
+    GetIngestDocumentJobStatusResponse,
+    IngestDocumentJobStatus,
+)
+from waii_sdk_py.database.database import INGEST_DOCUMENT_ENDPOINT, GET_INGEST_DOCUMENT_JOB_STATUS_ENDPOINT
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestIngestFile(unittest.TestCase):
+    def setUp(self):
+        self.http_client = self.server.client()
+        self.database = DatabaseImpl(self.http_client)
+        self.server.route(INGEST_DOCUMENT_ENDPOINT, lambda body, headers: {
+            'ingest_document_job_id': f'job-{len(self.bodies())}'})
+
+    def bodies(self):
+        return self.server.bodies(INGEST_DOCUMENT_ENDPOINT)
+
+    def test_ingest_binary_file_from_path(self):
+        content = os.urandom(10000)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(content)
+        try:
+            result = self.database.ingest_file(f.name, chunk_size=3 * 100)
+        finally:
+            os.remove(f.name)
+        bodies = self.bodies()
+
+        self.assertEqual(result.ingest_document_job_id, 'job-1')
+        self.assertEqual(base64.b64decode(bodies[0]['content']), content)
+        self.assertTrue(bodies[0]['is_binary'])
+        self.assertEqual(bodies[0]['filename'], os.path.basename(f.name))
+        self.assertEqual(bodies[0]['scope'], 'test_scope')
+
+    def test_ingest_text_file_object(self):
+        text = 'héllo "wörld"\n' * 500
+        self.database.ingest_file(io.BytesIO(text.encode('utf-8')),
+                                  IngestDocumentRequest(is_binary=False, filename='doc.txt'),
+                                  chunk_size=3 * 7)
+        bodies = self.bodies()
+        self.assertEqual(bodies[0]['content'], text)
+        self.assertEqual(bodies[0]['filename'], 'doc.txt')
+
+    def test_streamed_request_not_modified(self):
+        params = IngestDocumentRequest(is_binary=True, content='kept', filename='doc.pdf')
+        self.http_client.common_fetch_streamed(INGEST_DOCUMENT_ENDPOINT, params, 'content', iter(['YWJj']),
+                                               IngestDocumentResponse)
+        bodies = self.bodies()
+        self.assertEqual(base64.b64decode(bodies[0]['content']), b'abc')
+        self.assertEqual(bodies[0]['scope'], 'test_scope')
+        self.assertEqual(params.content, 'kept')
+        self.assertNotIn('scope', params.__dict__)
+
+    def test_ingest_files_and_wait_for_jobs(self):
+        files = [io.BytesIO(b'a' * n) for n in (1, 2, 3, 4)]
+        results = self.database.ingest_files(files, max_concurrent=2)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sorted(len(base64.b64decode(b['content'])) for b in self.bodies()), [1, 2, 3, 4])
+
+        calls = {}
+
+        def get_status(params):
+            calls[params.ingest_document_job_id] = calls.get(params.ingest_document_job_id, 0) + 1
+            status = IngestDocumentJobStatus.completed if calls[params.ingest_document_job_id] > 1 \
+                else IngestDocumentJobStatus.in_progress
+            return GetIngestDocumentJobStatusResponse(status=status)
+
+        self.database.get_ingest_document_job_status = get_status
+        statuses = self.database.wait_for_ingest_document_jobs(
+            [r.ingest_document_job_id for r in results], poll_interval=0.01)
+        self.assertEqual(set(statuses.keys()), {r.ingest_document_job_id for r in results})
+        self.assertTrue(all(s.status == IngestDocumentJobStatus.completed for s in statuses.values()))
+
+    def test_wait_for_jobs_polls_through_http_client(self):
+        polls = {}
+
+        def get_status(body, headers):
+            job_id = body['ingest_document_job_id']
+            polls[job_id] = polls.get(job_id, 0) + 1
+            return {'status': 'completed' if polls[job_id] > 2 else 'in_progress'}
+
+        self.server.route(GET_INGEST_DOCUMENT_JOB_STATUS_ENDPOINT, get_status)
+        statuses = self.database.wait_for_ingest_document_jobs(['job-1', 'job-2'], poll_interval=0.01)
+        self.assertEqual(polls, {'job-1': 3, 'job-2': 3})
+        self.assertTrue(all(s.status == IngestDocumentJobStatus.completed for s in statuses.values()))
+
+    def test_wait_for_jobs_isolates_failed_checks(self):
+        polls = {}
+
+        def get_status(params):
+            job_id = params.ingest_document_job_id
+            polls[job_id] = polls.get(job_id, 0) + 1
+            if job_id == 'job-1':
+                raise Exception("no such job")
+            status = IngestDocumentJobStatus.completed if polls[job_id] > 2 else IngestDocumentJobStatus.in_progress
+            return GetIngestDocumentJobStatusResponse(status=status)
+
+        self.database.get_ingest_document_job_status = get_status
+        statuses = self.database.wait_for_ingest_document_jobs(['job-1', 'job-2'], poll_interval=0.01)
+        self.assertEqual(statuses['job-1'].status, IngestDocumentJobStatus.failed)
+        self.assertIn("no such job", statuses['job-1'].message)
+        self.assertEqual(statuses['job-2'].status, IngestDocumentJobStatus.completed)
+        self.assertEqual(polls, {'job-1': 1, 'job-2': 3})
+
@@ -0,0 +1,151 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from waii_sdk_py.database import TableDefinition, ColumnDefinition, Constraint, ConstraintDetectorType
+from waii_sdk_py.kg import (
+    KnowledgeGraphImpl,
+    GetKnowledgeGraphRequest,
+    GetKnowledgeGraphResponse,
+    KnowledgeGraph,
+    decode_knowledge_graph,
+)
+from waii_sdk_py.my_pydantic import ValidationError
+from waii_sdk_py.kg.kg import GET_KNOWLEDGE_GRAPH_ENDPOINT
+from waii_sdk_py.semantic_context import SemanticStatement
+
+
+def graph(n_tables, n_columns=8, tables_per_schema=10):
+    """schema -> tables -> columns, a foreign key between consecutive tables, a semantic statement per table"""
+    nodes, edges = [], []
+    schemas = [{"entity_type": "schema", "name": {"database_name": "db", "schema_name": f"s{s}"}}
+               for s in range((n_tables + tables_per_schema - 1) // tables_per_schema)]
+    for s, schema in enumerate(schemas):
+        nodes.append({"id": f"s{s}", "display_name": f"s{s}", "entity_type": "schema", "entity": schema})
+    for t in range(n_tables):
+        schema = schemas[t // tables_per_schema]
+        name = {"database_name": "db", "schema_name": schema["name"]["schema_name"], "table_name": f"t{t}"}
+        table = {"entity_type": "table", "name": name,
+                 "columns": [{"entity_type": "column", "name": f"c{c}", "type": "int"} for c in range(n_columns)],
+                 "constraints": [{"entity_type": "constraint", "source": "database", "constraint_type": "foreign",
+                                  "table": name, "cols": ["c0"], "src_cols": ["c1"]}]}
+        nodes.append({"id": f"t{t}", "display_name": f"t{t}", "entity_type": "table", "entity": table,
+                      "parent_entity": schema})
+        edges.append({"edge_type": "schema_to_table", "source_id": f"s{t // tables_per_schema}",
+                      "target_id": f"t{t}", "directed": True})
+        for column in table["columns"]:
+            nodes.append({"id": f"t{t}.{column['name']}", "display_name": column["name"], "entity_type": "column",
+                          "entity": dict(column), "parent_entity": dict(table)})
+            edges.append({"edge_type": "table_to_column", "source_id": f"t{t}",
+                          "target_id": f"t{t}.{column['name']}", "directed": True})
+        if t:
+            edges.append({"edge_type": "constraint", "source_id": f"t{t - 1}", "target_id": f"t{t}",
+                          "directed": True, "edge_entity": table["constraints"][0]})
+        statement = {"entity_type": "semantic_statement", "id": f"st{t}", "statement": f"t{t} holds sales",
+                     "labels": ["sales"]}
+        nodes.append({"id": f"st{t}", "display_name": f"st{t}", "entity_type": "semantic_statement",
+                      "entity": statement})
+        edges.append({"edge_type": "semantic_statement_reference", "source_id": f"st{t}", "target_id": f"t{t}",
+                      "directed": True, "edge_entity": dict(statement)})
+    return {"graph": {"nodes": nodes, "edges": edges}}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestDecodeKnowledgeGraph(unittest.TestCase):
+    def setUp(self):
+        self.response = graph(40)
+        self.decoded = decode_knowledge_graph(self.response["graph"])
+
+    def test_same_as_validation(self):
+        validated = GetKnowledgeGraphResponse(**self.response).graph
+        self.assertEqual(self.decoded.dict(), validated.dict())
+        self.assertEqual([type(n.entity) for n in self.decoded.nodes], [type(n.entity) for n in validated.nodes])
+        self.assertEqual(self.decoded.nodes[1].__fields_set__, validated.nodes[1].__fields_set__)
+
+    def test_types(self):
+        nodes = {n.id: n for n in self.decoded.nodes}
+        table = nodes["t1"].entity
+        self.assertIsInstance(table, TableDefinition)
+        self.assertIsInstance(table.columns[0], ColumnDefinition)
+        self.assertEqual(table.name.table_name, "t1")
+        self.assertIs(table.constraints[0].source, ConstraintDetectorType.database)
+        self.assertIsInstance(nodes["st1"].entity, SemanticStatement)
+        self.assertIsNone(nodes["s0"].parent_entity)
+
+        constraint_edges = [e for e in self.decoded.edges if e.edge_type == "constraint"]
+        self.assertIsInstance(constraint_edges[0].edge_entity, Constraint)
+        self.assertIsNone([e for e in self.decoded.edges if e.edge_type == "table_to_column"][0].edge_entity)
+
+    def test_entities_are_shared(self):
+        nodes = {n.id: n for n in self.decoded.nodes}
+        table = nodes["t3"].entity
+        self.assertIs(nodes["t3.c0"].parent_entity, table)
+        self.assertIs(nodes["t3.c7"].parent_entity, table)
+        self.assertIs(nodes["t3"].parent_entity, nodes["s0"].entity)
+
+        statement_edge = [e for e in self.decoded.edges if e.source_id == "st3"][0]
+        self.assertIs(statement_edge.edge_entity, nodes["st3"].entity)
+
+    def test_table_refs(self):
+        payload = {"nodes": [{"id": "t", "display_name": "t", "entity_type": "table", "entity": {
+            "entity_type": "table", "name": {"table_name": "t"},
+            "refs": [{"src_table": {"table_name": "t"}, "src_cols": ["a"],
+                      "ref_table": {"table_name": "u"}, "ref_cols": ["b"]}]}}], "edges": []}
+        table = decode_knowledge_graph(payload).nodes[0].entity
+        self.assertEqual(table._refs[0].ref_table.table_name, "u")
+
+    def test_invalid_payload_falls_back_to_validation(self):
+        unknown = {"nodes": [{"id": "x", "display_name": "x", "entity_type": "view",
+                              "entity": {"entity_type": "view"}}], "edges": []}
+        with self.assertRaises(ValidationError):
+            decode_knowledge_graph(unknown)
+
+        missing_name = {"nodes": [{"id": "t", "display_name": "t", "entity_type": "table",
+                                   "entity": {"entity_type": "table"}}], "edges": []}
+        with self.assertRaises(ValidationError):
+            decode_knowledge_graph(missing_name)
+
+        bad_enum = {"nodes": [], "edges": [{"edge_type": "constraint", "source_id": "a", "target_id": "b",
+                                            "directed": True,
+                                            "edge_entity": {"entity_type": "constraint", "source": "nope"}}]}
+        with self.assertRaises(ValidationError):
+            decode_knowledge_graph(bad_enum)
+
+    def test_get_knowledge_graph(self):
+        impl = KnowledgeGraphImpl(self.server.client())
+        self.server.route(GET_KNOWLEDGE_GRAPH_ENDPOINT, lambda body, headers: self.response)
+        response = impl.get_knowledge_graph(GetKnowledgeGraphRequest(ask="sales"), validate=False)
+        self.assertEqual(len(response.graph.nodes), len(self.response["graph"]["nodes"]))
+
+        # validated by default
+        self.assertEqual(impl.get_knowledge_graph(GetKnowledgeGraphRequest(ask="sales")),
+                         GetKnowledgeGraphResponse(**self.response))
+
+        self.server.route(GET_KNOWLEDGE_GRAPH_ENDPOINT, lambda body, headers: {"graph": None})
+        self.assertIsNone(impl.get_knowledge_graph(GetKnowledgeGraphRequest(ask="sales"), validate=False).graph)
+
+    def test_uncompilable_model_falls_back_to_validation(self):
+        def unsupported(field):
+            raise TypeError(f"Unsupported field {field.name}")
+
+        with patch("waii_sdk_py.kg.kg_decoder._field_converter", unsupported):
+            graph = decode_knowledge_graph(self.response["graph"])
+        self.assertEqual(graph.dict(), KnowledgeGraph(**self.response["graph"]).dict())
+
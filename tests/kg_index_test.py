@@ -0,0 +1,143 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import importlib.util
+import unittest
+
+from waii_sdk_py.kg import (
+    KnowledgeGraph,
+    KnowledgeGraphNode,
+    KnowledgeGraphEdge,
+    KnowledgeGraphEdgeType,
+    KnowledgeGraphDirection,
+    KnowledgeGraphIndex,
+)
+
+
+def table_node(name):
+    return KnowledgeGraphNode(id=name, display_name=name, entity_type="table",
+                              entity={"entity_type": "table", "name": {"table_name": name, "schema_name": "s"}})
+
+
+def column_node(table, column):
+    return KnowledgeGraphNode(id=f"{table}.{column}", display_name=column, entity_type="column",
+                              entity={"entity_type": "column", "name": column, "type": "int"})
+
+
+def edge(edge_type, source_id, target_id, directed=True):
+    return KnowledgeGraphEdge(edge_type=edge_type, source_id=source_id, target_id=target_id, directed=directed)
+
+
+def sample_graph():
+    """
+    orders -> customers -> regions, orders -> items (foreign keys), products is not joined to anything;
+    orders has the columns id and customer_id
+    """
+    tables = ["orders", "customers", "regions", "items", "products"]
+    nodes = [table_node(t) for t in tables] + [column_node("orders", "id"), column_node("orders", "customer_id")]
+    edges = [
+        edge("constraint", "orders", "customers"),
+        edge("constraint", "customers", "regions"),
+        edge("constraint", "items", "orders", directed=False),
+        edge("table_to_column", "orders", "orders.id"),
+        edge("table_to_column", "orders", "orders.customer_id"),
+    ]
+    return KnowledgeGraph(nodes=nodes, edges=edges)
+
+
+class TestKnowledgeGraphIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = sample_graph().index()
+
+    def test_nodes(self):
+        self.assertEqual(len(self.index), 7)
+        self.assertIn("orders", self.index)
+        self.assertEqual(self.index.node("orders").entity.name.table_name, "orders")
+        self.assertEqual([n.id for n in self.index.nodes_of_type("column")], ["orders.id", "orders.customer_id"])
+
+    def test_neighbors_by_type_and_direction(self):
+        ids = lambda nodes: sorted(n.id for n in nodes)
+
+        self.assertEqual(ids(self.index.neighbors("orders", KnowledgeGraphEdgeType.table_to_column)),
+                         ["orders.customer_id", "orders.id"])
+        self.assertEqual(ids(self.index.neighbors("orders", "constraint", KnowledgeGraphDirection.outgoing)),
+                         ["customers", "items"])
+        self.assertEqual(ids(self.index.neighbors("orders", "constraint", KnowledgeGraphDirection.incoming)),
+                         ["items"])
+        self.assertEqual(ids(self.index.neighbors("customers", "constraint", KnowledgeGraphDirection.incoming)),
+                         ["orders"])
+        self.assertEqual(len(self.index.edges_of("orders")), 4)
+        self.assertEqual(self.index.neighbors("products"), [])
+
+    def test_join_paths(self):
+        path = self.index.join_path("items", "regions")
+        self.assertEqual([(e.source_id, e.target_id) for e in path],
+                         [("items", "orders"), ("orders", "customers"), ("customers", "regions")])
+        # foreign keys are followed in both directions
+        self.assertEqual(len(self.index.join_path("regions", "orders")), 2)
+        self.assertEqual(self.index.join_path("orders", "orders"), [])
+        self.assertIsNone(self.index.join_path("orders", "products"))
+        # columns are not joins
+        self.assertIsNone(self.index.join_path("orders.id", "orders"))
+
+        self.assertIsNone(self.index.shortest_path("customers", "items", "constraint", directed=True))
+        self.assertEqual(len(self.index.shortest_path("items", "regions", "constraint", directed=True)), 3)
+
+        edges = self.index.join_edges(["customers", "items", "regions"])
+        self.assertEqual(sorted((e.source_id, e.target_id) for e in edges),
+                         [("customers", "regions"), ("items", "orders"), ("orders", "customers")])
+        self.assertIsNone(self.index.join_edges(["customers", "products"]))
+
+    def test_reachable(self):
+        self.assertEqual(self.index.reachable("regions", "constraint"),
+                         {"regions": 0, "customers": 1, "orders": 2, "items": 3})
+        self.assertEqual(self.index.reachable("regions", "constraint", max_depth=1), {"regions": 0, "customers": 1})
+
+    def test_large_graph(self):
+        n_tables = 5000
+        nodes = [table_node(f"t{i}") for i in range(n_tables)]
+        edges = [edge("constraint", f"t{i}", f"t{i + 1}") for i in range(n_tables - 1)]
+        edges += [edge("constraint", f"t{i}", f"t{(i * 7) % n_tables}") for i in range(0, n_tables, 3)]
+        edges += [edge("semantic_statement_reference", f"t{i}", f"t{(i * 13) % n_tables}") for i in range(n_tables)]
+        index = KnowledgeGraphIndex(KnowledgeGraph.construct(nodes=nodes, edges=edges))
+
+        self.assertEqual(len(index.neighbors("t300", "constraint", KnowledgeGraphDirection.outgoing)), 2)
+        path = index.join_path("t0", f"t{n_tables - 1}")
+        self.assertIsNotNone(path)
+        self.assertLess(len(path), n_tables - 1)
+
+    @unittest.skipIf(importlib.util.find_spec("networkx") is None, "networkx is not installed")
+    def test_to_networkx(self):
+        graph = self.index.to_networkx()
+        self.assertEqual(graph.number_of_nodes(), 7)
+        # the undirected edge is added in both directions
+        self.assertEqual(graph.number_of_edges(), 6)
+        self.assertEqual(graph.nodes["orders"]["entity_type"], "table")
+        self.assertTrue(graph.has_edge("orders", "items"))
+
+    @unittest.skipIf(importlib.util.find_spec("igraph") is None, "igraph is not installed")
+    def test_to_igraph(self):
+        graph = self.index.to_igraph()
+        self.assertEqual(graph.vcount(), 7)
+        self.assertEqual(graph.ecount(), 6)
+        orders = graph.vs.find(name="orders")
+        self.assertEqual(orders["entity_type"], "table")
+        self.assertEqual(sorted(graph.vs[v]["name"] for v in graph.successors(orders.index)),
+                         ["customers", "items", "orders.customer_id", "orders.id"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+import pytest
+
+from waii_sdk_py.kg import (
+    KnowledgeGraphImpl,
+    KnowledgeGraphStore,
+    GetKnowledgeGraphRequest,
+    KnowledgeGraphDirection,
+)
+from waii_sdk_py.kg.kg import GET_KNOWLEDGE_GRAPH_ENDPOINT
+
+TABLES = {
+    "orders": ["id", "customer_id"],
+    "customers": ["id", "region"],
+    "regions": ["name"],
+}
+
+# ask -> tables of the returned subgraph
+SUBGRAPHS = {
+    "orders by customer": ["orders", "customers"],
+    "customers by region": ["customers", "regions"],
+}
+
+
+def table_payload(table):
+    return {"entity_type": "table", "name": {"table_name": table, "schema_name": "s"},
+            "columns": [{"name": c, "type": "int"} for c in TABLES[table]]}
+
+
+def subgraph_payload(tables):
+    nodes, edges = [], []
+    for table in tables:
+        nodes.append({"id": table, "display_name": table, "entity_type": "table", "entity": table_payload(table)})
+        for column in TABLES[table]:
+            nodes.append({"id": f"{table}.{column}", "display_name": column, "entity_type": "column",
+                          "entity": {"entity_type": "column", "name": column, "type": "int"},
+                          "parent_entity": table_payload(table)})
+            edges.append({"edge_type": "table_to_column", "source_id": table, "target_id": f"{table}.{column}",
+                          "directed": True})
+    for source, target in zip(tables, tables[1:]):
+        edges.append({"edge_type": "constraint", "source_id": source, "target_id": target, "directed": True,
+                      "edge_entity": {"entity_type": "constraint", "cols": ["id"]}})
+    return {"graph": {"nodes": nodes, "edges": edges}}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestKnowledgeGraphStore(unittest.TestCase):
+    def setUp(self):
+        self.http_client = self.server.client()
+        self.server.route(GET_KNOWLEDGE_GRAPH_ENDPOINT,
+                          lambda body, headers: subgraph_payload(SUBGRAPHS[body["ask"].strip()]))
+        self.store = KnowledgeGraphStore(KnowledgeGraphImpl(self.http_client))
+
+    def asks(self):
+        return [body["ask"] for body in self.server.bodies(GET_KNOWLEDGE_GRAPH_ENDPOINT)]
+
+    def test_repeated_ask_is_served_from_memory(self):
+        first = self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="orders by customer"))
+        second = self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="  orders by customer "))
+
+        self.assertEqual(self.asks(), ["orders by customer"])
+        self.assertEqual([n.id for n in second.graph.nodes], [n.id for n in first.graph.nodes])
+        self.assertEqual(len(second.graph.edges), 5)
+
+        self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="orders by customer", use_cache=False))
+        self.assertEqual(len(self.asks()), 2)
+
+    def test_subgraphs_are_merged(self):
+        first = self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="orders by customer"))
+        second = self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="customers by region"))
+
+        graph = self.store.graph()
+        self.assertEqual(len(graph.nodes), 3 + 5)
+        self.assertEqual(len(graph.edges), 5 + 2)
+
+        # the customers nodes of both asks are the same objects
+        customers = [n for n in second.graph.nodes if n.id == "customers"][0]
+        self.assertIs(customers, [n for n in first.graph.nodes if n.id == "customers"][0])
+
+        path = self.store.index.join_path("orders", "regions")
+        self.assertEqual([(e.source_id, e.target_id) for e in path], [("orders", "customers"), ("customers", "regions")])
+        self.assertEqual(len(self.store.index.neighbors("customers", "table_to_column",
+                                                        KnowledgeGraphDirection.outgoing)), 2)
+
+    def test_entities_are_shared(self):
+        self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="orders by customer"))
+        self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="customers by region"))
+
+        index = self.store.index
+        table = index.node("customers").entity
+        self.assertIs(index.node("customers.id").parent_entity, table)
+        self.assertIs(index.node("customers.region").parent_entity, table)
+        self.assertIs(index.node("regions.name").parent_entity, index.node("regions").entity)
+
+    def test_scope_change_clears_store(self):
+        self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="orders by customer"))
+        self.http_client.set_scope("other_scope")
+        self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="customers by region"))
+
+        self.assertEqual(len(self.asks()), 2)
+        self.assertEqual(sorted(n.id for n in self.store.index.nodes_of_type("table")), ["customers", "regions"])
+
+    def test_api_key_not_kept(self):
+        self.http_client.apiKey = "secret-key"
+        self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="orders by customer"))
+        self.assertNotIn("secret-key", self.store._context)
+
+        # another api key is another context
+        self.http_client.apiKey = "other-key"
+        self.store.get_knowledge_graph(GetKnowledgeGraphRequest(ask="orders by customer"))
+        self.assertEqual(len(self.asks()), 2)
+
+    def test_request_not_modified(self):
+        params = GetKnowledgeGraphRequest(ask="orders by customer")
+        self.store.get_knowledge_graph(params)
+        self.store.get_knowledge_graph(params)
+        params.use_cache = False
+        self.store.get_knowledge_graph(params)
+        self.store.get_knowledge_graph(params)
+        self.assertEqual(self.asks(), ["orders by customer"] * 3)
+        self.assertEqual(params.dict(), GetKnowledgeGraphRequest(ask="orders by customer", use_cache=False).dict())
@@ -0,0 +1,147 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading
+import time
+import unittest
+
+import pytest
+
+from waii_sdk_py.settings import (
+    SettingsImpl,
+    ParameterCache,
+    Parameters,
+    UpdateParameterRequest,
+    DeleteParameterRequest,
+)
+from waii_sdk_py.settings.settings import (
+    UPDATE_PARAMETER_ENDPOINT,
+    LIST_PARAMETER_ENDPOINT,
+    DELETE_PARAMETER_ENDPOINT,
+)
+
+
+class FakeParameters:
+    """Parameters set per connection or per user (the user level wins), served by `server`"""
+
+    def __init__(self, server):
+        self.by_scope = {}
+        self.by_user = {}
+        # (scope, user) of every list
+        self.lists = []
+        self.lock = threading.Lock()
+        server.route(LIST_PARAMETER_ENDPOINT, self.list_parameters)
+        server.route(UPDATE_PARAMETER_ENDPOINT, self.update_parameter)
+        server.route(DELETE_PARAMETER_ENDPOINT, self.delete_parameter)
+
+    def list_parameters(self, body, headers):
+        user_id = headers.get("x-waii-impersonate-user") or body["user_id"]
+        with self.lock:
+            self.lists.append((body["scope"], user_id))
+            values = {**self.by_scope.get(body["scope"], {}), **self.by_user.get(user_id, {})}
+        return {"parameters": {
+            name: {"value": value, "possible_values": [True, False]} for name, value in values.items()
+        }}
+
+    def update_parameter(self, body, headers):
+        with self.lock:
+            self._target(body)[body["parameter"]] = body["value"]
+        return {}
+
+    def delete_parameter(self, body, headers):
+        with self.lock:
+            self._target(body).pop(body["parameter"], None)
+        return {}
+
+    def _target(self, body):
+        if body.get("target_user_id"):
+            return self.by_user.setdefault(body["target_user_id"], {})
+        return self.by_scope.setdefault(body.get("target_connection_key") or body["scope"], {})
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestParameterCache(unittest.TestCase):
+    def setUp(self):
+        self.http_client = self.server.client(scope="conn1", user_id="alice")
+        self.parameters = FakeParameters(self.server)
+        self.parameters.by_scope["conn1"] = {Parameters.LIKED_QUERIES_ENABLED.value: True,
+                                             Parameters.DEEP_THINKING_ENABLED.value: "false"}
+        self.parameters.by_scope["conn2"] = {Parameters.LIKED_QUERIES_ENABLED.value: False}
+        self.now = 0.0
+        self.settings = SettingsImpl(self.http_client)
+
+    def cache(self, **kwargs):
+        return ParameterCache(self.settings, clock=lambda: self.now, **kwargs)
+
+    def test_reads_per_context(self):
+        cache = self.cache(ttl_seconds=60)
+        for _ in range(100):
+            self.assertTrue(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+            self.assertFalse(cache.is_enabled(Parameters.DEEP_THINKING_ENABLED))
+        self.assertEqual(cache.get(Parameters.REFLECTION_ENABLED, "unset"), "unset")
+        self.assertEqual(cache.parameters()[Parameters.LIKED_QUERIES_ENABLED.value].possible_values, [True, False])
+        self.assertEqual(self.parameters.lists, [("conn1", "alice")])
+
+        self.http_client.set_scope("conn2")
+        self.assertFalse(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+        self.http_client.set_scope("conn1")
+        self.assertTrue(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+        self.assertEqual(self.parameters.lists, [("conn1", "alice"), ("conn2", "alice")])
+
+        self.parameters.by_scope["conn1"][Parameters.REFLECTION_ENABLED.value] = True
+        self.now = 61
+        self.assertTrue(cache.is_enabled(Parameters.REFLECTION_ENABLED))
+        self.assertEqual(len(self.parameters.lists), 3)
+
+    def test_invalidation(self):
+        cache = self.cache(ttl_seconds=None)
+        self.assertTrue(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+        self.http_client.set_scope("conn2")
+        self.assertFalse(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+        self.http_client.set_impersonate_user_id("bob")
+        self.assertFalse(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+        self.assertEqual(len(self.parameters.lists), 3)
+
+        # only bob's context is reloaded
+        cache.update_parameter(UpdateParameterRequest(parameter=Parameters.LIKED_QUERIES_ENABLED, value=True,
+                                                      target_user_id="bob"))
+        self.assertTrue(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+        self.http_client.set_impersonate_user_id("")
+        self.assertFalse(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED))
+        self.assertEqual(self.parameters.lists[3:], [("conn2", "bob")])
+
+        # only the contexts of conn1 are reloaded
+        cache.delete_parameter(DeleteParameterRequest(parameter=Parameters.LIKED_QUERIES_ENABLED,
+                                                      target_connection_key="conn1"))
+        self.http_client.set_scope("conn1")
+        self.assertFalse(cache.is_enabled(Parameters.LIKED_QUERIES_ENABLED, default=False))
+        self.assertEqual(self.parameters.lists[4:], [("conn1", "alice")])
+
+    def test_background_refresh(self):
+        cache = ParameterCache(self.settings, ttl_seconds=60, refresh_interval=0.01)
+        with cache:
+            self.assertFalse(cache.is_enabled(Parameters.REFLECTION_ENABLED))
+            self.parameters.by_scope["conn1"][Parameters.REFLECTION_ENABLED.value] = True
+            deadline = time.time() + 5
+            while not cache.is_enabled(Parameters.REFLECTION_ENABLED) and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(cache.is_enabled(Parameters.REFLECTION_ENABLED))
+        self.assertGreater(len(self.parameters.lists), 1)
+        # the refresher stopped
+        count = len(self.parameters.lists)
+        time.sleep(0.05)
+        self.assertEqual(len(self.parameters.lists), count)
+
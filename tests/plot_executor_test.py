@@ -0,0 +1,128 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import importlib.util
+import os
+import unittest
+
+import pandas as pd
+import pytest
+
+from waii_sdk_py.query import (
+    QueryImpl,
+    PlotExecutor,
+    PlotExecutionError,
+)
+from waii_sdk_py.query.query import PLOT_ENDPOINT
+
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+
+
+@unittest.skipIf(importlib.util.find_spec("matplotlib") is None, "matplotlib is not installed")
+@pytest.mark.usefixtures("waii_server")
+class TestPlotExecutor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = PlotExecutor(n_workers=2, timeout=5)
+        cls.df = pd.DataFrame({"month": [1, 2, 3], "flights": [10, 30, 20]})
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.close()
+
+    def query(self, plots, **kwargs) -> QueryImpl:
+        """A QueryImpl whose next plot requests are answered with the plot scripts in order"""
+        self.server.route_sequence(PLOT_ENDPOINT, [{"plots": [plot]} for plot in plots])
+        return QueryImpl(self.server.client(), **kwargs)
+
+    def asks(self):
+        return [body["ask"] for body in self.server.bodies(PLOT_ENDPOINT)]
+
+    def test_render_images(self):
+        result = self.executor.execute("plt.bar(df.month, df.flights)\nplt.show()", self.df)
+        self.assertEqual(len(result.images), 1)
+        self.assertTrue(result.images[0].startswith(PNG_MAGIC))
+
+    def test_frame_is_shared_across_runs(self):
+        with self.executor.frame(self.df) as frame:
+            futures = [self.executor.submit(f"df.plot(y='flights', title='{i}')", frame) for i in range(4)]
+            self.assertTrue(all(len(f.result()) == 1 for f in futures))
+
+    def test_error(self):
+        with self.assertRaises(PlotExecutionError) as e:
+            self.executor.execute("df['missing'].plot()", self.df)
+        self.assertIn("KeyError", str(e.exception))
+        # the traceback of the plot code, with the failing line
+        self.assertIn('File "<plot>", line 1', e.exception.traceback)
+        self.assertIn("df['missing'].plot()", e.exception.traceback)
+        self.assertNotIn("_worker_main", e.exception.traceback)
+        self.assertEqual(e.exception.code, "df['missing'].plot()")
+        # the worker is still usable
+        self.assertEqual(len(self.executor.execute("df.plot()", self.df).images), 1)
+
+    def test_timeout_replaces_worker(self):
+        with self.assertRaises(PlotExecutionError) as e:
+            self.executor.execute("while True:\n    pass", self.df)
+        self.assertIn("TimeoutError", str(e.exception))
+        for _ in range(3):
+            self.assertEqual(len(self.executor.execute("df.plot()", self.df).images), 1)
+
+    def test_worker_crash(self):
+        with self.assertRaises(PlotExecutionError):
+            self.executor.execute("import os\nos._exit(1)", self.df)
+        self.assertEqual(len(self.executor.execute("df.plot()", self.df).images), 1)
+
+    def test_render_plot_retries_with_error(self):
+        query = self.query(["```python\ndf['missing'].plot()\n```", "df.plot()"])
+
+        result = query.render_plot(self.df, ask="flights per month", executor=self.executor)
+
+        self.assertEqual(result.attempts, 2)
+        self.assertEqual(result.code, "df.plot()")
+        self.assertTrue(result.images[0].startswith(PNG_MAGIC))
+        asks = self.asks()
+        self.assertEqual(asks[0], "flights per month")
+        self.assertIn("df['missing'].plot()", asks[1])
+        self.assertIn("KeyError", asks[1])
+        self.assertIn('File "<plot>", line 1', asks[1])
+
+    def test_render_plot_gives_up(self):
+        query = self.query(["1/0", "1/0"])
+
+        with self.assertRaises(PlotExecutionError):
+            query.render_plot(self.df, executor=self.executor, max_retry=1)
+        self.assertEqual(len(self.asks()), 2)
+
+    def test_plot_runs_in_worker(self):
+        # the code fails when run in this process
+        code = f"import os\nassert os.getpid() != {os.getpid()}\ndf.plot()"
+        query = self.query(["df['missing'].plot()", code], plot_executor=self.executor)
+
+        self.assertEqual(query.plot(self.df, ask="flights", verbose=False), code)
+        self.assertIn('File "<plot>", line 1', self.asks()[1])
+
+        with self.assertRaises(PlotExecutionError) as e:
+            self.query(["1/0"]).plot(self.df, verbose=False, max_retry=0, executor=self.executor)
+        self.assertIn("ZeroDivisionError", e.exception.traceback)
+
+    def test_plot_runs_in_process_by_default(self):
+        code = f"import os\nassert os.getpid() == {os.getpid()}\ndf.plot()"
+        self.assertEqual(self.query(["df['missing'].plot()", code]).plot(self.df, ask="flights", verbose=False), code)
+        self.assertIn("missing", self.asks()[1])
+
+    def test_plot_without_exec(self):
+        query = self.query(["```python\ndf.plot()\n```"])
+        self.assertEqual(query.plot(self.df, automatically_exec=False, verbose=False), "df.plot()")
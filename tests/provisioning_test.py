@@ -0,0 +1,249 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pytest
+
+from waii_sdk_py.user import (
+    UserImpl,
+    Organization,
+    Tenant,
+    User,
+    ProvisioningManifest,
+    ProvisioningEngine,
+    ProvisioningJournal,
+    ProvisioningEntityType,
+    ProvisioningOperation,
+    ProvisioningActionStatus,
+)
+
+ENDPOINTS = ["list-orgs", "create-org", "update-org",
+             "list-tenants", "create-tenant", "update-tenant", "delete-tenant",
+             "list-users", "create-user", "update-user", "delete-user"]
+
+
+class FakeUsers:
+    """
+    Users, tenants and orgs served by `server`, calls on the ids in `failures` fail that many times, calls on the ids
+    in `lost` are applied but fail that many times
+    """
+
+    def __init__(self, server, orgs=(), tenants=(), users=(), failures=None, lost=None):
+        self.orgs = {o["id"]: o for o in orgs}
+        self.tenants = {t["id"]: t for t in tenants}
+        self.users = {u["id"]: u for u in users}
+        self.failures = dict(failures or {})
+        self.lost = dict(lost or {})
+        self.calls = []
+        self.lock = threading.Lock()
+        for endpoint in ENDPOINTS:
+            server.route(endpoint, lambda body, headers, endpoint=endpoint: self.handle(endpoint, body))
+
+    def handle(self, endpoint, body):
+        with self.lock:
+            return self._handle(endpoint, body)
+
+    def _handle(self, endpoint, body):
+        action, kind = endpoint.split("-", 1)
+        if action == "list":
+            org_id = body.get("lookup_org_id")
+            if kind == "orgs":
+                return {"organizations": list(self.orgs.values())}
+            if kind == "tenants":
+                return {"tenants": [t for t in self.tenants.values() if t.get("org_id") == org_id]}
+            return {"users": [u for u in self.users.values() if u.get("org_id") == org_id]}
+
+        entity = body.get({"org": "organization"}.get(kind, kind), {})
+        entity_id = entity.get("id", body.get("id"))
+        self.calls.append((endpoint, entity_id))
+        if self.failures.get(entity_id, 0) > 0:
+            self.failures[entity_id] -= 1
+            raise Exception(f"cannot {action} {entity_id}")
+        store = {"org": self.orgs, "tenant": self.tenants, "user": self.users}[kind]
+        if action == "create" and entity_id in store:
+            raise Exception(f"{kind} {entity_id} already exists")
+        if action == "delete":
+            del store[entity_id]
+        else:
+            store[entity_id] = entity
+        if self.lost.get(entity_id, 0) > 0:
+            self.lost[entity_id] -= 1
+            raise Exception("gateway timeout")
+        return {}
+
+
+def sample_manifest():
+    return ProvisioningManifest(
+        orgs=[Organization(id="acme", name="Acme")],
+        tenants=[Tenant(id=f"acme-t{i}", name=f"Team {i}", org_id="acme") for i in range(3)],
+        users=[User(id=f"u{i}", name=f"User {i}", org_id="acme", tenant_id=f"acme-t{i % 3}", roles=["waii-user"])
+               for i in range(20)],
+    )
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestProvisioning(unittest.TestCase):
+    def setUp(self):
+        self.user_impl = UserImpl(self.server.client(user_id="admin"))
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def apply(self, manifest, **kwargs):
+        engine = ProvisioningEngine(self.user_impl, max_concurrent=4, retry_interval=0, **kwargs)
+        return engine.apply(manifest)
+
+    def test_creates_in_dependency_order(self):
+        fake = FakeUsers(self.server)
+        result = self.apply(sample_manifest())
+
+        self.assertEqual(result.failed, [])
+        self.assertEqual(len(result.results), 24)
+        endpoints = [endpoint for endpoint, _ in fake.calls]
+        self.assertEqual(endpoints, ["create-org"] + ["create-tenant"] * 3 + ["create-user"] * 20)
+        self.assertEqual(fake.users["u4"]["tenant_id"], "acme-t1")
+
+        # applying again does nothing
+        self.assertEqual(self.apply(sample_manifest()).results, [])
+
+    def test_minimal_diff(self):
+        fake = FakeUsers(self.server)
+        self.apply(sample_manifest())
+        fake.users["u1"]["roles"] = ["waii-user", "waii-api-user"]
+        fake.users["u2"]["variables"] = {"region": "eu"}
+        fake.users["extra"] = {"id": "extra", "org_id": "acme"}
+        fake.users["admin"] = {"id": "admin", "org_id": "acme"}
+        fake.calls = []
+
+        manifest = sample_manifest()
+        manifest.users[1].roles = ["waii-api-user", "waii-user"]
+        manifest.users[2] = User(id="u2", org_id="acme", tenant_id="acme-t0")
+        manifest.tenants = manifest.tenants[:2]
+        manifest.users = [u for u in manifest.users if u.tenant_id != "acme-t2"]
+        self.apply(manifest, delete_missing=True)
+
+        # roles are compared as sets, fields not in the manifest are kept, the caller is not deleted
+        self.assertEqual(sorted(fake.calls), sorted(
+            [("update-user", "u2"), ("delete-user", "extra"), ("delete-tenant", "acme-t2")]
+            + [("delete-user", f"u{i}") for i in range(20) if i % 3 == 2 and i != 2]
+        ))
+        self.assertEqual(fake.calls[-1], ("delete-tenant", "acme-t2"))
+        self.assertEqual(fake.users["u2"]["tenant_id"], "acme-t0")
+        self.assertEqual(fake.users["u2"]["variables"], {"region": "eu"})
+        self.assertIn("admin", fake.users)
+
+    def test_retries_and_failed_dependencies(self):
+        fake = FakeUsers(self.server, failures={"u3": 2, "acme-t1": 10})
+        result = self.apply(sample_manifest(), max_retries=3)
+
+        by_id = {r.action.id: r for r in result.results}
+        self.assertEqual(by_id["u3"].status, ProvisioningActionStatus.SUCCEEDED)
+        self.assertEqual(by_id["u3"].attempts, 3)
+        self.assertEqual(by_id["acme-t1"].status, ProvisioningActionStatus.FAILED)
+        self.assertEqual(by_id["acme-t1"].attempts, 4)
+        # users of the tenant which couldn't be created are not tried
+        self.assertEqual({r.action.id for r in result.failed}, {"acme-t1", "u1", "u4", "u7", "u10", "u13", "u16", "u19"})
+        self.assertIn("tenant acme-t1 could not be created", by_id["u1"].error)
+        self.assertNotIn(("create-user", "u1"), fake.calls)
+
+    def test_create_retry_when_it_exists(self):
+        # the creates of the tenant and of u2 were applied but failed, u5 was created concurrently with other fields
+        fake = FakeUsers(self.server, lost={"acme-t1": 1, "u2": 5})
+        actions = ProvisioningEngine(self.user_impl).plan(sample_manifest())
+        fake.users["u5"] = {"id": "u5", "name": "Someone else", "org_id": "acme", "tenant_id": "acme-t2"}
+
+        result = self.apply(actions, max_retries=1)
+
+        self.assertEqual(result.failed, [])
+        by_id = {r.action.id: r for r in result.results}
+        self.assertEqual(by_id["acme-t1"].attempts, 1)
+        self.assertEqual(by_id["u2"].attempts, 1)
+        self.assertEqual(fake.calls.count(("create-tenant", "acme-t1")), 1)
+        # users of the tenant are created
+        self.assertEqual(fake.users["u1"]["tenant_id"], "acme-t1")
+        # u5 is updated instead
+        self.assertEqual(by_id["u5"].attempts, 2)
+        self.assertIn(("update-user", "u5"), fake.calls)
+        self.assertEqual(fake.users["u5"]["name"], "User 5")
+        self.assertEqual(fake.users["u5"]["roles"], ["waii-user"])
+
+    def test_journal_resume(self):
+        journal = ProvisioningJournal(os.path.join(self.directory, "journal.jsonl"))
+        FakeUsers(self.server)
+        actions = ProvisioningEngine(self.user_impl).plan(sample_manifest())
+
+        fake = FakeUsers(self.server, failures={"u5": 10})
+        result = self.apply(actions, journal=journal, max_retries=0)
+        self.assertEqual([r.action.id for r in result.failed], ["u5"])
+
+        # the same actions again: only the failed one is applied
+        fake.calls = []
+        fake.failures = {}
+        result = self.apply(actions, journal=journal)
+        self.assertEqual(fake.calls, [("create-user", "u5")])
+        self.assertEqual(sum(r.status == ProvisioningActionStatus.SKIPPED for r in result.results), 23)
+        self.assertEqual(len(journal.succeeded()), 24)
+
+    def test_entities_matched_within_their_org(self):
+        # the same tenant and user ids exist in another org of the manifest
+        fake = FakeUsers(self.server, tenants=[{"id": "t0", "name": "Team 0", "org_id": "beta"}],
+                         users=[{"id": "u0", "org_id": "beta", "tenant_id": "t0"}])
+        manifest = ProvisioningManifest(
+            orgs=[Organization(id="acme", name="Acme"), Organization(id="beta", name="Beta")],
+            tenants=[Tenant(id="t0", name="Team 0", org_id="acme"), Tenant(id="t0", name="Team 0", org_id="beta")],
+            users=[User(id="u0", org_id="acme", tenant_id="t0")],
+        )
+        fake.orgs = {o.id: o.dict() for o in manifest.orgs}
+        actions = ProvisioningEngine(self.user_impl, delete_missing=True).plan(manifest)
+
+        self.assertEqual(sorted((a.entity_type.value, a.operation.value, a.org_id, a.id) for a in actions), [
+            ("tenant", "create", "acme", "t0"),
+            ("user", "create", "acme", "u0"),
+            ("user", "delete", "beta", "u0"),
+        ])
+
+    def test_delete_missing_requires_named_orgs(self):
+        fake = FakeUsers(self.server, users=[{"id": "someone", "org_id": None}])
+        engine = ProvisioningEngine(self.user_impl, delete_missing=True)
+        manifests = [
+            # the org of the caller is not deleted from by default
+            ProvisioningManifest(users=[User(id="u0")]),
+            ProvisioningManifest(orgs=[Organization(id="acme", name="Acme")], users=[User(id="u0")]),
+            ProvisioningManifest(orgs=[Organization(id="acme", name="Acme")], users=[User(id="u0", org_id="beta")]),
+        ]
+        for manifest in manifests:
+            with self.assertRaises(ValueError):
+                engine.plan(manifest)
+        # without delete_missing, the org of the caller is compared
+        actions = ProvisioningEngine(self.user_impl).plan(manifests[0])
+        self.assertEqual([(a.operation, a.org_id, a.id) for a in actions],
+                         [(ProvisioningOperation.CREATE, None, "u0")])
+        self.assertEqual(fake.calls, [])
+
+    def test_plan(self):
+        FakeUsers(self.server, orgs=[{"id": "acme", "name": "Old name"}])
+        actions = ProvisioningEngine(self.user_impl).plan(sample_manifest())
+        self.assertEqual((actions[0].entity_type, actions[0].operation), (ProvisioningEntityType.ORG,
+                                                                         ProvisioningOperation.UPDATE))
+        self.assertEqual(actions[0].entity.name, "Acme")
+        self.assertTrue(all(a.operation == ProvisioningOperation.CREATE for a in actions[1:]))
+
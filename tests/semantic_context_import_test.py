@@ -0,0 +1,171 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import io
+import threading
+import unittest
+
+import pytest
+
+from waii_sdk_py.semantic_context import (
+    SemanticContextImpl,
+    SemanticStatement,
+    SemanticStatementStore,
+    read_statements,
+)
+from waii_sdk_py.semantic_context.semantic_context import MODIFY_ENDPOINT, GET_ENDPOINT
+
+
+class FakeStatements:
+    """
+    Statements served by `server`, statements with BAD fail the request, statements with LOST are applied but the
+    request fails
+    """
+
+    def __init__(self, server, statements=()):
+        self.statements = {s.id: s.dict() for s in statements}
+        self.requests = []
+        self.reads = 0
+        self.lock = threading.Lock()
+        server.route(MODIFY_ENDPOINT, self.modify_semantic_context)
+        server.route(GET_ENDPOINT, self.get_semantic_context)
+
+    def modify_semantic_context(self, body, headers):
+        with self.lock:
+            self.requests.append([s["statement"] for s in body["updated"]])
+            if any('BAD' in s["statement"] for s in body["updated"]):
+                raise Exception("invalid statement")
+            updated = [dict(s, id=s.get("id") or f"new-{s['statement']}") for s in body["updated"]]
+            self.statements.update({s["id"]: s for s in updated})
+            if any('LOST' in s["statement"] for s in body["updated"]):
+                raise Exception("read timed out")
+        return {"updated": updated}
+
+    def get_semantic_context(self, body, headers):
+        with self.lock:
+            self.reads += 1
+            statements = list(self.statements.values())
+        return {"semantic_context": statements[body["offset"]:body["offset"] + body["limit"]],
+                "available_statements": len(statements)}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        self.impl = SemanticContextImpl(self.server.client())
+
+    def test_read_jsonl_and_yaml(self):
+        jsonl = io.StringIO('{"statement": "a", "labels": ["x"]}\n\n{"statement": "b", "scope": "s"}\n')
+        self.assertEqual([s.statement for s in read_statements(jsonl)], ["a", "b"])
+
+        yaml_text = io.StringIO("- statement: a\n- statement: b\n---\nstatement: c\nscope: t\n")
+        self.assertEqual([s.statement for s in read_statements(yaml_text, format='yaml')], ["a", "b", "c"])
+
+    def test_dedupe_diff_and_failures(self):
+        server = FakeStatements(self.server)
+
+        existing = SemanticStatementStore([
+            SemanticStatement(id="e1", statement="Unchanged rule", scope="db"),
+            SemanticStatement(id="e2", statement="Changed rule", scope="db", labels=["old"]),
+        ])
+        statements = [
+            SemanticStatement(statement="Unchanged rule", scope="db"),
+            SemanticStatement(statement="unchanged   RULE", scope="DB"),
+            SemanticStatement(statement="Changed rule", scope="db", labels=["new"]),
+            SemanticStatement(statement="new rule", scope="db"),
+            SemanticStatement(statement="New  rule", scope="db"),
+            SemanticStatement(statement="BAD rule"),
+        ] + [SemanticStatement(statement=f"rule {i}") for i in range(10)]
+
+        result = self.impl.bulk_import(statements, chunk_size=4, max_concurrent=3, existing=existing)
+
+        self.assertEqual(result.n_duplicates, 2)
+        self.assertEqual(result.n_unchanged, 0)
+        # the last duplicate wins, its text differs from the server state so it is updated in place
+        self.assertEqual(len(result.failures), 1)
+        self.assertEqual(result.failures[0].statement.statement, "BAD rule")
+        updated = {s.statement: s for s in result.updated}
+        self.assertEqual(len(updated), 13)
+        self.assertEqual(updated["Changed rule"].id, "e2")
+        self.assertEqual(updated["unchanged   RULE"].id, "e1")
+        self.assertTrue(all(len(r) <= 4 for r in server.requests))
+
+    def test_skip_unchanged(self):
+        FakeStatements(self.server)
+        existing = SemanticStatementStore([SemanticStatement(id="e1", statement="rule", labels=["a", "b"])])
+
+        result = self.impl.bulk_import([SemanticStatement(statement="rule", labels=["b", "a"])], existing=existing)
+
+        self.assertEqual(result.n_unchanged, 1)
+        self.assertEqual(result.updated, [])
+
+    def test_unknown_id_matches_text(self):
+        server = FakeStatements(self.server)
+        existing = SemanticStatementStore([SemanticStatement(id="e1", statement="rule", scope="db")])
+
+        result = self.impl.bulk_import([SemanticStatement(id="other-env", statement="Rule", scope="db"),
+                                        SemanticStatement(id="other-env-2", statement="same", scope="db")],
+                                       existing=existing)
+
+        self.assertEqual(result.n_unchanged, 0)
+        self.assertEqual(sorted(s.id for s in result.updated), ["e1", "other-env-2"])
+
+    def test_retry_skips_landed_statements(self):
+        server = FakeStatements(self.server, [SemanticStatement(id="e1", statement="old", labels=["a"])])
+
+        statements = [SemanticStatement(statement="LOST rule"), SemanticStatement(statement="rule 1"),
+                      SemanticStatement(statement="old", labels=["b"]), SemanticStatement(statement="BAD rule")]
+        # the first chunk is applied, but its response is lost
+        result = self.impl.bulk_import(statements[:3], chunk_size=10)
+        self.assertEqual(result.failures, [])
+        self.assertEqual(sorted(s.id for s in result.updated), ["e1", "new-LOST rule", "new-rule 1"])
+        # only the update (matched by id) is sent again
+        self.assertEqual(server.requests, [["LOST rule", "rule 1", "old"], ["old"]])
+        self.assertEqual(len(server.statements), 3)
+
+        # a chunk which wasn't applied is retried statement by statement
+        result = self.impl.bulk_import([SemanticStatement(statement="rule 2"), statements[3]], chunk_size=10)
+        self.assertEqual([s.statement for s in result.updated], ["rule 2"])
+        self.assertEqual([f.statement.statement for f in result.failures], ["BAD rule"])
+        self.assertEqual(sorted(server.requests[-2:]), [["BAD rule"], ["rule 2"]])
+
+    def test_server_state_read_once(self):
+        server = FakeStatements(self.server)
+
+        statements = [SemanticStatement(statement=text)
+                      for text in ["BAD 0", "rule 1", "LOST 2", "LOST 3", "BAD 4", "rule 5", "LOST 6", "rule 7"]]
+        result = self.impl.bulk_import(statements, chunk_size=2, max_concurrent=3,
+                                       existing=SemanticStatementStore([]))
+
+        self.assertEqual(sorted(f.statement.statement for f in result.failures), ["BAD 0", "BAD 4"])
+        self.assertEqual(len(result.updated), 6)
+        self.assertEqual(server.reads, 1)
+
+    def test_retry_without_server_state(self):
+        server = FakeStatements(self.server)
+        existing = SemanticStatementStore([SemanticStatement(id="e1", statement="old")])
+
+        def unavailable(body, headers):
+            raise Exception("unavailable")
+
+        self.server.route(GET_ENDPOINT, unavailable)
+        result = self.impl.bulk_import([SemanticStatement(statement="BAD new"),
+                                        SemanticStatement(statement="old", scope="s"),
+                                        SemanticStatement(statement="changed BAD", id="e2")], existing=existing)
+        self.assertEqual(sorted(f.statement.statement for f in result.failures), ["BAD new", "changed BAD", "old"])
+        # the statements without id are not sent again
+        self.assertEqual(server.requests[1:], [["changed BAD"]])
+
@@ -0,0 +1,96 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+import pytest
+
+from waii_sdk_py.semantic_context import (
+    SemanticContextImpl,
+    AsyncSemanticContextImpl,
+    SemanticStatementStore,
+)
+from waii_sdk_py.semantic_context.semantic_context import GET_ENDPOINT
+
+N_STATEMENTS = 2345
+
+
+def serve_statements(server, n_statements, report_total=True):
+    statements = [{"id": f"id-{i}", "statement": f"rule {i}", "labels": ["finance"], "scope": "db.schema"}
+                  for i in range(n_statements)]
+    server.route(GET_ENDPOINT, lambda body, headers: {
+        "semantic_context": statements[body["offset"]:body["offset"] + body["limit"]],
+        "available_statements": n_statements if report_total else 0,
+    })
+
+
+def requested_offsets(server):
+    return [body["offset"] for body in server.bodies(GET_ENDPOINT)]
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestIterStatements(unittest.TestCase):
+    def setUp(self):
+        self.impl = SemanticContextImpl(self.server.client())
+
+    def test_iter_all_pages_in_order(self):
+        serve_statements(self.server, N_STATEMENTS)
+
+        ids = [s.id for s in self.impl.iter_statements(page_size=100, prefetch=3)]
+
+        self.assertEqual(ids, [f"id-{i}" for i in range(N_STATEMENTS)])
+        self.assertEqual(sorted(requested_offsets(self.server)), list(range(0, N_STATEMENTS, 100)))
+
+    def test_iter_without_available_statements(self):
+        serve_statements(self.server, 250, report_total=False)
+
+        ids = [s.id for s in self.impl.iter_statements(page_size=100)]
+
+        self.assertEqual(len(ids), 250)
+        self.assertEqual(requested_offsets(self.server), [0, 100, 200])
+
+    def test_materialize_into_store(self):
+        serve_statements(self.server, N_STATEMENTS)
+        store = SemanticStatementStore()
+
+        for _ in self.impl.iter_statements(page_size=500, store=store):
+            pass
+
+        self.assertEqual(len(store), N_STATEMENTS)
+        self.assertEqual(store.get("id-42").statement, "rule 42")
+
+    def test_early_stop(self):
+        serve_statements(self.server, N_STATEMENTS)
+
+        iterator = self.impl.iter_statements(page_size=100, prefetch=2)
+        first = [next(iterator) for _ in range(5)]
+        iterator.close()
+
+        self.assertEqual(len(first), 5)
+        self.assertLessEqual(len(requested_offsets(self.server)), 3)
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestAsyncIterStatements(IsolatedAsyncioTestCase):
+    async def test_async_iter(self):
+        serve_statements(self.server, N_STATEMENTS)
+        impl = AsyncSemanticContextImpl(self.server.client())
+
+        ids = [s.id async for s in impl.iter_statements(page_size=1000)]
+
+        self.assertEqual(len(ids), N_STATEMENTS)
+
@@ -0,0 +1,82 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+from unittest.mock import Mock
+
+from waii_sdk_py.semantic_context import (
+    SemanticContextMirror,
+    SemanticStatement,
+    GetSemanticContextRequestFilter,
+    ModifySemanticContextRequest,
+    ModifySemanticContextResponse,
+    DisableSemanticContextRequest,
+    DisableSemanticContextResponse,
+)
+
+STATEMENTS = [
+    SemanticStatement(id="1", statement="Revenue is recognized at shipment", labels=["finance", "revenue"],
+                      scope="sales.orders", always_include=True),
+    SemanticStatement(id="2", statement="Active users logged in during the last 30 days", labels=["product"],
+                      scope="app.users", always_include=False, lookup_summaries=["DAU", "MAU definition"]),
+    SemanticStatement(id="3", statement="Net revenue excludes refunds", labels=["Finance"],
+                      scope="sales.refunds", always_include=False),
+]
+
+
+class TestSemanticContextMirror(unittest.TestCase):
+    def setUp(self):
+        self.semantic_context = Mock()
+        self.semantic_context.http_client.get_scope.return_value = "snowflake://conn"
+        self.semantic_context.iter_statements.side_effect = \
+            lambda page_size, prefetch, store: [store.add(s.copy()) for s in STATEMENTS]
+        self.mirror = SemanticContextMirror(self.semantic_context).load()
+
+    def _ids(self, **kwargs):
+        return [s.id for s in self.mirror.search(**kwargs).semantic_context]
+
+    def test_filter_semantics(self):
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(labels=["FIN"])), ["1", "3"])
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(labels=["fin", "rev"])), ["1"])
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(scope="sales")), ["1", "3"])
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(statement="nue")), ["1", "3"])
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(statement="net rev")), ["3"])
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(always_include=False, scope="sales")), ["3"])
+        self.assertEqual(self._ids(search_text="mau def"), ["2"])
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(statement="%")), [])
+
+    def test_pagination(self):
+        response = self.mirror.search(offset=1, limit=1)
+        self.assertEqual(response.available_statements, 3)
+        self.assertEqual([s.id for s in response.semantic_context], ["2"])
+
+    def test_incremental_updates(self):
+        self.semantic_context.modify_semantic_context.return_value = ModifySemanticContextResponse(
+            updated=[SemanticStatement(id="3", statement="Gross margin", labels=["finance"], scope="sales.margin")],
+            deleted=["1"],
+        )
+        self.mirror.modify_semantic_context(ModifySemanticContextRequest())
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(statement="revenue")), [])
+        self.assertEqual(self._ids(filter=GetSemanticContextRequestFilter(statement="margin")), ["3"])
+        self.assertEqual(len(self.mirror), 2)
+
+        self.semantic_context.disable_semantic_context.return_value = DisableSemanticContextResponse(statement_ids=["2"])
+        self.mirror.disable_semantic_context(DisableSemanticContextRequest(statement_ids=["2"]))
+        self.assertFalse(self.mirror.get("2").enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pytest
+
+from waii_sdk_py.semantic_layer_dump import (
+    SemanticLayerDumpImpl,
+    SemanticLayerBackup,
+    SemanticLayerBackupStatus,
+)
+from waii_sdk_py.semantic_layer_dump.semantic_layer_dump import EXPORT_SEMANTIC_DUMP, EXPORT_SEMANTIC_DUMP_STATUS
+
+
+class FakeExports:
+    """
+    Exports of many connections served by `server`: every export takes `polls` status polls, the export of "missing"
+    can't be started and the export of "broken" fails
+    """
+
+    def __init__(self, server, dumps, polls=3):
+        self.server = server
+        self.dumps = dumps
+        self.polls = polls
+        self.ops = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server.route(EXPORT_SEMANTIC_DUMP, self.export)
+        server.route(EXPORT_SEMANTIC_DUMP_STATUS, self.status)
+
+    def export(self, body, headers):
+        key = body["db_conn_key"]
+        if key == "missing":
+            return self.server.response({"detail": "connection not found"}, 404)
+        with self.lock:
+            op_id = f"op-{len(self.ops)}"
+            self.ops[op_id] = [key, 0]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return {"op_id": op_id}
+
+    def status(self, body, headers):
+        with self.lock:
+            op = self.ops[body["op_id"]]
+            op[1] += 1
+            key = op[0]
+            if op[1] < self.polls:
+                return {"op_id": body["op_id"], "status": "in_progress"}
+            self.in_flight -= 1
+        if key == "broken":
+            return {"op_id": body["op_id"], "status": "failed", "info": "export failed"}
+        return {"op_id": body["op_id"], "status": "succeeded", "info": self.dumps[key]}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestSemanticLayerBackup(unittest.TestCase):
+    def setUp(self):
+        self.dump_impl = SemanticLayerDumpImpl(self.server.client())
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_backup(self, keys, max_concurrent=4):
+        backup = SemanticLayerBackup(self.dump_impl, self.directory, max_concurrent=max_concurrent, poll_interval=0)
+        events = list(backup.run(keys))
+        return backup, {e.db_conn_key: e for e in events if e.status != SemanticLayerBackupStatus.EXPORTING}, events
+
+    def test_backup_many_connections(self):
+        dumps = {f"conn{i}": {"tables": [{"name": f"t{i % 10}"}]} for i in range(30)}
+        exports = FakeExports(self.server, dumps)
+        backup, results, events = self.run_backup(list(dumps) + ["missing", "broken"], max_concurrent=4)
+
+        self.assertEqual(exports.max_in_flight, 4)
+        self.assertEqual(len(events), 30 * 2 + 1 + 2)
+        self.assertEqual(results["missing"].status, SemanticLayerBackupStatus.FAILED)
+        self.assertIn("connection not found", results["missing"].error)
+        self.assertEqual(results["broken"].status, SemanticLayerBackupStatus.FAILED)
+        self.assertIn("export failed", results["broken"].error)
+
+        manifest = backup.load_manifest()
+        self.assertEqual(set(manifest.connections), set(dumps))
+        for key, dump in dumps.items():
+            self.assertEqual(results[key].status, SemanticLayerBackupStatus.SAVED)
+            with gzip.open(os.path.join(self.directory, manifest.connections[key].path)) as f:
+                self.assertEqual(json.load(f), dump)
+        # content-addressed: connections with the same dump share a file
+        objects = [f for _, _, files in os.walk(os.path.join(self.directory, "objects")) for f in files]
+        self.assertEqual(len(objects), 10)
+        # no temporary files are left
+        self.assertEqual(sorted(os.listdir(self.directory)), ["manifest.json", "objects"])
+
+    def test_unchanged_connections(self):
+        dumps = {"a": {"tables": [1]}, "b": {"tables": [2]}}
+        FakeExports(self.server, dumps)
+        self.run_backup(list(dumps))
+        dumps["b"] = {"tables": [3]}
+        FakeExports(self.server, dumps)
+        backup, results, _ = self.run_backup(list(dumps))
+
+        self.assertEqual(results["a"].status, SemanticLayerBackupStatus.UNCHANGED)
+        self.assertEqual(results["b"].status, SemanticLayerBackupStatus.SAVED)
+        self.assertEqual(backup.load_manifest().connections["b"].sha256, results["b"].entry.sha256)
+        objects = [f for _, _, files in os.walk(os.path.join(self.directory, "objects")) for f in files]
+        self.assertEqual(len(objects), 3)
+
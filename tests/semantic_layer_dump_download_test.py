@@ -0,0 +1,202 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytest
+import requests
+
+from waii_sdk_py.semantic_layer_dump import (
+    SemanticLayerDumpImpl,
+    ExportSemanticLayerDumpRequest,
+    SemanticLayerDumpDownload,
+)
+from waii_sdk_py.semantic_layer_dump.semantic_layer_dump import EXPORT_SEMANTIC_DUMP, EXPORT_SEMANTIC_DUMP_STATUS
+from waii_sdk_py.utils import JsonObjectScanner
+
+
+def sample_dump(n_tables=200):
+    return {
+        "tables": [{"name": f"t{i}", "description": f"table \"{i}\" {{with}} [brackets]",
+                    "columns": [{"name": f"c{j}", "type": "int"} for j in range(10)]} for i in range(n_tables)],
+        "semantic_statements": [{"statement": "a\\b\n", "labels": []}],
+    }
+
+
+class FakeExport:
+    """
+    Export served by `server`, the status is in progress for `in_progress_polls` polls, Range requests are supported
+    """
+
+    def __init__(self, server, dump, in_progress_polls=1, fail_after=None, support_range=True,
+                 final_status="succeeded", range_offset=0):
+        self.server = server
+        self.dump = dump
+        # answer Range requests with a range starting this many bytes after the requested one
+        self.range_offset = range_offset
+        self.final_status = final_status
+        self.in_progress_polls = in_progress_polls
+        # fail the transfer of the succeeded response after this many bytes, once per value
+        self.fail_after = list(fail_after or [])
+        self.support_range = support_range
+        self.status_requests = []
+        server.route(EXPORT_SEMANTIC_DUMP, lambda body, headers: {"op_id": "op-1"})
+        server.route(EXPORT_SEMANTIC_DUMP_STATUS, self.status)
+
+    def status(self, body, headers):
+        self.status_requests.append(headers.get("Range"))
+        if self.in_progress_polls > 0:
+            self.in_progress_polls -= 1
+            content = json.dumps({"op_id": "op-1", "status": "in_progress", "info": None}).encode()
+        else:
+            content = json.dumps({"op_id": "op-1", "status": self.final_status, "info": self.dump}, indent=1).encode()
+        status_code, response_headers, offset = 200, {}, 0
+        if headers.get("Range") and self.support_range:
+            offset = int(headers["Range"][len("bytes="):-1]) + self.range_offset
+            status_code = 206
+            response_headers["Content-Range"] = f"bytes {offset}-{len(content) - 1}/{len(content)}"
+        content = content[offset:]
+        fail_after = self.fail_after.pop(0) if self.fail_after and len(content) > 1000 else None
+
+        def chunks(chunk_size):
+            for i in range(0, len(content), 100):
+                if fail_after is not None and i >= fail_after:
+                    raise requests.exceptions.ChunkedEncodingError("connection reset")
+                yield content[i:i + 100]
+
+        return self.server.response(status_code=status_code, headers=response_headers, content=content, chunks=chunks)
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestSemanticLayerDumpDownload(unittest.TestCase):
+    def setUp(self):
+        self.dump_impl = SemanticLayerDumpImpl(self.server.client())
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, destination, **kwargs):
+        return self.dump_impl.export_dump_to_file(
+            ExportSemanticLayerDumpRequest(db_conn_key="conn"), destination, poll_interval=0, **kwargs
+        )
+
+    def test_export_to_file(self):
+        dump = sample_dump()
+        export = FakeExport(self.server, dump, in_progress_polls=2)
+        path = os.path.join(self.directory, "dump.json")
+        result = self.export(path)
+
+        with open(path, "rb") as f:
+            content = f.read()
+        self.assertEqual(json.loads(content), dump)
+        self.assertEqual(result.path, path)
+        self.assertEqual(result.size, len(content))
+        self.assertEqual(result.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(len(export.status_requests), 3)
+        # only the dump is left
+        self.assertEqual(os.listdir(self.directory), ["dump.json"])
+
+    def test_resume_interrupted_download(self):
+        dump = sample_dump()
+        export = FakeExport(self.server, dump, in_progress_polls=0, fail_after=[3000, 5000])
+        path = os.path.join(self.directory, "dump.json")
+        self.export(path)
+
+        with open(path) as f:
+            self.assertEqual(json.load(f), dump)
+        self.assertIsNone(export.status_requests[0])
+        self.assertEqual(export.status_requests[1], "bytes=3000-")
+        self.assertEqual(export.status_requests[2], "bytes=8000-")
+        self.assertEqual(os.listdir(self.directory), ["dump.json"])
+
+    def test_server_without_range_support(self):
+        dump = sample_dump()
+        FakeExport(self.server, dump, in_progress_polls=0, fail_after=[3000], support_range=False)
+        out = io.BytesIO()
+        self.export(out)
+        self.assertEqual(json.loads(out.getvalue()), dump)
+
+    def test_unexpected_range(self):
+        dump = sample_dump()
+        export = FakeExport(self.server, dump, in_progress_polls=0, fail_after=[3000], range_offset=100)
+        path = os.path.join(self.directory, "dump.json")
+        self.export(path)
+
+        # the range doesn't start where the download stopped: it starts over
+        self.assertEqual(export.status_requests, [None, "bytes=3000-", None])
+        with open(path) as f:
+            self.assertEqual(json.load(f), dump)
+
+    def test_restart_into_file_object(self):
+        dump = sample_dump()
+        FakeExport(self.server, dump, in_progress_polls=0, fail_after=[3000, 5000], support_range=False)
+        out = io.BytesIO(b"header\n")
+        out.seek(0, io.SEEK_END)
+        result = self.export(out, compress=True)
+
+        self.assertTrue(out.getvalue().startswith(b"header\n"))
+        self.assertEqual(json.loads(gzip.decompress(out.getvalue()[len(b"header\n"):])), dump)
+        self.assertEqual(result.size, len(out.getvalue()) - len(b"header\n"))
+
+    def test_gzip(self):
+        dump = sample_dump()
+        path = os.path.join(self.directory, "dump.json.gz")
+        FakeExport(self.server, dump)
+        result = self.export(path)
+
+        self.assertTrue(result.compressed)
+        self.assertEqual(result.size, os.path.getsize(path))
+        with gzip.open(path, "rb") as f:
+            content = f.read()
+        self.assertEqual(json.loads(content), dump)
+        self.assertEqual(result.dump_size, len(content))
+        self.assertEqual(result.sha256, hashlib.sha256(content).hexdigest())
+
+    def test_failed_export(self):
+        FakeExport(self.server, "no such connection", in_progress_polls=0, final_status="failed")
+        path = os.path.join(self.directory, "dump.json")
+        with self.assertRaisesRegex(Exception, "no such connection"):
+            self.export(path)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class TestJsonObjectScanner(unittest.TestCase):
+    def test_members_in_small_chunks(self):
+        obj = {"op_id": "x", "info": sample_dump(5), "status": "succeeded", "other": [1, {"a": "}"}]}
+        body = json.dumps(obj, indent=2).encode()
+        for chunk_size in (1, 7, 1 << 20):
+            streamed = []
+            scanner = JsonObjectScanner(capture=("status", "op_id"), stream={"info": streamed.append})
+            for i in range(0, len(body), chunk_size):
+                scanner.feed(body[i:i + chunk_size])
+            self.assertEqual(scanner.close(), {"status": "succeeded", "op_id": "x"})
+            self.assertEqual(json.loads(b"".join(streamed)), obj["info"])
+
+    def test_capture_limit_and_incomplete_object(self):
+        scanner = JsonObjectScanner(capture=("a", "b"), max_capture_bytes=10)
+        scanner.feed(b'{"a": "0123456789abc", "b": 1')
+        with self.assertRaises(ValueError):
+            scanner.close()
+        scanner.feed(b'}')
+        self.assertEqual(scanner.close(), {"b": 1})
@@ -0,0 +1,251 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pytest
+
+from waii_sdk_py.common import OperationStatus
+from waii_sdk_py.semantic_layer_dump import (
+    SemanticLayerDumpImpl,
+    SemanticLayerDumpRewriter,
+    FileImportStateStore,
+)
+from waii_sdk_py.semantic_layer_dump.semantic_layer_dump import IMPORT_SEMANTIC_DUMP, IMPORT_SEMANTIC_DUMP_STATUS
+from waii_sdk_py.utils import JsonObjectScanner, JsonArrayItems
+
+
+def sample_dump():
+    return {
+        "version": "1.0",
+        "metadata": {"source_dialect": "snowflake", "source_database": "DEV"},
+        "database": {"content_filters": []},
+        "tables": [{"name": f"t{i}", "schema_name": "sales", "columns": [{"name": "id", "type": "int"}]}
+                   for i in range(25)],
+        "schemas": [{"name": "SALES", "description": {"summary": "sales.orders is the main table"}}],
+        "liked_queries": [{"ask": f"q{i}", "query": f"SELECT * FROM dev.sales.t{i} JOIN sales.t0 USING (id)"}
+                          for i in range(7)],
+    }
+
+
+class FakeImports:
+    """Imports served by `server`, every import is in progress for one status poll, imports of "fail" tables fail"""
+
+    def __init__(self, server):
+        self.configurations = {}
+        self.polls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # the import to start with a connection error
+        self.fail_import = None
+        self.lock = threading.Lock()
+        server.route(IMPORT_SEMANTIC_DUMP, self.start)
+        server.route(IMPORT_SEMANTIC_DUMP_STATUS, self.status)
+
+    def start(self, body, headers):
+        with self.lock:
+            if len(self.configurations) == self.fail_import:
+                raise ConnectionError("connection reset")
+            op_id = f"op-{len(self.configurations)}"
+            self.configurations[op_id] = body
+            self.polls[op_id] = 0
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return {"op_id": op_id}
+
+    def status(self, body, headers):
+        with self.lock:
+            op_id = body["op_id"]
+            self.polls[op_id] += 1
+            status = "in_progress"
+            if self.polls[op_id] > 1:
+                tables = self.configurations[op_id]["configuration"].get("tables", [])
+                status = "failed" if any(t["name"] == "fail" for t in tables) else "succeeded"
+                self.in_flight -= 1
+        return {"op_id": op_id, "status": status, "info": {"message": status}}
+
+
+@pytest.mark.usefixtures("waii_server")
+class TestSemanticLayerDumpImport(unittest.TestCase):
+    def setUp(self):
+        self.dump_impl = SemanticLayerDumpImpl(self.server.client())
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def import_file(self, source, target="target", **kwargs):
+        return self.dump_impl.import_dump_from_file(target, source, poll_interval=0, **kwargs)
+
+    def write_dump(self, dump, name="dump.json"):
+        path = os.path.join(self.directory, name)
+        with (gzip.open(path, "wt") if name.endswith(".gz") else open(path, "w")) as f:
+            json.dump(dump, f, indent=1)
+        return path
+
+    def test_chunks_imported_concurrently(self):
+        dump = sample_dump()
+        imports = FakeImports(self.server)
+        result = self.import_file(self.write_dump(dump, "dump.json.gz"), chunk_size=10, max_concurrent=2)
+
+        # other members, 3 chunks of tables, schemas, 1 chunk of liked queries
+        self.assertEqual([(c.section, c.index, c.n_items) for c in result.chunks],
+                         [("", 0, 0), ("tables", 0, 10), ("tables", 1, 10), ("tables", 2, 5), ("schemas", 0, 1),
+                          ("liked_queries", 0, 7)])
+        self.assertTrue(all(c.status == OperationStatus.SUCCEEDED for c in result.chunks))
+        self.assertEqual(result.failed, [])
+        self.assertEqual(imports.max_in_flight, 2)
+
+        configurations = [r["configuration"] for r in imports.configurations.values()]
+        self.assertEqual(configurations[0], {k: dump[k] for k in ("version", "metadata", "database")})
+        self.assertEqual(configurations[1]["metadata"], dump["metadata"])
+        self.assertNotIn("database", configurations[1])
+        imported_tables = [t for c in configurations for t in c.get("tables", [])]
+        self.assertEqual(imported_tables, dump["tables"])
+
+    def test_whole_dump_imported_by_default(self):
+        dump = sample_dump()
+        imports = FakeImports(self.server)
+        result = self.import_file(self.write_dump(dump, "dump.json.gz"))
+
+        self.assertEqual([(c.section, c.index, c.status) for c in result.chunks], [("", 0, OperationStatus.SUCCEEDED)])
+        self.assertEqual([r["configuration"] for r in imports.configurations.values()], [dump])
+
+    def test_mappings_applied_locally(self):
+        imports = FakeImports(self.server)
+        self.import_file(self.write_dump(sample_dump()), schema_mapping={"sales": "sales_prod"},
+                         database_mapping={"dev": "prod"})
+
+        requests = list(imports.configurations.values())
+        self.assertEqual(len(requests), 1)
+        self.assertTrue(all(r["schema_mapping"] == {} and r["database_mapping"] == {} for r in requests))
+        by_section = {k: v for r in requests for k, v in r["configuration"].items()}
+        self.assertEqual(by_section["metadata"]["source_database"], "prod")
+        self.assertEqual({t["schema_name"] for t in by_section["tables"]}, {"sales_prod"})
+        self.assertEqual(by_section["schemas"][0]["name"], "sales_prod")
+        # descriptions are not rewritten
+        self.assertEqual(by_section["schemas"][0]["description"]["summary"], "sales.orders is the main table")
+        self.assertEqual(by_section["liked_queries"][3]["query"],
+                         "SELECT * FROM prod.sales_prod.t3 JOIN sales_prod.t0 USING (id)")
+
+    def test_reimport_skips_applied_chunks(self):
+        dump = sample_dump()
+        dump["tables"][12]["name"] = "fail"
+        path = self.write_dump(dump)
+        store = FileImportStateStore(os.path.join(self.directory, "state.json"))
+
+        imports = FakeImports(self.server)
+        result = self.import_file(path, chunk_size=10, state_store=store)
+        self.assertEqual([(c.section, c.index) for c in result.failed], [("tables", 1)])
+        self.assertEqual(len(store.load().applied), 5)
+
+        dump["tables"][12]["name"] = "t12"
+        imports = FakeImports(self.server)
+        with open(self.write_dump(dump), "rb") as f:
+            # not seekable
+            result = self.import_file(io.BufferedReader(io.BytesIO(f.read())), chunk_size=10,
+                                      state_store=store)
+        self.assertEqual([(c.section, c.index) for c in result.chunks if not c.skipped], [("tables", 1)])
+        self.assertEqual(len(imports.configurations), 1)
+        self.assertEqual(result.failed, [])
+
+        # the import of a chunk can't be started: the chunks in flight are still recorded
+        store = FileImportStateStore(os.path.join(self.directory, "state2.json"))
+        imports = FakeImports(self.server)
+        imports.fail_import = 3
+        with self.assertRaisesRegex(Exception, "connection reset"):
+            self.import_file(path, chunk_size=10, max_concurrent=4, state_store=store)
+        self.assertEqual(set(store.load().applied.values()), {"op-0", "op-1", "op-2"})
+
+        # same content into another connection
+        FakeImports(self.server)
+        result = self.import_file(path, target="other", state_store=store)
+        self.assertFalse(any(c.skipped for c in result.chunks))
+
+
+class TestSemanticLayerDumpRewriter(unittest.TestCase):
+    def test_qualified_names(self):
+        rewriter = SemanticLayerDumpRewriter({"sales": "sales_prod"}, {"dev": "prod"})
+        self.assertEqual(rewriter.rewrite_sql('select * from DEV.Sales.orders o join "SALES".items i, other.x, o.sales'),
+                         'select * from prod.sales_prod.orders o join "sales_prod".items i, other.x, o.sales')
+        self.assertEqual(rewriter.rewrite_sql("sales.orders.id = other.sales.id"),
+                         "sales_prod.orders.id = other.sales_prod.id")
+        self.assertEqual(rewriter.rewrite({"scope": "dev.sales.*", "statement": "dev.sales"}, "semantic_contexts"),
+                         {"scope": "prod.sales_prod.*", "statement": "dev.sales"})
+        self.assertFalse(SemanticLayerDumpRewriter())
+
+    def test_only_known_fields(self):
+        rewriter = SemanticLayerDumpRewriter({"sales": "sales_prod"}, {"dev": "prod"})
+        table = {"name": {"table_name": "orders", "schema_name": "sales", "database_name": "dev"},
+                 "columns": [{"name": "schema", "type": "text", "sample_values": {"values": {"sales": 3}}},
+                             {"name": "database", "type": "text", "schema": "sales", "database": "dev"}]}
+        rewritten = rewriter.rewrite(json.loads(json.dumps(table)), "tables")
+        self.assertEqual(rewritten["name"], {"table_name": "orders", "schema_name": "sales_prod",
+                                             "database_name": "prod"})
+        self.assertEqual(rewritten["columns"], table["columns"])
+
+        database = {"content_filters": [{"pattern": ".*", "schema": "sales", "filter_scope": "schema",
+                                         "search_context": [{"db_name": "DEV", "schema_name": "sales"}]}]}
+        rewritten = rewriter.rewrite(json.loads(json.dumps(database)), "database")
+        self.assertEqual(rewritten["content_filters"][0]["search_context"], [{"db_name": "prod",
+                                                                             "schema_name": "sales_prod"}])
+        self.assertEqual(rewritten["content_filters"][0]["schema"], "sales")
+
+        # members the rewriter doesn't know are left as they are
+        self.assertEqual(rewriter.rewrite({"schema": "sales", "query": "select * from sales.t"}, "other"),
+                         {"schema": "sales", "query": "select * from sales.t"})
+
+    def test_literals_and_aliases(self):
+        rewriter = SemanticLayerDumpRewriter({"sales": "sales_prod"}, {"dev": "prod"})
+        sql = ("select sales.amount, 'sales.orders' as label from sales.orders sales, sales.items "
+               "join (select * from dev.sales.x) y on sales.id = y.id -- sales.orders\n"
+               "where sales.note = 'it''s dev.sales.x' /* sales.orders */")
+        self.assertEqual(rewriter.rewrite_sql(sql), (
+            "select sales.amount, 'sales.orders' as label from sales_prod.orders sales, sales_prod.items "
+            "join (select * from prod.sales_prod.x) y on sales.id = y.id -- sales.orders\n"
+            "where sales.note = 'it''s dev.sales.x' /* sales.orders */"))
+        self.assertEqual(rewriter.rewrite_sql("insert into sales.t select 1.5e3, sales.c from dev.sales.u"),
+                         "insert into sales_prod.t select 1.5e3, sales.c from prod.sales_prod.u")
+
+
+
+class TestJsonArrayItems(unittest.TestCase):
+    def test_array_items(self):
+        obj = {"a": 1, "tables": sample_dump()["tables"][:3], "numbers": [12, -3.5e2, "x", None], "empty": []}
+        body = json.dumps(obj).encode()
+        for chunk_size in (1, 5, 1 << 20):
+            items, readers = {}, []
+
+            def stream(name, first):
+                if first == b'[':
+                    readers.append(JsonArrayItems(items.setdefault(name, []).append))
+                    return readers[-1].feed
+
+            scanner = JsonObjectScanner(stream=stream)
+            for i in range(0, len(body), chunk_size):
+                scanner.feed(body[i:i + chunk_size])
+            scanner.close()
+            for reader in readers:
+                reader.close()
+            self.assertEqual(items, {k: v for k, v in obj.items() if k != "a"})
+
@@ -0,0 +1,69 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from waii_sdk_py.chat import ChatSessionStore
+from waii_sdk_py.utils import atomic_write_text, SqliteDatabase
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_atomic_write_text(self):
+        path = os.path.join(self.directory, "state.json")
+        atomic_write_text(path, "first")
+        atomic_write_text(path, "second")
+        with open(path) as f:
+            self.assertEqual(f.read(), "second")
+
+        # a failed write keeps the previous content and leaves no temporary file
+        with patch("os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                atomic_write_text(path, "third")
+        with open(path) as f:
+            self.assertEqual(f.read(), "second")
+        self.assertEqual(os.listdir(self.directory), ["state.json"])
+
+    def test_sqlite_database_shared_by_threads(self):
+        db = SqliteDatabase(os.path.join(self.directory, "store.db"),
+                            ["CREATE TABLE IF NOT EXISTS items (key TEXT PRIMARY KEY, value INTEGER)"])
+        threads = [threading.Thread(target=lambda i=i: db.execute("INSERT INTO items VALUES (?, ?)", (f"k{i}", i)))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(db.fetchone("SELECT value FROM items WHERE key = ?", ("k7",)), (7,))
+        self.assertEqual(len(db.fetchall("SELECT * FROM items")), 20)
+        db.close()
+
+    def test_store_base_is_abstract(self):
+        with self.assertRaises(TypeError):
+            ChatSessionStore()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,4 +14,5 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .access_rules import *
\ No newline at end of file
+from .access_rules import *
+from .access_rule_index import TableAccessRuleIndex
@@ -0,0 +1,239 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from waii_sdk_py.common import CommonResponse
+from waii_sdk_py.database import TableName
+from waii_sdk_py.query import (
+    QueryImpl,
+    ApplyTableAccessRulesRequest,
+    ApplyTableAccessRulesResponse,
+    AccessRuleProtectionState,
+    AccessRuleProtectionStatus,
+)
+from ..user import User
+from .access_rules import (
+    AccessRuleImpl,
+    TableAccessRule,
+    ListTableAccessRuleRequest,
+    UpdateTableAccessRuleRequest,
+    RemoveTableAccessRuleRequest,
+)
+
+WILDCARD = '*'
+
+_IDENTIFIER = r'"(?:[^"]|"")+"|`[^`]+`|\[[^\]]+\]|[^\W\d][\w$]*'
+_IDENTIFIER_PATTERN = re.compile(_IDENTIFIER)
+_QUALIFIED_NAME_PATTERN = re.compile(rf'(?:{_IDENTIFIER})(?:\s*\.\s*(?:{_IDENTIFIER}))*')
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def _unquote(identifier: str) -> str:
+    if identifier[0] in '"`[':
+        identifier = identifier[1:-1].replace('""', '"')
+    return identifier.lower()
+
+
+def _qualified_names(query: str) -> List[Tuple[str, ...]]:
+    """Dotted identifier chains of the query, unquoted and lower-cased (including words of literals and comments)"""
+    return [tuple(_unquote(part) for part in _IDENTIFIER_PATTERN.findall(match.group(0)))
+            for match in _QUALIFIED_NAME_PATTERN.finditer(query)]
+
+
+def _name_matches(rule_name: Optional[str], name: Optional[str]) -> bool:
+    # an unknown name (unqualified reference) may be anything
+    return rule_name is None or rule_name == WILDCARD or name is None or rule_name.lower() == name
+
+
+class _RuleSnapshot:
+    def __init__(self, scope: str, rules: List[TableAccessRule], loaded_at: float):
+        self.scope = scope
+        self.rules = rules
+        self.loaded_at = loaded_at
+        # lower-cased table name -> rules on the table, rules on any table ('*') are in `wildcard`
+        self.by_table: Dict[str, List[TableAccessRule]] = {}
+        self.wildcard: List[TableAccessRule] = []
+        for rule in rules:
+            if rule.table.table_name == WILDCARD:
+                self.wildcard.append(rule)
+            else:
+                self.by_table.setdefault(rule.table.table_name.lower(), []).append(rule)
+        # when every table name is a single word, a query without any of them as a word can't match
+        self.word_names = all(_WORD_PATTERN.fullmatch(name) for name in self.by_table)
+
+
+class TableAccessRuleIndex:
+    """
+    Local index of the table access rules of the activated connection, to decide without a server call whether any
+    rule could apply to a query.
+
+    The rules are loaded with `list_table_access_rules` on first use, indexed by table name, and reloaded when they
+    are older than `ttl_seconds` or the connection (scope) changes. Updating or removing rules through
+    `update_table_access_rules` / `remove_table_access_rules` of the index invalidates it; rules changed by other
+    clients are picked up when the TTL expires, or after `invalidate()`.
+
+    Matching is conservative: a rule is reported for a query when its table name appears as an identifier anywhere in
+    the query (schema and database are compared when the reference is qualified) and its org, tenant and user are
+    '*' or those of the user. Tables reached only through views or synonyms are not seen, and rules added by other
+    clients are only seen after `ttl_seconds` (which callers have to choose): a query skipping the server is
+    reported with the `not_checked` state, never as `protected`.
+    """
+
+    def __init__(
+            self,
+            access_rules: AccessRuleImpl,
+            ttl_seconds: Optional[float],
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.access_rules = access_rules
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._snapshot: Optional[_RuleSnapshot] = None
+        # incremented by invalidate(), a load which started before is not kept
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+
+    def refresh(self) -> List[TableAccessRule]:
+        """Reload the rules from the server"""
+        self.invalidate()
+        return self.rules
+
+    @property
+    def rules(self) -> List[TableAccessRule]:
+        return list(self._current().rules)
+
+    def rules_for_tables(self, tables: Iterable[TableName], user: Optional[User] = None) -> List[TableAccessRule]:
+        """Rules which could apply to the tables when accessed by `user` (by default: the current user)"""
+        names = [tuple(name.lower() if name is not None else None
+                       for name in (table.database_name, table.schema_name, table.table_name)) for table in tables]
+        return self._match(self._current(), names, user, table_last=True)
+
+    def rules_for_query(self, query: str, user: Optional[User] = None) -> List[TableAccessRule]:
+        """Rules which could apply to the tables referenced by the query when run by `user`"""
+        snapshot = self._current()
+        if not snapshot.rules:
+            return []
+        if not snapshot.wildcard and snapshot.word_names \
+                and snapshot.by_table.keys().isdisjoint(_WORD_PATTERN.findall(query.lower())):
+            return []
+        return self._match(snapshot, _qualified_names(query), user)
+
+    def may_apply(self, query: str, user: Optional[User] = None) -> bool:
+        return bool(self.rules_for_query(query, user))
+
+    def apply_table_access_rules(
+            self, query_impl: QueryImpl, params: ApplyTableAccessRulesRequest, user: Optional[User] = None
+    ) -> ApplyTableAccessRulesResponse:
+        """
+        QueryImpl.apply_table_access_rules, returning the query unchanged without a server call when no rule of the
+        index applies to the tables named in the query. Such a response has the `not_checked` state: callers which
+        require `protected` (e.g. because of views or synonyms) must call the server
+        """
+        if not self.may_apply(params.query, user):
+            return ApplyTableAccessRulesResponse(
+                query=params.query,
+                status=AccessRuleProtectionStatus(
+                    state=AccessRuleProtectionState.not_checked,
+                    msg="No table access rule of the index applies to the tables named in the query, tables reached "
+                        "through views or synonyms were not checked",
+                ),
+            )
+        return query_impl.apply_table_access_rules(params)
+
+    def update_table_access_rules(self, params: UpdateTableAccessRuleRequest) -> CommonResponse:
+        try:
+            return self.access_rules.update_table_access_rules(params)
+        finally:
+            self.invalidate()
+
+    def remove_table_access_rules(self, params: RemoveTableAccessRuleRequest) -> CommonResponse:
+        try:
+            return self.access_rules.remove_table_access_rules(params)
+        finally:
+            self.invalidate()
+
+    def _current(self) -> _RuleSnapshot:
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._is_fresh(snapshot):
+                generation = self._generation
+                snapshot = self._load()
+                if generation == self._generation:
+                    self._snapshot = snapshot
+            return snapshot
+
+    def _is_fresh(self, snapshot: Optional[_RuleSnapshot]) -> bool:
+        return snapshot is not None \
+            and snapshot.scope == self.access_rules.http_client.get_scope() \
+            and (self.ttl_seconds is None or self._clock() - snapshot.loaded_at <= self.ttl_seconds)
+
+    def _load(self) -> _RuleSnapshot:
+        scope = self.access_rules.http_client.get_scope()
+        rules = self.access_rules.list_table_access_rules(ListTableAccessRuleRequest()).rules or []
+        return _RuleSnapshot(scope, rules, self._clock())
+
+    def _match(
+            self,
+            snapshot: _RuleSnapshot,
+            names: Sequence[Tuple[Optional[str], ...]],
+            user: Optional[User],
+            table_last: bool = False,
+    ) -> List[TableAccessRule]:
+        identity = self._identity(user)
+        matched: Dict[int, TableAccessRule] = {}
+        for rule in snapshot.wildcard:
+            if names and _applies_to(rule, identity):
+                matched[id(rule)] = rule
+        for parts in names:
+            # in a query, every part of a.b.c may be the table: c in db.schema.table, b in schema.table.column
+            for i in range(len(parts) - 1 if table_last else 0, len(parts)):
+                part = parts[i]
+                for rule in snapshot.by_table.get(part, ()):
+                    if id(rule) in matched or not _applies_to(rule, identity):
+                        continue
+                    schema = parts[i - 1] if i >= 1 else None
+                    database = parts[i - 2] if i >= 2 else None
+                    if _name_matches(rule.table.schema_name, schema) \
+                            and _name_matches(rule.table.database_name, database):
+                        matched[id(rule)] = rule
+        return list(matched.values())
+
+    def _identity(self, user: Optional[User]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        if user is not None:
+            return user.org_id, user.tenant_id, user.id
+        http_client = self.access_rules.http_client
+        return None, None, http_client.impersonateUserId or http_client.userId or None
+
+
+def _applies_to(rule: TableAccessRule, identity: Tuple[Optional[str], Optional[str], Optional[str]]) -> bool:
+    org_id, tenant_id, user_id = identity
+    return _id_matches(rule.org_id, org_id) and _id_matches(rule.tenant_id, tenant_id) \
+        and _id_matches(rule.user_id, user_id)
+
+
+def _id_matches(rule_id: Optional[str], value: Optional[str]) -> bool:
+    return rule_id is None or rule_id == WILDCARD or value is None or rule_id == value
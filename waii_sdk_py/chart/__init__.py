@@ -14,4 +14,6 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .chart import *
\ No newline at end of file
+from .chart import *
+from .chart_input import ChartDownsampling, ChartInputOptions, ChartInput, prepare_chart_input
+from .chart_cache import ChartSpecCache, ChartSpecStore, SqliteChartSpecStore, dataframe_fingerprint
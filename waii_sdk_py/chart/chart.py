@@ -15,7 +15,7 @@ limitations under the License.
 """
 
 from enum import Enum
-from typing import Optional, Literal, List, Union, Dict, Any
+from typing import Optional, Literal, List, Union, Dict, Any, TYPE_CHECKING
 
 from ..database import ColumnDefinition
 from ..my_pydantic import WaiiBaseModel
@@ -23,6 +23,11 @@ from ..my_pydantic import WaiiBaseModel
 from ..common import LLMBasedRequest
 from waii_sdk_py.utils import wrap_methods_with_async
 from ..waii_http_client import WaiiHttpClient
+from ..dataframe import infer_column_definitions
+from .chart_input import ChartInputOptions, prepare_chart_input
+
+if TYPE_CHECKING:
+    from .chart_cache import ChartSpecCache
 
 GENERATE_CHART_ENDPOINT = "generate-chart"
 
@@ -82,6 +87,8 @@ class ChartGenerationRequest(LLMBasedRequest):
     sql: Optional[str]
     ask: Optional[str]
     dataframe_rows: Optional[List[Dict[str, Any]]]
+    # columnar alternative to dataframe_rows: column name -> values
+    dataframe_columns: Optional[Dict[str, List[Any]]] = None
     dataframe_cols: Optional[List[ColumnDefinition]]
     chart_type: Optional[ChartType]
     parent_uuid: Optional[str]
@@ -101,17 +108,37 @@ class ChartImpl:
 
     def generate_chart(
         self, df, ask=None, sql=None, chart_type=None, parent_uuid=None, tweak_history=None,
+        input_options: Optional[ChartInputOptions] = None, column_stats: bool = False,
+        cache: Optional["ChartSpecCache"] = None,
     ) -> ChartGenerationResponse:
+        """
+        `input_options` controls how the dataframe is sent: downsampling (reservoir, lttb, group_by), byte budget and
+        columnar payload, see ChartInputOptions. By default all the rows are sent as records.
+
+        With `column_stats`, the column definitions include statistics of the full dataframe (null fraction, distinct
+        values, min / max), see infer_column_definitions.
+
+        With `cache` (a ChartSpecCache), a spec generated before for the same data, ask, chart_type and tweak_history,
+        in the same scope and for the same user, is returned without calling the server.
+        """
 
         #Remove duplicate columns
         df = df.loc[:, ~df.columns.duplicated()]
 
-        cols = []
-        for col in df.columns:
-            cols.append(ColumnDefinition(name=col, type=df[col][0].__class__.__name__))
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(df, ask=ask, chart_type=chart_type, tweak_history=tweak_history,
+                                  parent_uuid=parent_uuid, input_options=input_options, column_stats=column_stats,
+                                  context=self.http_client.context_key())
+            response = cache.get(cache_key)
+            if response is not None:
+                return response
+
+        cols = infer_column_definitions(df, stats=column_stats)
+
+        chart_input = prepare_chart_input(df, input_options)
 
         params = ChartGenerationRequest(dataframe_cols=cols,
-                                        dataframe_rows=df.to_dict(orient='records'),
                                         ask=ask,
                                         chart_type=chart_type,
                                         parent_uuid=parent_uuid,
@@ -119,9 +146,18 @@ class ChartImpl:
         params.check_extra_fields()
         params_dict = {k: v.value if isinstance(v, Enum) else v for k, v in params.dict().items() if v is not None}
 
-        return self.http_client.common_fetch(
+        # the dataframe is added after validation, validating and copying it row by row dominates the request time
+        if chart_input.columns is not None:
+            params_dict['dataframe_columns'] = chart_input.columns
+        else:
+            params_dict['dataframe_rows'] = chart_input.rows
+
+        response = self.http_client.common_fetch(
             GENERATE_CHART_ENDPOINT, params_dict, ChartGenerationResponse
         )
+        if cache is not None:
+            cache.put(cache_key, response)
+        return response
 
 
 class AsyncChartImpl:
@@ -0,0 +1,199 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Callable, List, Optional, Tuple
+
+from ..utils import LRUCache, SqliteDatabase
+from .chart import ChartGenerationResponse, ChartTweak
+from .chart_input import ChartInputOptions
+
+# dataframes with more rows are fingerprinted from evenly spaced rows (always including the first and last one)
+FINGERPRINT_SAMPLE_ROWS = 4096
+
+
+def dataframe_fingerprint(df, sample_rows: int = FINGERPRINT_SAMPLE_ROWS) -> str:
+    """
+    Fast fingerprint of a pandas dataframe: column names and dtypes, number of rows, and a hash of the content of up to
+    `sample_rows` rows. Changes limited to rows outside the sample are not detected.
+    """
+    import numpy as np
+    import pandas as pd
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([[str(name), str(dtype)] for name, dtype in df.dtypes.items()]).encode('utf-8'))
+    n_rows = len(df)
+    digest.update(str(n_rows).encode('utf-8'))
+    if n_rows == 0:
+        return digest.hexdigest()
+
+    sample = df
+    if n_rows > sample_rows:
+        sample = df.iloc[np.unique(np.linspace(0, n_rows - 1, sample_rows).round().astype(np.int64))]
+    try:
+        hashes = pd.util.hash_pandas_object(sample, index=False)
+    except TypeError:
+        # unhashable values (e.g. lists or dicts in object columns)
+        hashes = pd.util.hash_pandas_object(sample.astype(str), index=False)
+    digest.update(hashes.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ChartSpecStore(ABC):
+    """Persistent tier of a ChartSpecCache"""
+
+    @abstractmethod
+    def load(self, key: str) -> Optional[Tuple[float, ChartGenerationResponse]]:
+        """Returns (time the spec was stored, in seconds since the epoch, spec)"""
+
+    @abstractmethod
+    def save(self, key: str, stored_at: float, response: ChartGenerationResponse):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteChartSpecStore(ChartSpecStore):
+    """Stores chart specs in a local SQLite database, so that they survive restarts and are shared across processes"""
+
+    def __init__(self, path: str = ":memory:"):
+        self._db = SqliteDatabase(path, [
+            "CREATE TABLE IF NOT EXISTS chart_specs (key TEXT PRIMARY KEY, stored_at REAL, response TEXT NOT NULL)"
+        ])
+
+    def load(self, key: str) -> Optional[Tuple[float, ChartGenerationResponse]]:
+        row = self._db.fetchone("SELECT stored_at, response FROM chart_specs WHERE key = ?", (key,))
+        return (row[0], ChartGenerationResponse(**json.loads(row[1]))) if row else None
+
+    def save(self, key: str, stored_at: float, response: ChartGenerationResponse):
+        self._db.execute(
+            "INSERT OR REPLACE INTO chart_specs (key, stored_at, response) VALUES (?, ?, ?)",
+            (key, stored_at, response.json())
+        )
+
+    def delete(self, key: str):
+        self._db.execute("DELETE FROM chart_specs WHERE key = ?", (key,))
+
+    def clear(self):
+        self._db.execute("DELETE FROM chart_specs")
+
+    def close(self):
+        self._db.close()
+
+
+class ChartSpecCache:
+    """
+    Cache of generate_chart responses, keyed by the fingerprint of the dataframe (see dataframe_fingerprint), the ask,
+    chart_type, tweak_history, parent_uuid, how the dataframe is sent (input_options, column_stats) and the context of
+    the client (server, api key, scope, org, user and impersonated user, see WaiiHttpClient.context_key), so that a
+    cache shared by several connections or users never returns a spec generated for another one.
+
+    Specs are kept in an in-memory LRU of `max_entries`, and in the optional persistent `store` (e.g.
+    SqliteChartSpecStore). Specs older than `ttl_seconds` are regenerated.
+    """
+
+    def __init__(
+            self,
+            max_entries: Optional[int] = 1024,
+            ttl_seconds: Optional[float] = 24 * 3600,
+            store: Optional[ChartSpecStore] = None,
+            sample_rows: int = FINGERPRINT_SAMPLE_ROWS,
+            clock: Callable[[], float] = time.time,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self.sample_rows = sample_rows
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: LRUCache[Tuple[float, ChartGenerationResponse]] = LRUCache(max_entries)
+
+    def key(
+            self,
+            df,
+            ask: Optional[str] = None,
+            chart_type=None,
+            tweak_history: Optional[List[ChartTweak]] = None,
+            parent_uuid: Optional[str] = None,
+            input_options: Optional[ChartInputOptions] = None,
+            column_stats: bool = False,
+            context: Optional[Tuple] = None,
+    ) -> str:
+        parts = [
+            list(context) if context is not None else None,
+            dataframe_fingerprint(df, self.sample_rows),
+            ask,
+            chart_type.value if isinstance(chart_type, Enum) else chart_type,
+            [t.dict() if isinstance(t, ChartTweak) else t for t in tweak_history or []],
+            parent_uuid,
+            input_options.dict() if input_options is not None else None,
+            column_stats,
+        ]
+        encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[ChartGenerationResponse]:
+        entry = self._entries.get(key)
+        if entry is None and self.store is not None:
+            entry = self.store.load(key)
+            if entry is not None:
+                self._entries.put(key, entry)
+        if entry is not None and self._expired(entry[0]):
+            self.invalidate(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # callers may modify the response (e.g. to tweak the spec), don't let that change the cached one
+        return entry[1].copy(deep=True)
+
+    def put(self, key: str, response: ChartGenerationResponse):
+        entry = (self._clock(), response.copy(deep=True))
+        self._entries.put(key, entry)
+        if self.store is not None:
+            self.store.save(key, *entry)
+
+    def invalidate(self, key: str):
+        self._entries.pop(key)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def clear(self):
+        self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds
@@ -0,0 +1,212 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from ..my_pydantic import WaiiBaseModel
+
+
+class ChartDownsampling(str, Enum):
+    # send all the rows
+    none = "none"
+    # uniform random sample of the rows, in their original order
+    reservoir = "reservoir"
+    # largest-triangle-three-buckets on x_column / y_column, keeps the visual shape of a time series
+    lttb = "lttb"
+    # aggregate the rows by group_by columns
+    group_by = "group_by"
+
+
+class ChartInputOptions(WaiiBaseModel):
+    downsampling: ChartDownsampling = ChartDownsampling.none
+
+    # downsample (reservoir / lttb) when the dataframe has more rows than this
+    max_rows: Optional[int] = None
+
+    # maximum size of the encoded dataframe in bytes, the rows are downsampled (reservoir, unless lttb is selected)
+    # until the dataframe fits
+    max_bytes: Optional[int] = None
+
+    # send the dataframe as {column: [values]} (dataframe_columns) instead of a list of records (dataframe_rows)
+    columnar: bool = False
+
+    # lttb
+    x_column: Optional[str] = None
+    y_column: Optional[str] = None
+
+    # group_by: aggregation per column (pandas names: sum, mean, max, ...), by default numeric columns are summed and
+    # the others take the first value of the group
+    group_by: Optional[List[str]] = None
+    aggregations: Optional[Dict[str, str]] = None
+
+    # seed of the reservoir sample, so that the same dataframe gives the same payload
+    seed: int = 0
+
+
+class ChartInput(WaiiBaseModel):
+    # either rows or columns is set, depending on ChartInputOptions.columnar
+    rows: Optional[List[Dict[str, Any]]] = None
+    columns: Optional[Dict[str, List[Any]]] = None
+    n_rows: int
+    # number of rows of the dataframe before downsampling
+    n_original_rows: int
+
+
+def prepare_chart_input(df, options: Optional[ChartInputOptions] = None) -> ChartInput:
+    """
+    Downsample the dataframe according to `options` and encode it as json-compatible rows or columns (NaN / NaT are
+    sent as null, datetimes as ISO strings).
+    """
+    options = options or ChartInputOptions()
+    n_original_rows = len(df)
+
+    if options.downsampling == ChartDownsampling.group_by:
+        df = _group_by(df, options)
+    if options.max_rows is not None and len(df) > options.max_rows:
+        df = _downsample(df, options.max_rows, options)
+
+    if options.max_bytes is not None:
+        chart_input = _fit_byte_budget(df, options)
+    else:
+        chart_input = _encode(df, options.columnar)
+    chart_input.n_original_rows = n_original_rows
+    return chart_input
+
+
+def encoded_size(chart_input: ChartInput) -> int:
+    return len(json.dumps(chart_input.columns if chart_input.rows is None else chart_input.rows).encode('utf-8'))
+
+
+def _encode(df, columnar: bool) -> ChartInput:
+    columns = {}
+    for name in df.columns:
+        columns[name] = _json_values(df[name])
+    # construct: validating the values would copy every row
+    if columnar:
+        return ChartInput.construct(columns=columns, n_rows=len(df), n_original_rows=len(df))
+    names = list(columns.keys())
+    rows = [dict(zip(names, values)) for values in zip(*columns.values())] if names else [{} for _ in range(len(df))]
+    return ChartInput.construct(rows=rows, n_rows=len(df), n_original_rows=len(df))
+
+
+def _json_values(series) -> List[Any]:
+    import numpy as np
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        suffix = ''
+        if getattr(series.dt, 'tz', None) is not None:
+            series, suffix = series.dt.tz_convert('UTC').dt.tz_localize(None), 'Z'
+        values = np.char.add(np.datetime_as_string(series.to_numpy(), unit='ms'), suffix).astype(object)
+        values[series.isna().to_numpy()] = None
+        return values.tolist()
+    if series.hasnans:
+        series = series.astype(object).where(series.notna(), None)
+    return series.tolist()
+
+
+def _downsample(df, n_rows: int, options: ChartInputOptions):
+    if len(df) <= n_rows:
+        return df
+    if options.downsampling == ChartDownsampling.lttb:
+        return _lttb(df, n_rows, options)
+    return _reservoir(df, n_rows, options.seed)
+
+
+def _reservoir(df, n_rows: int, seed: int):
+    import numpy as np
+
+    positions = np.random.default_rng(seed).choice(len(df), size=n_rows, replace=False)
+    positions.sort()
+    return df.iloc[positions]
+
+
+def _lttb(df, n_rows: int, options: ChartInputOptions):
+    import numpy as np
+    import pandas as pd
+
+    if not options.x_column or not options.y_column:
+        raise ValueError("x_column and y_column are required for lttb downsampling")
+    x_series = df[options.x_column]
+    if not x_series.is_monotonic_increasing:
+        df = df.sort_values(options.x_column, kind='stable')
+        x_series = df[options.x_column]
+    if pd.api.types.is_datetime64_any_dtype(x_series.dtype):
+        x = x_series.astype('int64').to_numpy(dtype=float)
+    else:
+        x = pd.to_numeric(x_series, errors='coerce').to_numpy(dtype=float)
+    y = np.nan_to_num(pd.to_numeric(df[options.y_column], errors='coerce').to_numpy(dtype=float))
+    x = np.nan_to_num(x)
+    return df.iloc[_lttb_indices(x, y, n_rows)]
+
+
+def _lttb_indices(x, y, n_out: int):
+    import numpy as np
+
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 1)])
+
+    # first and last points are kept, the points in between are split in n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def _group_by(df, options: ChartInputOptions):
+    import pandas as pd
+
+    if not options.group_by:
+        raise ValueError("group_by columns are required for group_by downsampling")
+    aggregations = dict(options.aggregations or {})
+    for name in df.columns:
+        if name not in options.group_by and name not in aggregations:
+            aggregations[name] = 'sum' if pd.api.types.is_numeric_dtype(df[name].dtype) else 'first'
+    return df.groupby(options.group_by, sort=False, dropna=False).agg(aggregations).reset_index()
+
+
+def _fit_byte_budget(df, options: ChartInputOptions) -> ChartInput:
+    # estimate the row size from a sample, then shrink until the encoded dataframe fits in the budget
+    n_sample = min(len(df), 1000)
+    if n_sample == 0:
+        return _encode(df, options.columnar)
+    sample_size = encoded_size(_encode(_reservoir(df, n_sample, options.seed), options.columnar))
+    n_rows = min(len(df), int(options.max_bytes / (sample_size / n_sample) * 0.95))
+
+    while True:
+        if n_rows < 1:
+            raise ValueError(f"Cannot fit a single row of the dataframe in {options.max_bytes} bytes")
+        chart_input = _encode(_downsample(df, n_rows, options), options.columnar)
+        size = encoded_size(chart_input)
+        if size <= options.max_bytes:
+            return chart_input
+        n_rows = min(n_rows - 1, int(n_rows * options.max_bytes / size * 0.95))
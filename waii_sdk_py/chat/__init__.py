@@ -14,4 +14,5 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .chat import *
\ No newline at end of file
+from .chat import *
+from .chat_session import ChatTurn, ChatSession, ChatSessionStore, SqliteChatSessionStore
\ No newline at end of file
@@ -14,21 +14,27 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import threading
+import time
+from collections import deque
+from contextlib import closing
 from enum import Enum
-from typing import Optional, List, Dict, Union
+from typing import (
+    Optional, List, Dict, Union, Iterator, Iterable, Tuple, Any, Set, Hashable, Deque, AsyncIterator, Callable
+)
 
 from waii_sdk_py.database import SearchContext
 
 from waii_sdk_py.semantic_context import SemanticStatement
 
-from ..my_pydantic import WaiiBaseModel
+from ..my_pydantic import WaiiBaseModel, ValidationError
 
 from ..common import LLMBasedRequest, GetObjectRequest, AsyncObjectResponse, CommonRequest, CommonResponse
 from ..query import GetQueryResultResponse, GeneratedQuery
 from ..database import CatalogDefinition
 from ..semantic_context import GetSemanticContextResponse
 from ..chart import ChartGenerationResponse, ChartType
-from waii_sdk_py.utils import wrap_methods_with_async
+from waii_sdk_py.utils import wrap_methods_with_async, to_async_iterator, OperationPoller, ConcurrencyBudget
 from ..waii_http_client import WaiiHttpClient
 
 CHAT_MESSAGE_ENDPOINT = "chat-message"
@@ -141,6 +147,79 @@ class ChatResponse(WaiiBaseModel):
     # newly added status update
     status_update_events: Optional[List[ChatStatusUpdateEvent]] = None
 
+    def __init__(self, **data):
+        # the union has no discriminator, validating it tries ChatResponseData first, which fully parses the payload
+        # (and accepts a v2 payload, since all its fields are optional). Pick the variant from the shape instead.
+        response_data = data.get("response_data")
+        dispatch = isinstance(response_data, (dict, ChatResponseData, ChatResponseDataV2))
+        if dispatch:
+            data = {k: v for k, v in data.items() if k != "response_data"}
+        super().__init__(**data)
+        if dispatch:
+            self.response_data = _parse_response_data(response_data) if isinstance(response_data, dict) \
+                else response_data
+            self.__fields_set__.add("response_data")
+
+
+class ChatStreamEventType(str, Enum):
+    status_update = "status_update"
+    response = "response"
+    module = "module"
+    completed = "completed"
+
+
+class ChatStreamEvent(WaiiBaseModel):
+    event_type: ChatStreamEventType
+
+    # set for status_update events
+    status_update: Optional[ChatStatusUpdateEvent] = None
+
+    # set for response events, the response text generated so far (it replaces the one of the previous event)
+    response: Optional[str] = None
+
+    # set for module events, the module which is completed, and a ChatResponseDataV2 holding only that module
+    module: Optional[ChatModule] = None
+    module_data: Optional[ChatResponseDataV2] = None
+
+    # set for completed events, the full chat response
+    chat_response: Optional[ChatResponse] = None
+
+
+class ChatResponseDelta(WaiiBaseModel):
+    chat_uuid: str
+    current_step: Optional[ChatResponseStep] = None
+
+    # status update events received since the previous delta
+    status_update_events: List[ChatStatusUpdateEvent] = []
+
+    # modules completed since the previous delta
+    response_data: Optional[ChatResponseDataV2] = None
+
+    # set when they changed since the previous delta
+    research_plan: Optional[str] = None
+    response: Optional[str] = None
+
+    # the full chat response, only set on the last delta (when current_step is completed)
+    chat_response: Optional[ChatResponse] = None
+
+
+class ChatResponseError(Exception):
+    """Raised when watching a chat response which failed on the server"""
+
+    def __init__(self, chat_uuid: str, error_info: Optional[dict] = None):
+        super().__init__(f"Chat response {chat_uuid} failed: {error_info}")
+        self.chat_uuid = chat_uuid
+        self.error_info = error_info
+
+
+class ChatManyResult(WaiiBaseModel):
+    # position of the request in the batch
+    index: int
+    request: ChatRequest
+    # one of response or error is set
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
 
 class ResearchTemplate(WaiiBaseModel):
     template_id: Optional[str] = None
@@ -184,6 +263,25 @@ class ChatImpl:
     def chat_message(self, params: ChatRequest) -> ChatResponse:
         return self.http_client.common_fetch(CHAT_MESSAGE_ENDPOINT, params, ChatResponse)
 
+    def chat_message_stream(
+            self,
+            params: ChatRequest,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 5.0,
+            timeout: Optional[float] = 600.0,
+    ) -> Iterator[ChatStreamEvent]:
+        """
+        Send a chat message and yield the response as it is generated: status updates, the response text and each
+        module (query, data, chart, ...) as soon as it is completed. The last event is a `completed` event with the
+        full ChatResponse.
+
+        The message is sent with submit_chat_message and its response is polled (see watch_chat_response), so events
+        arrive at most every `max_poll_interval` seconds.
+        """
+        uuid = self.submit_chat_message(params).uuid
+        for delta in self.watch_chat_response(uuid, poll_interval, max_poll_interval, timeout):
+            yield from _events_from_chat_response_delta(delta)
+
     def submit_chat_message(
             self, params: ChatRequest
     ) -> AsyncObjectResponse:
@@ -198,6 +296,164 @@ class ChatImpl:
             GET_CHAT_RESPONSE_ENDPOINT, params, ChatResponse
         )
 
+    def watch_chat_response(
+            self,
+            uuid: str,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 5.0,
+            timeout: Optional[float] = 600.0,
+    ) -> Iterator[ChatResponseDelta]:
+        """
+        Poll an async chat response (submit_chat_message) until it is completed, and yield only what is new since the
+        previous poll: status update events, completed modules, and changes of research_plan / response.
+
+        The delta is computed on the raw response, only the new parts are parsed. Status update events are reported
+        once, by timestamp and title.
+
+        Raises ChatResponseError (after yielding the last delta) when the chat fails, and TimeoutError when it isn't
+        completed after `timeout` seconds (None: wait forever).
+        """
+        tracker = _ChatResponseTracker(uuid)
+        deadline = time.time() + timeout if timeout is not None else None
+        interval = poll_interval
+        while True:
+            raw = self.http_client.common_fetch(
+                GET_CHAT_RESPONSE_ENDPOINT,
+                GetObjectRequest(uuid=uuid),
+                ret_json=True,
+            )
+            delta = tracker.update(raw)
+            if delta is not None:
+                yield delta
+                interval = poll_interval
+            else:
+                interval = min(interval * 1.5, max_poll_interval)
+            if tracker.error_info is not None:
+                raise ChatResponseError(tracker.uuid, tracker.error_info)
+            if tracker.completed:
+                return
+            if deadline is not None and time.time() >= deadline:
+                raise TimeoutError(f"Chat response {uuid} is not completed after {timeout} seconds")
+            time.sleep(interval)
+
+    def chat_many(
+            self,
+            requests: Iterable[ChatRequest],
+            max_concurrent: int = 4,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 5.0,
+            timeout: Optional[float] = None,
+            budget_key: Optional[Hashable] = None,
+    ) -> Iterator[ChatManyResult]:
+        """
+        Run independent chat requests concurrently, yielding the results as they complete (not in request order).
+
+        Requests are sent with submit_chat_message and all the handles are polled from a single poller. At most
+        `max_concurrent` requests are in flight per tenant (the org/user of the http client, or `budget_key`), the
+        budget is shared with the other chat_many calls of the same tenant. A failed request is yielded with its
+        error and doesn't stop the batch.
+
+        Closing the iterator (or breaking out of the loop) stops the batch: remaining requests are not submitted. The
+        chats already submitted keep running on the server and keep their budget slots until they finish, they are
+        polled in a background thread meanwhile.
+        """
+        yield from self._run_chat_many(
+            self._chat_many_batch(max_concurrent, budget_key, poll_interval, max_poll_interval),
+            requests, poll_interval, max_poll_interval, timeout
+        )
+
+    def _chat_many_batch(
+            self, max_concurrent: int, budget_key: Optional[Hashable], poll_interval: float, max_poll_interval: float
+    ) -> "_ChatManyBatch":
+        if budget_key is None:
+            budget_key = _tenant_key(self.http_client)
+        return _ChatManyBatch(ConcurrencyBudget.shared(budget_key, max_concurrent), self._get_chat_response_or_error,
+                              poll_interval, max_poll_interval)
+
+    def _run_chat_many(
+            self,
+            batch: "_ChatManyBatch",
+            requests: Iterable[ChatRequest],
+            poll_interval: float,
+            max_poll_interval: float,
+            timeout: Optional[float],
+    ) -> Iterator[ChatManyResult]:
+        pending: Deque[Tuple[int, ChatRequest]] = deque(enumerate(requests))
+        poller = OperationPoller(
+            is_done=_is_chat_done, poll_interval=poll_interval, max_poll_interval=max_poll_interval
+        )
+        in_flight: Dict[str, Tuple[int, ChatRequest]] = {}
+        deadline = time.time() + timeout if timeout is not None else None
+
+        try:
+            while (pending or in_flight) and not batch.cancelled:
+                # wait for the budget only when nothing of this batch is in flight, otherwise a completion frees it
+                yield from self._submit_many(pending, in_flight, poller, batch, not in_flight, deadline)
+                if not in_flight:
+                    continue
+                remaining = max(0.0, deadline - time.time()) if deadline is not None else None
+                with closing(poller.poll(remaining)) as completions:
+                    for uuid, status in completions:
+                        batch.finished(uuid)
+                        index, request = in_flight.pop(uuid)
+                        if batch.cancelled:
+                            return
+                        if isinstance(status, Exception):
+                            yield ChatManyResult(index=index, request=request, error=str(status))
+                        else:
+                            yield ChatManyResult(index=index, request=request, response=status)
+                        yield from self._submit_many(pending, in_flight, poller, batch, False, deadline)
+        finally:
+            batch.cancel()
+
+    def _submit_many(
+            self,
+            pending: Deque[Tuple[int, ChatRequest]],
+            in_flight: Dict[str, Tuple[int, ChatRequest]],
+            poller: OperationPoller,
+            batch: "_ChatManyBatch",
+            block: bool,
+            deadline: Optional[float],
+    ) -> Iterator[ChatManyResult]:
+        while pending:
+            if block:
+                wait = max(0.0, deadline - time.time()) if deadline is not None else None
+                if not batch.acquire(timeout=wait):
+                    if batch.cancelled:
+                        return
+                    raise TimeoutError(f"{len(pending)} chat requests are not submitted after the timeout")
+                block = False
+            elif not batch.acquire(blocking=False):
+                return
+            index, request = pending.popleft()
+            uuid, error = None, None
+            try:
+                uuid = self.submit_chat_message(request).uuid
+            except Exception as e:
+                error = e
+            finally:
+                if uuid is None:
+                    batch.release()
+                else:
+                    batch.started(uuid)
+            if error is not None:
+                yield ChatManyResult(index=index, request=request, error=str(error))
+                continue
+            in_flight[uuid] = (index, request)
+            poller.add(uuid, lambda uuid=uuid: self._poll_chat_many(batch, uuid))
+
+    def _poll_chat_many(self, batch: "_ChatManyBatch", uuid: str) -> Union[ChatResponse, Exception]:
+        if batch.cancelled:
+            # finishes the polling of a cancelled batch still running in an executor thread
+            return RuntimeError("chat_many was cancelled")
+        return self._get_chat_response_or_error(uuid)
+
+    def _get_chat_response_or_error(self, uuid: str) -> Union[ChatResponse, Exception]:
+        try:
+            return self.get_chat_response(GetObjectRequest(uuid=uuid))
+        except Exception as e:
+            return e
+
     # Research Template Methods
     def create_research_template(self, params: CreateResearchTemplateRequest) -> CommonResponse:
         return self.http_client.common_fetch(
@@ -226,10 +482,270 @@ class ChatImpl:
 
 
 
+# name of the ChatResponseDataV2 field holding each module
+_MODULE_FIELDS = {
+    ChatModule.DATA: 'data',
+    ChatModule.TABLES: 'tables',
+    ChatModule.QUERY: 'query',
+    ChatModule.CHART: 'chart',
+    ChatModule.CONTEXT: 'semantic_context',
+}
+
+
+def _is_chat_done(status: Union[ChatResponse, Exception]) -> bool:
+    return isinstance(status, Exception) or status.current_step == ChatResponseStep.completed
+
+
+def _tenant_key(http_client: WaiiHttpClient) -> Hashable:
+    # chats of all the scopes of a tenant share its budget
+    return http_client.context_key(include_scope=False)
+
+
+class _ChatManyBatch:
+    """
+    Budget slots held by a chat_many batch. A slot is held from the submission of a chat until the chat reaches a
+    terminal state (completed or failed), so that the budget bounds the chats running on the server. When the batch is
+    cancelled (closed, timed out, or its async consumer cancelled while it runs in an executor thread), waiting
+    submitters are woken up, and the chats still running are polled in a background thread which releases their slots
+    as they finish.
+    """
+
+    def __init__(
+            self,
+            budget: ConcurrencyBudget,
+            check: Callable[[str], Union[ChatResponse, Exception]],
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 5.0,
+    ):
+        self.budget = budget
+        self._cancelled = threading.Event()
+        self._check = check
+        self._running: Set[str] = set()
+        self._draining = False
+        self._drain_poller = OperationPoller(
+            is_done=_is_chat_done, poll_interval=poll_interval, max_poll_interval=max_poll_interval
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        return self.budget.acquire(blocking=blocking, timeout=timeout, cancelled=self._cancelled)
+
+    def release(self):
+        """Gives back a slot which was acquired but not used (the submission failed)"""
+        self.budget.release()
+
+    def started(self, uuid: str):
+        with self._lock:
+            if not self.cancelled:
+                self._running.add(uuid)
+                return
+            # submitted while the batch was being cancelled
+            self._drain([uuid])
+
+    def finished(self, uuid: str):
+        with self._lock:
+            if uuid not in self._running:
+                # handed over to the drain by cancel()
+                return
+            self._running.remove(uuid)
+        self.budget.release()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self._cancelled.set()
+            running, self._running = self._running, set()
+            self._drain(running)
+        self.budget.wake()
+
+    def _drain(self, uuids: Iterable[str]):
+        # called with self._lock held
+        for uuid in uuids:
+            self._drain_poller.add(uuid, lambda uuid=uuid: self._check(uuid))
+        if uuids and not self._draining:
+            self._draining = True
+            threading.Thread(target=self._run_drain, name="chat-many-drain", daemon=True).start()
+
+    def _run_drain(self):
+        while True:
+            for _ in self._drain_poller.poll():
+                self.budget.release()
+            with self._lock:
+                if not self._drain_poller.pending:
+                    self._draining = False
+                    return
+
+
+# parsers of a single module entry of ChatResponseDataV2
+_MODULE_ENTRY_PARSERS = {
+    'data': GetQueryResultResponse,
+    'query': GeneratedQuery,
+    'chart': ChartGenerationResponse,
+    'semantic_context': SemanticStatement,
+}
+
+
+# ChatResponseData class of each module, its field names are not module ids of ChatResponseDataV2
+_MODULE_V1_CLASSES = {
+    'data': GetQueryResultResponse,
+    'query': GeneratedQuery,
+    'chart': ChartGenerationResponse,
+    'semantic_context': GetSemanticContextResponse,
+}
+
+
+def _is_response_data_v2(response_data: Dict[str, Any]) -> Optional[bool]:
+    """
+    ChatResponseDataV2 maps module ids to modules ({"query": {"<uuid>": {...}}}), while each module of
+    ChatResponseData is a single object. Every module is checked: a module with a non-dict value, or with a field name
+    of the single object as key, is a ChatResponseData module; a non-empty module of dicts keyed by other names is a
+    ChatResponseDataV2 module. None when the modules don't tell (e.g. only empty modules) or disagree.
+    """
+    if response_data.get('error_info') is not None:
+        return True
+    votes = set()
+    for field, v1_class in _MODULE_V1_CLASSES.items():
+        entries = response_data.get(field)
+        if entries is None:
+            continue
+        if not isinstance(entries, dict):
+            votes.add(False)
+        elif entries:
+            votes.add(all(isinstance(v, dict) for v in entries.values())
+                      and not any(key in v1_class.__fields__ for key in entries))
+    return votes.pop() if len(votes) == 1 else None
+
+
+def _parse_response_data(response_data: Dict[str, Any]) -> Union[ChatResponseData, ChatResponseDataV2]:
+    is_v2 = _is_response_data_v2(response_data)
+    if is_v2 is None:
+        # ambiguous shape: same as the validation of the Union, the first variant which validates
+        try:
+            return ChatResponseData(**response_data)
+        except ValidationError:
+            return ChatResponseDataV2(**response_data)
+    if is_v2:
+        return ChatResponseDataV2(**response_data)
+    return ChatResponseData(**response_data)
+
+
+class _ChatResponseTracker:
+    """Computes the deltas between consecutive raw (json) chat responses"""
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+        # (timestamp, title) of the status update events already reported
+        self._seen_events: Set[Tuple[Optional[int], Optional[str]]] = set()
+        self._seen_modules: Set[Tuple[str, str]] = set()
+        self._research_plan: Optional[str] = None
+        self._response: Optional[str] = None
+        self.completed = False
+        # set when the chat failed before completing
+        self.error_info: Optional[dict] = None
+
+    def update(self, raw: Dict[str, Any]) -> Optional[ChatResponseDelta]:
+        delta = ChatResponseDelta(chat_uuid=raw.get('chat_uuid') or self.uuid, current_step=raw.get('current_step'))
+        changed = False
+
+        for event in raw.get('status_update_events') or []:
+            if self._is_new_event(event):
+                delta.status_update_events.append(ChatStatusUpdateEvent(**event))
+                changed = True
+
+        new_modules = self._new_modules(raw.get('response_data'))
+        if new_modules:
+            delta.response_data = ChatResponseDataV2(**new_modules)
+            changed = True
+
+        if raw.get('research_plan') != self._research_plan:
+            self._research_plan = delta.research_plan = raw.get('research_plan')
+            changed = True
+        if raw.get('response') != self._response:
+            self._response = delta.response = raw.get('response')
+            changed = True
+
+        if delta.current_step == ChatResponseStep.completed:
+            self.completed = True
+            delta.chat_response = ChatResponse(**raw)
+            return delta
+
+        response_data = raw.get('response_data')
+        if isinstance(response_data, dict) and response_data.get('error_info') is not None:
+            self.error_info = response_data['error_info']
+        return delta if changed else None
+
+    def _is_new_event(self, event: Dict[str, Any]) -> bool:
+        key = event.get('timestamp'), event.get('title')
+        if key in self._seen_events:
+            return False
+        self._seen_events.add(key)
+        return True
+
+    def _new_modules(self, response_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        new_modules: Dict[str, Any] = {}
+        # ChatResponseData (v1) is only reported with the full response
+        if not response_data or not _is_response_data_v2(response_data):
+            return new_modules
+        for field, parse in _MODULE_ENTRY_PARSERS.items():
+            entries = response_data.get(field)
+            if not isinstance(entries, dict):
+                continue
+            for key, value in entries.items():
+                if (field, key) not in self._seen_modules:
+                    self._seen_modules.add((field, key))
+                    new_modules.setdefault(field, {})[key] = parse(**value)
+        if response_data.get('tables') and ('tables', '') not in self._seen_modules:
+            self._seen_modules.add(('tables', ''))
+            new_modules['tables'] = CatalogDefinition(**response_data['tables'])
+        return new_modules
+
+
+def _events_from_chat_response_delta(delta: ChatResponseDelta) -> Iterator[ChatStreamEvent]:
+    for status_update in delta.status_update_events:
+        yield ChatStreamEvent(event_type=ChatStreamEventType.status_update, status_update=status_update)
+    if delta.response:
+        yield ChatStreamEvent(event_type=ChatStreamEventType.response, response=delta.response)
+    if delta.response_data is not None:
+        for module, field in _MODULE_FIELDS.items():
+            module_data = getattr(delta.response_data, field)
+            if module_data:
+                yield ChatStreamEvent(event_type=ChatStreamEventType.module, module=module,
+                                      module_data=ChatResponseDataV2(**{field: module_data}))
+    if delta.chat_response is not None:
+        yield ChatStreamEvent(event_type=ChatStreamEventType.completed, chat_response=delta.chat_response)
+
+
 class AsyncChatImpl:
     def __init__(self, http_client: WaiiHttpClient):
         self._chat_impl = ChatImpl(http_client)
         wrap_methods_with_async(self._chat_impl, self)
 
+    async def chat_many(
+            self,
+            requests: Iterable[ChatRequest],
+            max_concurrent: int = 4,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 5.0,
+            timeout: Optional[float] = None,
+            budget_key: Optional[Hashable] = None,
+    ) -> AsyncIterator[ChatManyResult]:
+        """
+        ChatImpl.chat_many. The batch stops as soon as the consumer stops or is cancelled, even when it is waiting in an
+        executor thread (where it can't be closed)
+        """
+        batch = self._chat_impl._chat_many_batch(max_concurrent, budget_key, poll_interval, max_poll_interval)
+        try:
+            async for result in to_async_iterator(self._chat_impl._run_chat_many)(
+                    batch, requests, poll_interval, max_poll_interval, timeout
+            ):
+                yield result
+        finally:
+            batch.cancel()
+
 
 Chat = ChatImpl(WaiiHttpClient.get_instance())
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
+
+from ..my_pydantic import WaiiBaseModel
+from ..query import QueryImpl, GetQueryResultRequest, GetQueryResultResponse
+from ..utils import LRUCache, SqliteDatabase
+from .chat import ChatImpl, ChatRequest, ChatResponse, ChatResponseData, ChatResponseDataV2
+
+if TYPE_CHECKING:
+    from ..history import HistoryImpl
+
+
+class ChatTurn(WaiiBaseModel):
+    request: ChatRequest
+    response: ChatResponse
+    # milliseconds since epoch
+    timestamp_ms: Optional[int] = None
+
+    @property
+    def chat_uuid(self) -> str:
+        return self.response.chat_uuid
+
+    @property
+    def parent_uuid(self) -> Optional[str]:
+        return self.request.parent_uuid
+
+
+class ChatSessionStore(ABC):
+    """
+    Persistent storage of chat turns used by ChatSession, keyed by context (the server, api key, scope, org and user the
+    chat was sent for, see ChatSession.context()) and chat_uuid
+    """
+
+    @abstractmethod
+    def load(self, context: str, chat_uuid: str) -> Optional[ChatTurn]:
+        pass
+
+    @abstractmethod
+    def save(self, context: str, turn: ChatTurn):
+        pass
+
+    @abstractmethod
+    def delete(self, context: str, chat_uuid: str):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteChatSessionStore(ChatSessionStore):
+    """Stores chat turns in a local SQLite database, e.g. to rehydrate conversations after a page reload"""
+
+    def __init__(self, path: str = ":memory:"):
+        self._db = SqliteDatabase(path, [
+            "CREATE TABLE IF NOT EXISTS chat_turns ("
+            "context TEXT NOT NULL, chat_uuid TEXT NOT NULL, parent_uuid TEXT, timestamp_ms INTEGER, "
+            "turn TEXT NOT NULL, PRIMARY KEY (context, chat_uuid))"
+        ])
+
+    def load(self, context: str, chat_uuid: str) -> Optional[ChatTurn]:
+        row = self._db.fetchone("SELECT turn FROM chat_turns WHERE context = ? AND chat_uuid = ?",
+                                (context, chat_uuid))
+        return ChatTurn(**json.loads(row[0])) if row else None
+
+    def save(self, context: str, turn: ChatTurn):
+        self._db.execute(
+            "INSERT OR REPLACE INTO chat_turns (context, chat_uuid, parent_uuid, timestamp_ms, turn) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (context, turn.chat_uuid, turn.parent_uuid, turn.timestamp_ms, turn.json())
+        )
+
+    def delete(self, context: str, chat_uuid: str):
+        self._db.execute("DELETE FROM chat_turns WHERE context = ? AND chat_uuid = ?", (context, chat_uuid))
+
+    def close(self):
+        self._db.close()
+
+
+class ChatSession:
+    """
+    Conversation state of a multi-turn chat.
+
+    Each `send()` links the new message to the previous turn (parent_uuid), the turns are kept in an in-memory LRU and
+    saved to the optional `store`. `conversation()` rehydrates a conversation by walking the parent_uuid links, from
+    memory, then from the store, and only falls back to `history.get(uuid_filter=...)` for turns found in neither.
+
+    When `query` is given, the results of the queries referenced by the rehydrated turns (and not returned inline) are
+    fetched in the background, `get_query_result()` returns them when ready.
+
+    Turns and query results are kept apart by the scope, org and user of the chat's http client when they are used:
+    a session whose client switches to another user (or impersonates one) doesn't see the turns of the previous one.
+    """
+
+    def __init__(
+            self,
+            chat: ChatImpl,
+            history: Optional["HistoryImpl"] = None,
+            query: Optional[QueryImpl] = None,
+            store: Optional[ChatSessionStore] = None,
+            parent_uuid: Optional[str] = None,
+            max_turns: int = 256,
+            max_query_results: int = 64,
+            prefetch_workers: int = 2,
+    ):
+        self.chat = chat
+        self.history = history
+        self.query = query
+        self.store = store
+        # chat_uuid of the latest turn, the next message is sent as its follow-up
+        self.head: Optional[str] = parent_uuid
+        self._turns: LRUCache[ChatTurn] = LRUCache(max_turns)
+        self._query_results: LRUCache[Future] = LRUCache(max_query_results)
+        self._executor = ThreadPoolExecutor(max_workers=prefetch_workers) if query is not None else None
+        self._lock = threading.Lock()
+
+    def send(self, params: Union[str, ChatRequest]) -> ChatResponse:
+        if isinstance(params, str):
+            params = ChatRequest(ask=params)
+        if params.parent_uuid is None and self.head is not None:
+            params = params.copy(update={'parent_uuid': self.head})
+        response = self.chat.chat_message(params)
+        self.add_turn(ChatTurn(request=params, response=response, timestamp_ms=response.timestamp_ms or _now_ms()))
+        self.head = response.chat_uuid
+        return response
+
+    def context(self) -> str:
+        """Key of the server, api key (hashed), scope, org and user the chat is sent for"""
+        return json.dumps(list(self.chat.http_client.context_key()))
+
+    def add_turn(self, turn: ChatTurn):
+        context = self.context()
+        self._turns.put((context, turn.chat_uuid), turn)
+        if self.store is not None:
+            self.store.save(context, turn)
+
+    def get_turn(self, chat_uuid: str) -> Optional[ChatTurn]:
+        context = self.context()
+        turn = self._turns.get((context, chat_uuid))
+        if turn is None and self.store is not None:
+            turn = self.store.load(context, chat_uuid)
+            if turn is not None:
+                self._turns.put((context, chat_uuid), turn)
+        if turn is None and self.history is not None:
+            turn = self._fetch_turn(chat_uuid)
+            if turn is not None:
+                self.add_turn(turn)
+        return turn
+
+    def conversation(self, chat_uuid: Optional[str] = None) -> List[ChatTurn]:
+        """Turns of the conversation ending with `chat_uuid` (default: the latest turn), oldest first"""
+        turns = []
+        seen = set()
+        chat_uuid = chat_uuid or self.head
+        while chat_uuid and chat_uuid not in seen:
+            seen.add(chat_uuid)
+            turn = self.get_turn(chat_uuid)
+            if turn is None:
+                break
+            turns.append(turn)
+            chat_uuid = turn.parent_uuid
+        turns.reverse()
+        if self._executor is not None:
+            for turn in turns:
+                self._prefetch_query_results(turn)
+        return turns
+
+    def resume(self, chat_uuid: str) -> List[ChatTurn]:
+        """Continue the conversation from `chat_uuid`, returns its turns"""
+        turns = self.conversation(chat_uuid)
+        self.head = chat_uuid
+        return turns
+
+    def get_query_result(self, query_uuid: str, timeout: Optional[float] = None) -> GetQueryResultResponse:
+        """Result of a query referenced by a turn, inline data of the responses is used when available"""
+        context = self.context()
+        with self._lock:
+            future = self._query_results.get((context, query_uuid))
+            if future is None:
+                future = self._submit_query_result(context, query_uuid)
+        return future.result(timeout)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.store is not None:
+            self.store.close()
+
+    def __enter__(self) -> "ChatSession":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _fetch_turn(self, chat_uuid: str) -> Optional[ChatTurn]:
+        from ..history import GetHistoryRequest, GeneratedHistoryEntryType
+
+        response = self.history.get(GetHistoryRequest(
+            uuid_filter=chat_uuid, included_types=[GeneratedHistoryEntryType.chat], limit=1
+        ))
+        for entry in response.history:
+            if entry.request is not None and entry.response is not None:
+                return ChatTurn(request=entry.request, response=entry.response, timestamp_ms=entry.timestamp_ms)
+        return None
+
+    def _prefetch_query_results(self, turn: ChatTurn):
+        context = self.context()
+        with self._lock:
+            for query_uuid, inline_result in _referenced_queries(turn.response).items():
+                if self._query_results.get((context, query_uuid)) is not None:
+                    continue
+                if inline_result is not None:
+                    future = Future()
+                    future.set_result(inline_result)
+                    self._query_results.put((context, query_uuid), future)
+                else:
+                    self._submit_query_result(context, query_uuid)
+
+    def _submit_query_result(self, context: str, query_uuid: str) -> Future:
+        if self._executor is None:
+            raise ValueError("ChatSession needs a query module to fetch query results")
+        future = self._executor.submit(self.query.get_results, GetQueryResultRequest(query_id=query_uuid))
+        self._query_results.put((context, query_uuid), future)
+        return future
+
+
+def _referenced_queries(response: ChatResponse) -> Dict[str, Optional[GetQueryResultResponse]]:
+    # query uuid -> result returned inline with the response (or None)
+    queries: Dict[str, Optional[GetQueryResultResponse]] = {}
+    response_data = response.response_data
+    if isinstance(response_data, ChatResponseDataV2):
+        for query in (response_data.query or {}).values():
+            if query.uuid:
+                queries[query.uuid] = None
+        for data in (response_data.data or {}).values():
+            if data.query_uuid:
+                queries[data.query_uuid] = data
+    elif isinstance(response_data, ChatResponseData):
+        if response_data.query is not None and response_data.query.uuid:
+            queries[response_data.query.uuid] = None
+        if response_data.data is not None:
+            # v1 has a single query, its result may not carry the query uuid
+            query_uuid = response_data.data.query_uuid or (response_data.query.uuid if response_data.query else None)
+            if query_uuid:
+                queries[query_uuid] = response_data.data
+    return queries
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
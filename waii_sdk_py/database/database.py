@@ -15,9 +15,13 @@ limitations under the License.
 """
 
 import base64
+import codecs
 import inspect
 import json
+import mmap
+import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from pydantic.v1 import Field
@@ -31,12 +35,13 @@ from waii_sdk_py.waii_http_client import WaiiHttpClient
 from ..common import LLMBasedRequest, CommonRequest, CheckOperationStatusResponse, CheckOperationStatusRequest
 from ..my_pydantic import WaiiBaseModel, PrivateAttr
 import re
-from typing import Optional, List, Dict, Any, Union, Literal
+from typing import Optional, List, Dict, Any, Union, Literal, BinaryIO, Iterator
 from urllib.parse import urlparse, parse_qs
 from enum import Enum
 
 from ..user import CommonResponse
 from ..utils.utils import to_async, wrap_methods_with_async
+from ..utils.poller import OperationPoller
 
 MODIFY_DB_ENDPOINT = "update-db-connect-info"
 GET_CATALOG_ENDPOINT = "get-table-definitions"
@@ -54,6 +59,9 @@ CHECK_SIMILARITY_SEARCH_INDEX_STATUS_ENDPOINT = "check-similarity-search-index-s
 INGEST_DOCUMENT_ENDPOINT = "ingest-document"
 GET_INGEST_DOCUMENT_JOB_STATUS_ENDPOINT = "get-ingest-document-job-status"
 
+# must be a multiple of 3, so base64 of consecutive chunks can be concatenated without padding in between
+INGEST_FILE_CHUNK_SIZE = 3 * 256 * 1024
+
 
 class SchemaName(WaiiBaseModel):
     schema_name: str
@@ -696,6 +704,126 @@ class DatabaseImpl:
             GET_INGEST_DOCUMENT_JOB_STATUS_ENDPOINT, params, GetIngestDocumentJobStatusResponse
         )
 
+    def ingest_file(
+            self,
+            file: Union[str, os.PathLike, BinaryIO],
+            params: Optional[IngestDocumentRequest] = None,
+            chunk_size: int = INGEST_FILE_CHUNK_SIZE,
+    ) -> IngestDocumentResponse:
+        """
+        Ingest a document from a file path or a binary file object.
+
+        The file is read chunk by chunk (memory-mapped for paths) and encoded while the request body is being sent, so
+        only one chunk of the document is held in memory at a time.
+
+        `params` can be used to set the other fields of IngestDocumentRequest (content_type, filename, model, ...), its
+        `content` is ignored. When params is not given the file is sent as binary (base64) content. When
+        `params.is_binary` is False, the file is decoded as utf-8 text.
+        """
+        if chunk_size <= 0 or chunk_size % 3 != 0:
+            raise ValueError(f"chunk_size must be a positive multiple of 3, got {chunk_size}")
+
+        if params is None:
+            params = IngestDocumentRequest(is_binary=True)
+        else:
+            params = params.copy()
+        params.content = None
+        if params.filename is None:
+            name = file if isinstance(file, (str, os.PathLike)) else getattr(file, 'name', None)
+            if isinstance(name, (str, os.PathLike)):
+                params.filename = os.path.basename(os.fspath(name))
+
+        raw_chunks = _iter_file_chunks(file, chunk_size)
+        if params.is_binary:
+            chunks = (base64.b64encode(chunk).decode('ascii') for chunk in raw_chunks)
+        else:
+            chunks = _iter_json_escaped_text(raw_chunks)
+
+        return self.http_client.common_fetch_streamed(
+            INGEST_DOCUMENT_ENDPOINT, params, 'content', chunks, IngestDocumentResponse
+        )
+
+    def ingest_files(
+            self,
+            files: List[Union[str, os.PathLike, BinaryIO]],
+            params: Optional[IngestDocumentRequest] = None,
+            max_concurrent: int = 4,
+            chunk_size: int = INGEST_FILE_CHUNK_SIZE,
+    ) -> List[IngestDocumentResponse]:
+        """
+        Ingest many files concurrently, see `ingest_file`.
+
+        At most `max_concurrent` files are uploaded at the same time, so the peak memory is bounded by
+        max_concurrent * chunk_size regardless of the file sizes. Responses are returned in the order of `files`.
+        """
+        with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+            futures = [executor.submit(self.ingest_file, f, params, chunk_size) for f in files]
+            return [future.result() for future in futures]
+
+    def wait_for_ingest_document_jobs(
+            self,
+            ingest_document_job_ids: List[str],
+            poll_interval: float = 1.0,
+            timeout: Optional[float] = None,
+    ) -> Dict[str, GetIngestDocumentJobStatusResponse]:
+        """
+        Poll the status of multiple ingest document jobs together until all of them are completed or failed.
+
+        Returns the final status of each job, keyed by ingest_document_job_id. A job whose status can't be fetched is
+        reported as failed (with the error as message), the other jobs are still polled.
+        """
+        poller = OperationPoller(
+            is_done=lambda status: status.status != IngestDocumentJobStatus.in_progress,
+            poll_interval=poll_interval,
+        )
+        for job_id in ingest_document_job_ids:
+            poller.add(job_id, lambda job_id=job_id: self._ingest_document_job_status_or_failure(job_id))
+        return {job_id: status for job_id, status in poller.poll(timeout=timeout)}
+
+    def _ingest_document_job_status_or_failure(self, job_id: str) -> GetIngestDocumentJobStatusResponse:
+        try:
+            # a new request for every check: common_fetch adds scope / org_id / user_id to the request it sends
+            return self.get_ingest_document_job_status(GetIngestDocumentJobStatusRequest(ingest_document_job_id=job_id))
+        except Exception as e:
+            return GetIngestDocumentJobStatusResponse(status=IngestDocumentJobStatus.failed,
+                                                      message=f"Cannot get the status of the job: {e}")
+
+
+def _iter_file_chunks(file: Union[str, os.PathLike, BinaryIO], chunk_size: int) -> Iterator[bytes]:
+    # paths are memory-mapped, file objects are read in chunks; every chunk except the last one has exactly
+    # chunk_size bytes
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, len(mm), chunk_size):
+                    yield mm[offset:offset + chunk_size]
+        return
+
+    pending = b''
+    while True:
+        data = file.read(chunk_size - len(pending))
+        if not data:
+            break
+        pending += data
+        if len(pending) == chunk_size:
+            yield pending
+            pending = b''
+    if pending:
+        yield pending
+
+
+def _iter_json_escaped_text(chunks: Iterator[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield json.dumps(text)[1:-1]
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield json.dumps(text)[1:-1]
+
 
 class AsyncDatabaseImpl:
     def __init__(self, http_client: WaiiHttpClient):
@@ -0,0 +1,278 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import math
+from typing import Any, List, Optional
+
+from ..database import ColumnDefinition
+
+# stats are computed on at most this many rows (null fraction, distinct values), min / max use all the rows
+STATS_SAMPLE_ROWS = 100000
+
+# object columns: number of leading values scanned for a non-null value to name the type
+_OBJECT_SCAN_ROWS = 100
+
+
+def infer_column_definitions(df, stats: bool = False) -> List[ColumnDefinition]:
+    """
+    Column definitions (name and type) of a pandas, Arrow (Table / RecordBatch) or polars dataframe, from the dtypes.
+
+    The type names are the python type names the server expects (int64, float64, str, bool, Timestamp, date, ...).
+    Only object columns look at the data (their first non-null value), so the cost is O(columns) and doesn't depend on
+    the number of rows, the index, or whether the dataframe is empty.
+
+    With stats=True, the description of each column holds cheap statistics for the chart generation: null fraction,
+    number of distinct values (estimated from a sample for large dataframes) and min / max. They are vectorized, but
+    O(rows).
+    """
+    module = type(df).__module__.split('.')[0]
+    if module == 'pyarrow':
+        return _arrow_columns(df, stats)
+    if module == 'polars':
+        return _polars_columns(df, stats)
+    return _pandas_columns(df, stats)
+
+
+def _description(
+        null_fraction: float, n_distinct: Optional[int], estimated: bool, min_value: Any, max_value: Any
+) -> str:
+    parts = [f"nulls: {null_fraction:.1%}"]
+    if n_distinct is not None:
+        parts.append(f"distinct: {'~' if estimated else ''}{n_distinct}")
+    if min_value is not None and max_value is not None:
+        parts.append(f"min: {min_value}, max: {max_value}")
+    return ', '.join(parts)
+
+
+# pandas
+
+
+def _pandas_type(series) -> str:
+    import pandas as pd
+
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _pandas_type(pd.Series(dtype.categories))
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype):
+        # nullable dtypes (Int64, Float64) have the same name as their numpy counterpart
+        return dtype.name.lower()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'Timestamp'
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return 'Timedelta'
+    if pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+        return 'str'
+    if pd.api.types.is_object_dtype(dtype):
+        value = _first_valid(series)
+        return value.__class__.__name__ if value is not None else 'str'
+    return str(dtype)
+
+
+def _is_null(value) -> bool:
+    import pandas as pd
+
+    return value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and math.isnan(value))
+
+
+def _first_valid(series) -> Any:
+    head = series.iloc[:_OBJECT_SCAN_ROWS]
+    for value in head:
+        if not _is_null(value):
+            return value
+    if len(series) > _OBJECT_SCAN_ROWS:
+        rest = series.iloc[_OBJECT_SCAN_ROWS:].dropna()
+        if len(rest):
+            return rest.iloc[0]
+    return None
+
+
+def _pandas_stats(series) -> str:
+    import pandas as pd
+
+    n_rows = len(series)
+    sample = series.iloc[:STATS_SAMPLE_ROWS] if n_rows > STATS_SAMPLE_ROWS else series
+    null_fraction = float(sample.isna().mean()) if len(sample) else 0.0
+    try:
+        n_distinct = int(sample.nunique(dropna=True))
+    except TypeError:
+        # unhashable values (lists, dicts)
+        n_distinct = int(sample.astype(str).nunique(dropna=True))
+    estimated = len(sample) < n_rows
+    if estimated:
+        n_distinct = _extrapolate_distinct(n_distinct, len(sample), n_rows)
+
+    min_value = max_value = None
+    dtype = series.dtype
+    if n_rows and (pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype)) \
+            and not pd.api.types.is_bool_dtype(dtype):
+        min_value, max_value = series.min(), series.max()
+        if _is_null(min_value):
+            min_value = max_value = None
+    return _description(null_fraction, n_distinct, estimated, min_value, max_value)
+
+
+def _extrapolate_distinct(n_distinct: int, n_sample: int, n_rows: int) -> int:
+    # almost all values distinct in the sample: likely a key, scale with the row count; otherwise the sample has
+    # (nearly) all the distinct values
+    if n_distinct > 0.9 * n_sample:
+        return int(n_distinct * n_rows / n_sample)
+    return n_distinct
+
+
+def _pandas_columns(df, stats: bool) -> List[ColumnDefinition]:
+    cols = []
+    for position, name in enumerate(df.columns):
+        series = df.iloc[:, position]
+        cols.append(ColumnDefinition(
+            name=name,
+            type=_pandas_type(series),
+            description=_pandas_stats(series) if stats else None,
+        ))
+    return cols
+
+
+# arrow
+
+
+def _arrow_type(arrow_type) -> str:
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(arrow_type):
+        return _arrow_type(arrow_type.value_type)
+    if pa.types.is_boolean(arrow_type):
+        return 'bool'
+    if pa.types.is_integer(arrow_type):
+        return str(arrow_type)
+    if pa.types.is_floating(arrow_type):
+        return {'halffloat': 'float16', 'float': 'float32', 'double': 'float64'}[str(arrow_type)]
+    if pa.types.is_timestamp(arrow_type):
+        return 'Timestamp'
+    if pa.types.is_date(arrow_type):
+        return 'date'
+    if pa.types.is_time(arrow_type):
+        return 'time'
+    if pa.types.is_duration(arrow_type):
+        return 'Timedelta'
+    if pa.types.is_decimal(arrow_type):
+        return 'Decimal'
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return 'str'
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return 'bytes'
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        return 'list'
+    if pa.types.is_struct(arrow_type) or pa.types.is_map(arrow_type):
+        return 'dict'
+    return str(arrow_type)
+
+
+def _arrow_stats(column) -> str:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    n_rows = len(column)
+    sample = column.slice(0, STATS_SAMPLE_ROWS) if n_rows > STATS_SAMPLE_ROWS else column
+    null_fraction = sample.null_count / len(sample) if len(sample) else 0.0
+    if pa.types.is_dictionary(sample.type):
+        sample = pc.cast(sample, sample.type.value_type)
+    try:
+        n_distinct = pc.count_distinct(sample).as_py()
+    except pa.ArrowNotImplementedError:
+        # nested types
+        n_distinct = None
+    estimated = len(sample) < n_rows
+    if estimated and n_distinct is not None:
+        n_distinct = _extrapolate_distinct(n_distinct, len(sample), n_rows)
+
+    min_value = max_value = None
+    if n_rows and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+                   or pa.types.is_temporal(column.type) or pa.types.is_decimal(column.type)):
+        min_max = pc.min_max(column)
+        min_value, max_value = min_max['min'].as_py(), min_max['max'].as_py()
+    return _description(null_fraction, n_distinct, estimated, min_value, max_value)
+
+
+def _arrow_columns(table, stats: bool) -> List[ColumnDefinition]:
+    return [
+        ColumnDefinition(
+            name=field.name,
+            type=_arrow_type(field.type),
+            description=_arrow_stats(table.column(i)) if stats else None,
+        )
+        for i, field in enumerate(table.schema)
+    ]
+
+
+# polars
+
+
+_POLARS_TYPES = [
+    # (prefix of the dtype name, type name), first match wins
+    ('bool', 'bool'),
+    ('int', None),
+    ('uint', None),
+    ('float', None),
+    ('datetime', 'Timestamp'),
+    ('date', 'date'),
+    ('time', 'time'),
+    ('duration', 'Timedelta'),
+    ('decimal', 'Decimal'),
+    ('string', 'str'),
+    ('utf8', 'str'),
+    ('categorical', 'str'),
+    ('enum', 'str'),
+    ('binary', 'bytes'),
+    ('list', 'list'),
+    ('array', 'list'),
+    ('struct', 'dict'),
+]
+
+
+def _polars_type(dtype) -> str:
+    name = str(dtype).lower()
+    for prefix, type_name in _POLARS_TYPES:
+        if name.startswith(prefix):
+            # numeric types keep their name (int64, uint8, float32)
+            return type_name or name
+    return str(dtype)
+
+
+def _polars_stats(series) -> str:
+    n_rows = len(series)
+    sample = series.head(STATS_SAMPLE_ROWS)
+    null_fraction = sample.null_count() / len(sample) if len(sample) else 0.0
+    n_distinct = sample.drop_nulls().n_unique()
+    estimated = len(sample) < n_rows
+    if estimated:
+        n_distinct = _extrapolate_distinct(n_distinct, len(sample), n_rows)
+
+    min_value = max_value = None
+    if n_rows and (series.dtype.is_numeric() or series.dtype.is_temporal()):
+        min_value, max_value = series.min(), series.max()
+    return _description(null_fraction, n_distinct, estimated, min_value, max_value)
+
+
+def _polars_columns(df, stats: bool) -> List[ColumnDefinition]:
+    return [
+        ColumnDefinition(
+            name=name,
+            type=_polars_type(dtype),
+            description=_polars_stats(df.get_column(name)) if stats else None,
+        )
+        for name, dtype in df.schema.items()
+    ]
@@ -14,4 +14,6 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .history import *
\ No newline at end of file
+from .history import *
+from .history_watermark import HistoryWatermark, WatermarkStore, FileWatermarkStore
+from .history_export import HistoryExporter, HistoryExportResponse
\ No newline at end of file
@@ -14,8 +14,11 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Union, TYPE_CHECKING
 
 from ..chat import ChatRequest, ChatResponse
 from ..my_pydantic import WaiiBaseModel
@@ -23,6 +26,10 @@ from ..query import GeneratedQuery, QueryGenerationRequest
 from ..chart import ChartGenerationRequest, ChartGenerationResponse
 from waii_sdk_py.utils import wrap_methods_with_async
 from ..waii_http_client import WaiiHttpClient
+from .history_watermark import HistoryWatermark, WatermarkStore, history_entry_uuid
+
+if TYPE_CHECKING:
+    from .history_export import HistoryExportResponse
 
 LIST_ENDPOINT = "get-generated-query-history"
 GET_ENDPOINT = "get-history"
@@ -69,25 +76,86 @@ class SortOrder(str, Enum):
     desc = "desc"
 
 
+GeneratedHistoryEntry = Union[GeneratedQueryHistoryEntry, GeneratedChartHistoryEntry, GeneratedChatHistoryEntry]
+
+
+_HISTORY_ENTRY_TYPES = {t.value for t in GeneratedHistoryEntryType}
+
+
+def parse_history_entry(h: Dict[str, Any]) -> Optional[GeneratedHistoryEntry]:
+    if 'history_type' not in h:
+        raise Exception(f"history_type is required, but not found in the response, {h}")
+
+    history_type = h['history_type']
+
+    if history_type == GeneratedHistoryEntryType.query:
+        return GeneratedQueryHistoryEntry(**h)
+    elif history_type == GeneratedHistoryEntryType.chart:
+        return GeneratedChartHistoryEntry(**h)
+    elif history_type == GeneratedHistoryEntryType.chat:
+        return GeneratedChatHistoryEntry(**h)
+    return None
+
+
+class LazyHistoryEntry:
+    """
+    History entry which keeps the raw json: history_type, timestamp_ms and uuid are read directly from it, the full
+    entry (GeneratedQueryHistoryEntry, GeneratedChartHistoryEntry or GeneratedChatHistoryEntry) is only parsed when
+    any other attribute is accessed.
+    """
+
+    __slots__ = ('raw', '_entry')
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = raw
+        self._entry = None
+
+    @property
+    def history_type(self) -> str:
+        return self.raw['history_type']
+
+    @property
+    def timestamp_ms(self) -> Optional[int]:
+        return self.raw.get('timestamp_ms')
+
+    @property
+    def uuid(self) -> Optional[str]:
+        return history_entry_uuid(self.raw)
+
+    @property
+    def entry(self) -> GeneratedHistoryEntry:
+        if self._entry is None:
+            self._entry = parse_history_entry(self.raw)
+        return self._entry
+
+    def __getattr__(self, name: str):
+        if name.startswith('__') or name in LazyHistoryEntry.__slots__:
+            # special methods, or not initialized yet (copy / unpickle)
+            raise AttributeError(name)
+        return getattr(self.entry, name)
+
+    def __repr__(self) -> str:
+        return f"LazyHistoryEntry(history_type={self.history_type!r}, timestamp_ms={self.timestamp_ms!r}, " \
+               f"uuid={self.uuid!r})"
+
+
 class GetHistoryResponse:
-    def __init__(self, objs):
+    def __init__(self, objs, lazy: bool = False):
         self.history = []
         if 'history' not in objs:
             raise Exception(f"history is required, but not found in the response, {objs}")
 
         objs = objs['history']
         for h in objs:
-            if 'history_type' not in h:
-                raise Exception(f"history_type is required, but not found in the response, {h}")
-
-            history_type = h['history_type']
-
-            if history_type == GeneratedHistoryEntryType.query:
-                self.history.append(GeneratedQueryHistoryEntry(**h))
-            elif history_type == GeneratedHistoryEntryType.chart:
-                self.history.append(GeneratedChartHistoryEntry(**h))
-            elif history_type == GeneratedHistoryEntryType.chat:
-                self.history.append(GeneratedChatHistoryEntry(**h))
+            if lazy:
+                if 'history_type' not in h:
+                    raise Exception(f"history_type is required, but not found in the response, {h}")
+                if h['history_type'] in _HISTORY_ENTRY_TYPES:
+                    self.history.append(LazyHistoryEntry(h))
+                continue
+            entry = parse_history_entry(h)
+            if entry is not None:
+                self.history.append(entry)
 
 class GetHistoryRequest(WaiiBaseModel):
     # by default include query for backward compatibility
@@ -129,13 +197,143 @@ class HistoryImpl:
     def get(
             self,
             params: Optional[GetHistoryRequest] = None,
+            lazy: bool = False,
     ) -> GetHistoryResponse:
+        """
+        With lazy=True, the entries are LazyHistoryEntry: only parsed into the pydantic models when accessed beyond
+        history_type, timestamp_ms and uuid (e.g. to list the entries).
+        """
         if params == None:
             params = GetHistoryRequest()
         objs = self.http_client.common_fetch(
             GET_ENDPOINT, params, ret_json=True
         )
-        return GetHistoryResponse(objs)
+        return GetHistoryResponse(objs, lazy=lazy)
+
+    def follow(
+            self,
+            included_types: Optional[List[GeneratedHistoryEntryType]] = None,
+            watermark: Optional[HistoryWatermark] = None,
+            watermark_store: Optional[WatermarkStore] = None,
+            poll_interval: float = 60.0,
+            page_size: int = 100,
+            backfill: bool = False,
+    ) -> Iterator[GeneratedHistoryEntry]:
+        """
+        Yield new history entries as they are created, oldest first, polling every `poll_interval` seconds.
+
+        Only the entries after the watermark (its timestamp_ms, or at that timestamp and not seen yet) are fetched, so
+        each poll costs one page unless more than `page_size` entries were added. The watermark is taken from
+        `watermark`, else from `watermark_store`, else it is the newest existing entry, or now when the history is
+        empty: only entries created from now on are yielded, unless `backfill` is set, which yields the whole history
+        first. It advances when the next entry is requested, and is saved to `watermark_store` after each poll and
+        when the iterator is closed: the entry being processed when the iterator is closed is yielded again on resume
+        (at-least-once delivery).
+        """
+        included_types = included_types or list(GeneratedHistoryEntryType)
+        if watermark is None and watermark_store is not None:
+            watermark = watermark_store.load()
+        if watermark is None:
+            watermark = HistoryWatermark() if backfill else self._newest_watermark(included_types, page_size)
+
+        saved = watermark
+        try:
+            while True:
+                new_entries = []
+                for entries in iter_history_pages(self.http_client, included_types, page_size, watermark=watermark):
+                    new_entries.extend(entries)
+                new_entries.sort(key=HistoryWatermark.entry_key)
+
+                for raw in new_entries:
+                    entry = parse_history_entry(raw)
+                    if entry is not None:
+                        yield entry
+                    watermark = watermark.advance(raw)
+
+                if watermark_store is not None and watermark is not saved:
+                    watermark_store.save(watermark)
+                    saved = watermark
+                time.sleep(poll_interval)
+        finally:
+            if watermark_store is not None and watermark is not saved:
+                watermark_store.save(watermark)
+
+    def _newest_watermark(self, included_types: List[GeneratedHistoryEntryType], page_size: int) -> HistoryWatermark:
+        """Watermark of the newest existing entries (all those with its timestamp in the first page), else now"""
+        for entries in iter_history_pages(self.http_client, included_types, page_size):
+            watermark = HistoryWatermark.of(entries[0])
+            for entry in entries:
+                watermark = watermark.advance(entry)
+            return watermark
+        return HistoryWatermark(timestamp_ms=int(time.time() * 1000))
+
+    def export(
+            self,
+            directory: str,
+            format: str = 'parquet',
+            included_types: Optional[List[GeneratedHistoryEntryType]] = None,
+            page_size: int = 1000,
+            max_concurrent: int = 4,
+            watermark_store: Optional["WatermarkStore"] = None,
+    ) -> "HistoryExportResponse":
+        """Export the history to Parquet or Arrow files, see HistoryExporter"""
+        from .history_export import HistoryExporter
+
+        return HistoryExporter(
+            self, directory, format, included_types, page_size, max_concurrent, watermark_store
+        ).export()
+
+
+def iter_history_pages(
+        http_client: WaiiHttpClient,
+        included_types: List[GeneratedHistoryEntryType],
+        page_size: int = 1000,
+        max_concurrent: int = 1,
+        watermark: Optional[HistoryWatermark] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Raw (json) history entries newer than `watermark`, page by page, newest first, with `max_concurrent` pages fetched
+    ahead. Paging stops at the first page reaching the watermark.
+
+    Entries added while paging shift the offsets, the entries of a page which were already in the previous page are
+    dropped.
+    """
+    def fetch_page(offset: int) -> List[Dict[str, Any]]:
+        params = GetHistoryRequest(
+            included_types=included_types, limit=page_size, offset=offset, timestamp_sort_order=SortOrder.desc
+        )
+        return http_client.common_fetch(GET_ENDPOINT, params, ret_json=True).get('history') or []
+
+    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        futures = deque()
+        next_offset = 0
+        for _ in range(max_concurrent):
+            futures.append(executor.submit(fetch_page, next_offset))
+            next_offset += page_size
+
+        previous_keys = set()
+        try:
+            while futures:
+                page = futures.popleft().result()
+                keys = {HistoryWatermark.entry_key(entry) for entry in page}
+                entries = [
+                    entry for entry in page
+                    if HistoryWatermark.entry_key(entry) not in previous_keys
+                    and (watermark is None or watermark.is_before(entry))
+                ]
+                if entries:
+                    yield entries
+                reached_watermark = watermark is not None and any(
+                    (entry.get('timestamp_ms') or 0) < watermark.timestamp_ms for entry in page
+                )
+                if len(page) < page_size or reached_watermark:
+                    break
+                previous_keys = keys
+                futures.append(executor.submit(fetch_page, next_offset))
+                next_offset += page_size
+        finally:
+            for future in futures:
+                future.cancel()
 
 
 class AsyncHistoryImpl:
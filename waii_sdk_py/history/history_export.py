@@ -0,0 +1,210 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ..my_pydantic import WaiiBaseModel
+from .history import HistoryImpl, GeneratedHistoryEntryType, iter_history_pages
+from .history_watermark import HistoryWatermark, WatermarkStore, history_entry_uuid
+
+HISTORY_EXPORT_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+class HistoryExportResponse(WaiiBaseModel):
+    # files written by this export, one per history type
+    files: List[str] = []
+    # number of entries exported per history type
+    n_entries: Dict[str, int] = {}
+    # newest exported entry, the next incremental export starts after it
+    watermark: Optional[HistoryWatermark] = None
+
+
+def _get(obj: Any, field: str) -> Any:
+    return obj.get(field) if isinstance(obj, dict) else None
+
+
+def _json(obj: Any) -> Optional[str]:
+    return json.dumps(obj) if obj is not None else None
+
+
+def _query_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    query = entry.get('query')
+    return {
+        'ask': _get(entry.get('request'), 'ask'),
+        'query': _get(query, 'query'),
+        'liked': _get(query, 'liked'),
+        'tables': _json(_get(query, 'tables')),
+    }
+
+
+def _chart_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    request = entry.get('request')
+    return {
+        'ask': _get(request, 'ask'),
+        'sql': _get(request, 'sql'),
+        'chart_type': _get(request, 'chart_type'),
+        'parent_uuid': _get(request, 'parent_uuid'),
+    }
+
+
+def _chat_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    request = entry.get('request')
+    return {
+        'ask': _get(request, 'ask'),
+        'parent_uuid': _get(request, 'parent_uuid'),
+        'response': _get(entry.get('response'), 'response'),
+    }
+
+
+# columns per history type, besides timestamp_ms, uuid and entry (the complete entry as json)
+_ROW_BUILDERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    GeneratedHistoryEntryType.query.value: _query_row,
+    GeneratedHistoryEntryType.chart.value: _chart_row,
+    GeneratedHistoryEntryType.chat.value: _chat_row,
+}
+
+
+def _schema(history_type: str):
+    import pyarrow as pa
+
+    columns = [('timestamp_ms', pa.int64()), ('uuid', pa.string())]
+    for name in _ROW_BUILDERS[history_type]({}):
+        columns.append((name, pa.bool_() if name == 'liked' else pa.string()))
+    columns.append(('entry', pa.string()))
+    return pa.schema(columns)
+
+
+class _HistoryFileWriter:
+    """Writes the rows of one history type to a Parquet or Arrow IPC file, renamed into place on close"""
+
+    def __init__(self, path: str, format: str, schema):
+        self.path = path
+        self.part_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.part')
+        self.schema = schema
+        self.n_rows = 0
+        if format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.part_path, schema)
+        else:
+            import pyarrow.ipc as ipc
+            self._writer = ipc.new_file(self.part_path, schema)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+
+        self._writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        self.n_rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+        os.replace(self.part_path, self.path)
+
+    def abort(self):
+        try:
+            self._writer.close()
+        finally:
+            if os.path.exists(self.part_path):
+                os.remove(self.part_path)
+
+
+class HistoryExporter:
+    """
+    Export the history to local Parquet or Arrow files, one file per history type and export run.
+
+    Pages are fetched concurrently (newest first, `max_concurrent` pages in flight) as raw json, and flattened into
+    columns without building the pydantic models; each page is written as it arrives, so memory is bounded by the
+    pages in flight. With a `watermark_store`, the export is incremental: it stops at the newest entry exported by the
+    previous run, and saves the new watermark once the files are written.
+    """
+
+    def __init__(
+            self,
+            history: HistoryImpl,
+            directory: str,
+            format: str = 'parquet',
+            included_types: Optional[List[GeneratedHistoryEntryType]] = None,
+            page_size: int = 1000,
+            max_concurrent: int = 4,
+            watermark_store: Optional[WatermarkStore] = None,
+    ):
+        if format not in HISTORY_EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format: {format}, must be one of {', '.join(HISTORY_EXPORT_FORMATS)}")
+        self.history = history
+        self.directory = directory
+        self.format = format
+        self.included_types = included_types or list(GeneratedHistoryEntryType)
+        self.page_size = page_size
+        self.max_concurrent = max_concurrent
+        self.watermark_store = watermark_store
+
+    def export(self) -> HistoryExportResponse:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Cannot find pyarrow module. Please install pyarrow to export history (pip install pyarrow)")
+
+        os.makedirs(self.directory, exist_ok=True)
+        watermark = self.watermark_store.load() if self.watermark_store is not None else None
+        run_id = int(time.time() * 1000)
+        writers: Dict[str, _HistoryFileWriter] = {}
+        newest = watermark
+
+        try:
+            for entries in self.iter_pages(watermark):
+                rows_by_type: Dict[str, List[Dict[str, Any]]] = {}
+                for entry in entries:
+                    history_type = entry.get('history_type')
+                    build_row = _ROW_BUILDERS.get(history_type)
+                    if build_row is None:
+                        continue
+                    row = {'timestamp_ms': entry.get('timestamp_ms'), 'uuid': history_entry_uuid(entry)}
+                    row.update(build_row(entry))
+                    row['entry'] = json.dumps(entry)
+                    rows_by_type.setdefault(history_type, []).append(row)
+                    newest = HistoryWatermark.of(entry) if newest is None else newest.advance(entry)
+
+                for history_type, rows in rows_by_type.items():
+                    writer = writers.get(history_type)
+                    if writer is None:
+                        path = os.path.join(
+                            self.directory, f"{history_type}-{run_id}{HISTORY_EXPORT_FORMATS[self.format]}"
+                        )
+                        writer = writers[history_type] = _HistoryFileWriter(path, self.format, _schema(history_type))
+                    writer.write(rows)
+        except BaseException:
+            for writer in writers.values():
+                writer.abort()
+            raise
+
+        for writer in writers.values():
+            writer.close()
+        if self.watermark_store is not None and newest is not None and newest is not watermark:
+            self.watermark_store.save(newest)
+
+        return HistoryExportResponse(
+            files=[writer.path for writer in writers.values()],
+            n_entries={history_type: writer.n_rows for history_type, writer in writers.items()},
+            watermark=newest,
+        )
+
+    def iter_pages(self, watermark: Optional[HistoryWatermark] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Raw history entries newer than `watermark`, page by page, newest first"""
+        return iter_history_pages(
+            self.history.http_client, self.included_types, self.page_size, self.max_concurrent, watermark
+        )
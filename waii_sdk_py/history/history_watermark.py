@@ -0,0 +1,96 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..my_pydantic import WaiiBaseModel
+from ..utils import atomic_write_text
+
+
+def history_entry_uuid(entry: Dict[str, Any]) -> Optional[str]:
+    """uuid of a raw (json) history entry: the query uuid, the chart uuid or the chat uuid"""
+    history_type = entry.get('history_type')
+    if history_type == 'query':
+        obj, field = entry.get('query'), 'uuid'
+    elif history_type == 'chart':
+        obj, field = entry.get('response'), 'uuid'
+    elif history_type == 'chat':
+        obj, field = entry.get('response'), 'chat_uuid'
+    else:
+        return None
+    return obj.get(field) if isinstance(obj, dict) else None
+
+
+class HistoryWatermark(WaiiBaseModel):
+    """
+    Position in the history: the timestamp_ms of the newest entry seen, and the uuids of the entries seen with that
+    timestamp (entries with the same timestamp can be added later, whatever their uuid)
+    """
+    timestamp_ms: int = 0
+    uuids: List[str] = []
+
+    @staticmethod
+    def entry_key(entry: Dict[str, Any]) -> Tuple[int, str]:
+        return entry.get('timestamp_ms') or 0, history_entry_uuid(entry) or ''
+
+    def is_before(self, entry: Dict[str, Any]) -> bool:
+        timestamp_ms, uuid = self.entry_key(entry)
+        return timestamp_ms > self.timestamp_ms or (timestamp_ms == self.timestamp_ms and uuid not in self.uuids)
+
+    def advance(self, entry: Dict[str, Any]) -> "HistoryWatermark":
+        """The watermark after `entry` was seen (this one if it was already seen)"""
+        timestamp_ms, uuid = self.entry_key(entry)
+        if timestamp_ms > self.timestamp_ms:
+            return HistoryWatermark(timestamp_ms=timestamp_ms, uuids=[uuid])
+        if timestamp_ms == self.timestamp_ms and uuid not in self.uuids:
+            return HistoryWatermark(timestamp_ms=timestamp_ms, uuids=self.uuids + [uuid])
+        return self
+
+    @classmethod
+    def of(cls, entry: Dict[str, Any]) -> "HistoryWatermark":
+        timestamp_ms, uuid = cls.entry_key(entry)
+        return cls(timestamp_ms=timestamp_ms, uuids=[uuid])
+
+
+class WatermarkStore(ABC):
+    """Persists the watermark of a history export / follow between runs"""
+
+    @abstractmethod
+    def load(self) -> Optional[HistoryWatermark]:
+        pass
+
+    @abstractmethod
+    def save(self, watermark: HistoryWatermark):
+        pass
+
+
+class FileWatermarkStore(WatermarkStore):
+    """Stores the watermark in a local JSON file, replaced atomically"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[HistoryWatermark]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return HistoryWatermark(**json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def save(self, watermark: HistoryWatermark):
+        atomic_write_text(self.path, watermark.json(), prefix='.watermark-')
@@ -25,4 +25,7 @@ from .kg import (
     KnowledgeGraphImpl,
     AsyncKnowledgeGraphImpl,
     KnowledgeGraphClient
-) 
\ No newline at end of file
+)
+from .kg_index import KnowledgeGraphIndex, KnowledgeGraphDirection
+from .kg_store import KnowledgeGraphStore
+from .kg_decoder import decode_knowledge_graph
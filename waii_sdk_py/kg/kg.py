@@ -15,16 +15,18 @@ limitations under the License.
 """
 
 from enum import Enum
-from typing import Optional, List, Union
-from pydantic import Field
+from typing import Optional, List, Union, TYPE_CHECKING
 
-from ..my_pydantic import WaiiBaseModel
+from ..my_pydantic import WaiiBaseModel, Field
 from ..common import LLMBasedRequest
 from ..database import TableDefinition, ColumnDefinition, SchemaDefinition, Constraint
 from ..semantic_context import SemanticStatement
 from waii_sdk_py.utils import wrap_methods_with_async
 from ..waii_http_client import WaiiHttpClient
 
+if TYPE_CHECKING:
+    from .kg_index import KnowledgeGraphIndex
+
 GET_KNOWLEDGE_GRAPH_ENDPOINT = "get-knowledge-graph"
 
 
@@ -75,6 +77,11 @@ class KnowledgeGraph(WaiiBaseModel):
     nodes: List[KnowledgeGraphNode]
     edges: List[KnowledgeGraphEdge]
 
+    def index(self) -> "KnowledgeGraphIndex":
+        """Index the graph for neighbour lookups and join path discovery, see KnowledgeGraphIndex"""
+        from .kg_index import KnowledgeGraphIndex
+        return KnowledgeGraphIndex(self)
+
 
 class GetKnowledgeGraphResponse(WaiiBaseModel):
     graph: Optional[KnowledgeGraph] = None
@@ -85,19 +92,29 @@ class KnowledgeGraphImpl:
     def __init__(self, http_client: WaiiHttpClient):
         self.http_client = http_client
     
-    def get_knowledge_graph(self, params: GetKnowledgeGraphRequest) -> GetKnowledgeGraphResponse:
+    def get_knowledge_graph(
+            self, params: GetKnowledgeGraphRequest, validate: bool = True
+    ) -> GetKnowledgeGraphResponse:
         """
         Get a knowledge graph based on the provided parameters.
         
         Args:
             params: GetKnowledgeGraphRequest containing the query parameters
+            validate: validate the response with pydantic. With False, large graphs are decoded much faster with
+                decode_knowledge_graph, but the response isn't validated and the entities appearing several times in
+                the graph are shared (see decode_knowledge_graph)
             
         Returns:
             GetKnowledgeGraphResponse containing the generated knowledge graph
         """
-        return self.http_client.common_fetch(
-            GET_KNOWLEDGE_GRAPH_ENDPOINT, params, GetKnowledgeGraphResponse
-        )
+        if validate:
+            return self.http_client.common_fetch(GET_KNOWLEDGE_GRAPH_ENDPOINT, params, GetKnowledgeGraphResponse)
+
+        from .kg_decoder import decode_knowledge_graph
+
+        response = self.http_client.common_fetch(GET_KNOWLEDGE_GRAPH_ENDPOINT, params, ret_json=True)
+        graph = response.get('graph')
+        return GetKnowledgeGraphResponse.construct(graph=decode_knowledge_graph(graph) if graph else None)
 
 
 class AsyncKnowledgeGraphImpl:
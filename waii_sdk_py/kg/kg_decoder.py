@@ -0,0 +1,243 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, Optional, Type, Union
+
+from ..my_pydantic import BaseModel
+from ..database import TableDefinition, TableReference
+from .kg import KnowledgeGraph, KnowledgeGraphNode, KnowledgeGraphEdge
+
+_Decoder = Callable[[Any], Any]
+
+# model class -> decoder of its payload, compiled from the model fields on first use
+_DECODERS: Dict[Type[BaseModel], _Decoder] = {}
+
+
+def _model_decoder(cls: Type[BaseModel]) -> _Decoder:
+    decoder = _DECODERS.get(cls)
+    if decoder is None:
+        decoder = _DECODERS[cls] = _compile(cls)
+    return decoder
+
+
+def _compile(cls: Type[BaseModel]) -> _Decoder:
+    converters = {}
+    for name, field in cls.__fields__.items():
+        converter = _field_converter(field)
+        if converter is not None:
+            converters[field.alias] = converter
+    required = {field.alias for field in cls.__fields__.values() if field.required}
+    build = _builder(cls)
+    post_decode = _POST_DECODE.get(cls)
+
+    def decode(data):
+        if isinstance(data, cls):
+            return data
+        if not required.issubset(data):
+            raise ValueError(f"Missing fields of {cls.__name__}: {required.difference(data)}")
+        values = dict(data)
+        for key, converter in converters.items():
+            value = values.get(key)
+            if value is not None:
+                values[key] = converter(value)
+        model = build(values)
+        if post_decode is not None:
+            post_decode(model, data)
+        return model
+
+    return decode
+
+
+def _builder(cls: Type[BaseModel]) -> Callable[[dict], BaseModel]:
+    """
+    Same as cls.construct(**values) for values keyed by field name, without copying immutable defaults (construct
+    deep-copies the default of every missing field, which is most of its time)
+    """
+    # every field in declaration order, so that the fields of the model keep their order (extra values come last)
+    template = {}
+    copied_defaults = []
+    for name, field in cls.__fields__.items():
+        default = None if field.required else field.default
+        template[name] = default
+        if field.default_factory is not None or isinstance(default, (list, dict, set, BaseModel)):
+            copied_defaults.append(field)
+    has_private_attributes = bool(cls.__private_attributes__)
+
+    def build(values: dict) -> BaseModel:
+        model = cls.__new__(cls)
+        object.__setattr__(model, '__dict__', {**template, **values})
+        for field in copied_defaults:
+            if field.name not in values:
+                model.__dict__[field.name] = field.get_default()
+        object.__setattr__(model, '__fields_set__', set(values))
+        if has_private_attributes:
+            model._init_private_attributes()
+        return model
+
+    return build
+
+
+def _field_converter(field) -> Optional[_Decoder]:
+    """Converter of a raw field value, None when the JSON value can be used as is"""
+    outer_type = field.outer_type_
+    if getattr(outer_type, '__origin__', None) is Union:
+        return _union_decoder([sub_field.type_ for sub_field in field.sub_fields])
+
+    item_type = field.type_
+    if isinstance(item_type, type) and issubclass(item_type, BaseModel):
+        convert = _model_decoder(item_type)
+    elif isinstance(item_type, type) and issubclass(item_type, Enum):
+        convert = item_type
+    else:
+        return None
+
+    if field.shape == 1:  # singleton
+        return convert
+    if field.shape in (2, 3):  # list, set
+        return lambda values: [convert(v) for v in values]
+    raise TypeError(f"Unsupported field {field.name}: {outer_type}")
+
+
+def _union_decoder(types) -> _Decoder:
+    # the members of entity unions are told apart by their entity_type literal
+    decoders = {}
+    for member in types:
+        if member is type(None):
+            continue
+        decoders[member.__fields__['entity_type'].default] = _model_decoder(member)
+
+    def decode(data):
+        if isinstance(data, BaseModel):
+            return data
+        return decoders[data['entity_type']](data)
+
+    return decode
+
+
+def _decode_table_refs(table: TableDefinition, data: dict):
+    # same as TableDefinition.__init__
+    table._refs = [r if isinstance(r, TableReference) else TableReference(**r) for r in data.get('refs') or []]
+
+
+_POST_DECODE = {
+    TableDefinition: _decode_table_refs,
+}
+
+
+def _entity_key(data: Any) -> Optional[Hashable]:
+    """Identity of a raw entity payload, used to share the decoded entities, None for entities which aren't shared"""
+    if not isinstance(data, dict):
+        return None
+    entity_type = data.get('entity_type')
+    if entity_type == 'table':
+        name = data.get('name') or {}
+        return 'table', name.get('database_name'), name.get('schema_name'), name.get('table_name')
+    if entity_type == 'schema':
+        name = data.get('name') or {}
+        return 'schema', name.get('database_name'), name.get('schema_name')
+    if entity_type == 'semantic_statement' and data.get('id'):
+        return 'semantic_statement', data['id']
+    return None
+
+
+class _EntityDecoder:
+    def __init__(self, decode: _Decoder):
+        self._decode = decode
+        self.entities: Dict[Hashable, Any] = {}
+
+    def __call__(self, data: Any) -> Any:
+        if data is None:
+            return None
+        key = _entity_key(data)
+        if key is None:
+            return self._decode(data)
+        entity = self.entities.get(key)
+        if entity is None:
+            entity = self.entities[key] = self._decode(data)
+        return entity
+
+
+def decode_knowledge_graph(data: dict) -> KnowledgeGraph:
+    """
+    Decode the `graph` of a get-knowledge-graph response, without pydantic validation.
+
+    Entities are built directly from their `entity_type` (instead of trying every member of the entity unions), and
+    entities appearing several times (e.g. a table as node and as parent_entity of its columns, semantic statements
+    referenced by several edges) are decoded once and shared. Payloads which can't be decoded this way (e.g. an
+    unknown entity_type) fall back to the validating constructors, and so does the whole graph when the models have
+    a field the decoder can't be compiled for.
+    """
+    node_fields = KnowledgeGraphNode.__fields__
+    edge_fields = KnowledgeGraphEdge.__fields__
+    try:
+        converters = (_field_converter(node_fields['entity']), _field_converter(node_fields['parent_entity']),
+                      _field_converter(edge_fields['edge_entity']))
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return KnowledgeGraph(**data)
+    return _decode_graph(data, *converters)
+
+
+def _decode_graph(data: dict, entity_converter: _Decoder, parent_entity_converter: _Decoder,
+                  edge_entity_converter: _Decoder) -> KnowledgeGraph:
+    node_fields = KnowledgeGraphNode.__fields__
+    edge_fields = KnowledgeGraphEdge.__fields__
+    entity = _EntityDecoder(entity_converter)
+    parent_entity = _EntityDecoder(parent_entity_converter)
+    edge_entity = _EntityDecoder(edge_entity_converter)
+    # parents are looked up in the entities of the nodes first
+    parent_entity.entities = entity.entities
+    edge_entity.entities = entity.entities
+
+    build_node = _builder(KnowledgeGraphNode)
+    build_edge = _builder(KnowledgeGraphEdge)
+    node_required = {name for name, field in node_fields.items() if field.required}
+    edge_required = {name for name, field in edge_fields.items() if field.required}
+
+    raw_nodes = data.get('nodes') or []
+    entities = []
+    for raw in raw_nodes:
+        try:
+            entities.append(entity(raw.get('entity')))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            entities.append(None)
+
+    nodes = []
+    for raw, node_entity in zip(raw_nodes, entities):
+        try:
+            if node_entity is None or not node_required.issubset(raw):
+                raise ValueError()
+            values = dict(raw)
+            values['entity'] = node_entity
+            if 'parent_entity' in raw:
+                values['parent_entity'] = parent_entity(raw['parent_entity'])
+            nodes.append(build_node(values))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            nodes.append(KnowledgeGraphNode(**raw))
+
+    edges = []
+    for raw in data.get('edges') or []:
+        try:
+            if not edge_required.issubset(raw):
+                raise ValueError()
+            values = dict(raw)
+            if 'edge_entity' in raw:
+                values['edge_entity'] = edge_entity(raw['edge_entity'])
+            edges.append(build_edge(values))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            edges.append(KnowledgeGraphEdge(**raw))
+
+    return KnowledgeGraph.construct(nodes=nodes, edges=edges)
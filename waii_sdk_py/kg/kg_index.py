@@ -0,0 +1,296 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import deque
+from enum import Enum
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .kg import KnowledgeGraph, KnowledgeGraphNode, KnowledgeGraphEdge, KnowledgeGraphEdgeType
+
+# node id -> edges of the node, undirected edges are in the lists of both ends
+_Adjacency = Dict[str, List[KnowledgeGraphEdge]]
+
+
+class KnowledgeGraphDirection(str, Enum):
+    # edges from the node (for undirected edges: all edges of the node)
+    outgoing = "outgoing"
+    # edges to the node (for undirected edges: all edges of the node)
+    incoming = "incoming"
+    both = "both"
+
+
+class KnowledgeGraphIndex:
+    """
+    Index over a KnowledgeGraph: nodes by id and by entity type, and adjacency lists per edge type and
+    direction, so that neighbour lookups cost O(degree) instead of a scan of all edges.
+
+    Undirected edges (edge.directed is False) are traversed in both directions.
+    """
+
+    def __init__(self, graph: Optional[KnowledgeGraph] = None):
+        self.nodes: Dict[str, KnowledgeGraphNode] = {}
+        self.edges: List[KnowledgeGraphEdge] = []
+        self._nodes_by_type: Dict[str, List[KnowledgeGraphNode]] = {}
+        self._outgoing: Dict[str, _Adjacency] = {}
+        self._incoming: Dict[str, _Adjacency] = {}
+        if graph is not None:
+            self.add_nodes(graph.nodes)
+            self.add_edges(graph.edges)
+
+    def add_nodes(self, nodes: Iterable[KnowledgeGraphNode]):
+        for node in nodes:
+            previous = self.nodes.get(node.id)
+            if previous is not None:
+                self._nodes_by_type[previous.entity_type].remove(previous)
+            self.nodes[node.id] = node
+            self._nodes_by_type.setdefault(node.entity_type, []).append(node)
+
+    def add_edges(self, edges: Iterable[KnowledgeGraphEdge]):
+        for edge in edges:
+            self.edges.append(edge)
+            outgoing = self._outgoing.setdefault(edge.edge_type, {})
+            incoming = self._incoming.setdefault(edge.edge_type, {})
+            outgoing.setdefault(edge.source_id, []).append(edge)
+            incoming.setdefault(edge.target_id, []).append(edge)
+            if not edge.directed and edge.source_id != edge.target_id:
+                outgoing.setdefault(edge.target_id, []).append(edge)
+                incoming.setdefault(edge.source_id, []).append(edge)
+
+    # lookups
+
+    def node(self, node_id: str) -> Optional[KnowledgeGraphNode]:
+        return self.nodes.get(node_id)
+
+    def nodes_of_type(self, entity_type: str) -> List[KnowledgeGraphNode]:
+        return list(self._nodes_by_type.get(entity_type, []))
+
+    def edges_of(
+            self,
+            node_id: str,
+            edge_type: Optional[Union[str, Iterable[str]]] = None,
+            direction: KnowledgeGraphDirection = KnowledgeGraphDirection.both,
+    ) -> List[KnowledgeGraphEdge]:
+        """Edges of a node, optionally only of the given edge type(s)"""
+        seen = set()
+        edges = []
+        for _, edge in self._adjacent(node_id, edge_type, direction):
+            if id(edge) not in seen:
+                seen.add(id(edge))
+                edges.append(edge)
+        return edges
+
+    def neighbors(
+            self,
+            node_id: str,
+            edge_type: Optional[Union[str, Iterable[str]]] = None,
+            direction: KnowledgeGraphDirection = KnowledgeGraphDirection.both,
+    ) -> List[KnowledgeGraphNode]:
+        """Nodes linked to a node (each one once), e.g. the columns of a table with edge_type=table_to_column"""
+        seen = set()
+        neighbors = []
+        for other_id, _ in self._adjacent(node_id, edge_type, direction):
+            node = self.nodes.get(other_id)
+            if node is not None and other_id not in seen:
+                seen.add(other_id)
+                neighbors.append(node)
+        return neighbors
+
+    def _adjacent(
+            self,
+            node_id: str,
+            edge_type: Optional[Union[str, Iterable[str]]],
+            direction: KnowledgeGraphDirection,
+    ) -> Iterator[Tuple[str, KnowledgeGraphEdge]]:
+        if edge_type is None:
+            edge_types = list(self._outgoing)
+        elif isinstance(edge_type, str):
+            edge_types = [edge_type]
+        else:
+            edge_types = list(edge_type)
+
+        for et in edge_types:
+            if isinstance(et, Enum):
+                et = et.value
+            # the other end of an edge in the list of a node is the end which is not the node (for undirected edges
+            # the node can be either end)
+            if direction != KnowledgeGraphDirection.incoming:
+                for edge in self._outgoing.get(et, {}).get(node_id, ()):
+                    yield (edge.target_id if edge.source_id == node_id else edge.source_id), edge
+            if direction != KnowledgeGraphDirection.outgoing:
+                for edge in self._incoming.get(et, {}).get(node_id, ()):
+                    yield (edge.source_id if edge.target_id == node_id else edge.target_id), edge
+
+    # traversal
+
+    def shortest_path(
+            self,
+            source_id: str,
+            target_id: str,
+            edge_type: Optional[Union[str, Iterable[str]]] = None,
+            directed: bool = False,
+    ) -> Optional[List[KnowledgeGraphEdge]]:
+        """
+        Edges of a shortest path (breadth-first search) from source to target, [] if source is target, None if they
+        are not connected. With `directed`, directed edges are only followed from source to target.
+        """
+        if source_id == target_id:
+            return []
+        parents = self._bfs(source_id, edge_type, directed, stop_at=target_id)
+        if target_id not in parents:
+            return None
+        return _path_to(parents, target_id)
+
+    def join_path(self, source_table_id: str, target_table_id: str) -> Optional[List[KnowledgeGraphEdge]]:
+        """Shortest chain of joins (constraint edges, in any direction) between two tables"""
+        return self.shortest_path(source_table_id, target_table_id, edge_type=KnowledgeGraphEdgeType.constraint.value)
+
+    def join_edges(self, table_ids: List[str]) -> Optional[List[KnowledgeGraphEdge]]:
+        """
+        Constraint edges connecting all the given tables: the union of the shortest join paths from the first table to
+        each other one. None if some table can't be reached.
+        """
+        if not table_ids:
+            return []
+        parents = self._bfs(table_ids[0], KnowledgeGraphEdgeType.constraint.value, directed=False)
+        edges: Dict[int, KnowledgeGraphEdge] = {}
+        for table_id in table_ids[1:]:
+            if table_id == table_ids[0]:
+                continue
+            if table_id not in parents:
+                return None
+            for edge in _path_to(parents, table_id):
+                edges[id(edge)] = edge
+        return list(edges.values())
+
+    def reachable(
+            self,
+            source_id: str,
+            edge_type: Optional[Union[str, Iterable[str]]] = None,
+            directed: bool = False,
+            max_depth: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Ids of the nodes reachable from source (including source), with their distance in edges"""
+        distances = {source_id: 0}
+        direction = KnowledgeGraphDirection.outgoing if directed else KnowledgeGraphDirection.both
+        queue = deque([source_id])
+        while queue:
+            node_id = queue.popleft()
+            depth = distances[node_id]
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for other_id, _ in self._adjacent(node_id, edge_type, direction):
+                if other_id not in distances:
+                    distances[other_id] = depth + 1
+                    queue.append(other_id)
+        return distances
+
+    def _bfs(
+            self,
+            source_id: str,
+            edge_type: Optional[Union[str, Iterable[str]]],
+            directed: bool,
+            stop_at: Optional[str] = None,
+    ) -> Dict[str, Optional[Tuple[str, KnowledgeGraphEdge]]]:
+        # node id -> (parent node id, edge from the parent), None for the source
+        parents: Dict[str, Optional[Tuple[str, KnowledgeGraphEdge]]] = {source_id: None}
+        direction = KnowledgeGraphDirection.outgoing if directed else KnowledgeGraphDirection.both
+        queue = deque([source_id])
+        while queue:
+            node_id = queue.popleft()
+            for other_id, edge in self._adjacent(node_id, edge_type, direction):
+                if other_id in parents:
+                    continue
+                parents[other_id] = (node_id, edge)
+                if other_id == stop_at:
+                    return parents
+                queue.append(other_id)
+        return parents
+
+    # export
+
+    def to_networkx(self):
+        """
+        Export to a networkx MultiDiGraph. Node attributes are the KnowledgeGraphNode fields, edge attributes the
+        KnowledgeGraphEdge fields (the edge is in `edge`). Undirected edges are added in both directions.
+        """
+        try:
+            import networkx as nx
+        except ImportError:
+            raise ImportError("Cannot find networkx module. Please install networkx to export the knowledge graph "
+                              "(pip install networkx)")
+        graph = nx.MultiDiGraph()
+        for node_id, node in self.nodes.items():
+            graph.add_node(node_id, display_name=node.display_name, entity_type=node.entity_type, node=node)
+        for edge in self.edges:
+            attributes = dict(edge_type=edge.edge_type, directed=edge.directed, description=edge.description,
+                              edge=edge)
+            graph.add_edge(edge.source_id, edge.target_id, **attributes)
+            if not edge.directed and edge.source_id != edge.target_id:
+                graph.add_edge(edge.target_id, edge.source_id, **attributes)
+        return graph
+
+    def to_igraph(self):
+        """
+        Export to a directed igraph Graph, vertex "name" is the node id. Undirected edges are added in both
+        directions.
+        """
+        try:
+            import igraph
+        except ImportError:
+            raise ImportError("Cannot find igraph module. Please install python-igraph to export the knowledge graph "
+                              "(pip install igraph)")
+        node_ids = list(self.nodes)
+        # edges may refer to nodes which are not part of the graph
+        for edge in self.edges:
+            for node_id in (edge.source_id, edge.target_id):
+                if node_id not in self.nodes:
+                    node_ids.append(node_id)
+        positions = {node_id: i for i, node_id in enumerate(dict.fromkeys(node_ids))}
+
+        pairs, edge_types, directed, descriptions = [], [], [], []
+        for edge in self.edges:
+            ends = [(edge.source_id, edge.target_id)]
+            if not edge.directed and edge.source_id != edge.target_id:
+                ends.append((edge.target_id, edge.source_id))
+            for source_id, target_id in ends:
+                pairs.append((positions[source_id], positions[target_id]))
+                edge_types.append(edge.edge_type)
+                directed.append(edge.directed)
+                descriptions.append(edge.description)
+
+        graph = igraph.Graph(n=len(positions), edges=pairs, directed=True)
+        graph.vs["name"] = list(positions)
+        graph.vs["display_name"] = [n.display_name if n else None for n in map(self.nodes.get, positions)]
+        graph.vs["entity_type"] = [n.entity_type if n else None for n in map(self.nodes.get, positions)]
+        graph.es["edge_type"] = edge_types
+        graph.es["directed"] = directed
+        graph.es["description"] = descriptions
+        return graph
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+def _path_to(parents: Dict[str, Optional[Tuple[str, KnowledgeGraphEdge]]], node_id: str) -> List[KnowledgeGraphEdge]:
+    path = []
+    while parents[node_id] is not None:
+        node_id, edge = parents[node_id]
+        path.append(edge)
+    path.reverse()
+    return path
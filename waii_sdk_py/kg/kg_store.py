@@ -0,0 +1,162 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from ..utils import LRUCache
+from .kg import (
+    KnowledgeGraphImpl,
+    GetKnowledgeGraphRequest,
+    GetKnowledgeGraphResponse,
+    KnowledgeGraph,
+    KnowledgeGraphNode,
+    KnowledgeGraphEdge,
+)
+from .kg_index import KnowledgeGraphIndex
+
+
+def _entity_key(entity: Any) -> Optional[Hashable]:
+    """Identity of an entity payload across responses, None if it is not shared (e.g. columns, constraints)"""
+    entity_type = getattr(entity, 'entity_type', None)
+    if entity_type == 'table':
+        name = entity.name
+        return 'table', name.database_name, name.schema_name, name.table_name
+    if entity_type == 'schema':
+        name = entity.name
+        return 'schema', name.database_name, name.schema_name
+    if entity_type == 'semantic_statement' and entity.id:
+        return 'semantic_statement', entity.id
+    return None
+
+
+def _request_fields(params: GetKnowledgeGraphRequest) -> GetKnowledgeGraphRequest:
+    """Copy of the request without the fields added by the http client when it was sent"""
+    return params.copy(include=set(params.__fields__))
+
+
+def _edge_key(edge: KnowledgeGraphEdge) -> Hashable:
+    return edge.edge_type, edge.source_id, edge.target_id, edge.directed
+
+
+class KnowledgeGraphStore:
+    """
+    Client-side store of the knowledge graphs returned for many asks.
+
+    The subgraphs are merged by node id (and edges by type, source, target and direction) into a single graph, and
+    entity payloads (tables, schemas, semantic statements) are shared between all the nodes and edges referring to
+    them, so memory grows with the number of distinct entities. Each ask keeps only references to the nodes and edges
+    of its subgraph; repeating an ask returns it from memory.
+
+    The merged graph is available as `graph()` and indexed as `index`. The store is cleared when the scope (activated
+    connection) or the user of the client changes.
+    """
+
+    def __init__(self, kg: KnowledgeGraphImpl, max_asks: Optional[int] = 1024, ttl_seconds: Optional[float] = None):
+        self.kg = kg
+        self.index = KnowledgeGraphIndex()
+        self._edges: Dict[Hashable, KnowledgeGraphEdge] = {}
+        self._entities: Dict[Hashable, Any] = {}
+        self._asks: LRUCache[Tuple[Tuple[KnowledgeGraphNode, ...], Tuple[KnowledgeGraphEdge, ...]]] = \
+            LRUCache(max_asks, ttl_seconds)
+        self._context: Optional[Hashable] = None
+        self._lock = threading.RLock()
+
+    def get_knowledge_graph(self, params: GetKnowledgeGraphRequest) -> GetKnowledgeGraphResponse:
+        """Same as KnowledgeGraphImpl.get_knowledge_graph, served from the store for asks seen before"""
+        self._check_context()
+        key = self._ask_key(params)
+        if params.use_cache is not False:
+            subgraph = self._asks.get(key)
+            if subgraph is not None:
+                return self._response(*subgraph)
+
+        # a copy: common_fetch adds scope / org_id / user_id to the request it sends
+        response = self.kg.get_knowledge_graph(_request_fields(params))
+        if response.graph is None:
+            return response
+        subgraph = self.merge(response.graph)
+        self._asks.put(key, subgraph)
+        return self._response(*subgraph)
+
+    def merge(
+            self, graph: KnowledgeGraph
+    ) -> Tuple[Tuple[KnowledgeGraphNode, ...], Tuple[KnowledgeGraphEdge, ...]]:
+        """
+        Merge a graph into the store, returns the (stored) nodes and edges of the graph. Nodes and edges which are
+        already in the store are kept as they are.
+        """
+        with self._lock:
+            nodes, new_nodes = [], []
+            for node in graph.nodes:
+                stored = self.index.node(node.id)
+                if stored is None:
+                    node.entity = self._intern(node.entity)
+                    node.parent_entity = self._intern(node.parent_entity)
+                    stored = node
+                    new_nodes.append(node)
+                nodes.append(stored)
+            self.index.add_nodes(new_nodes)
+
+            edges, new_edges = [], []
+            for edge in graph.edges:
+                key = _edge_key(edge)
+                stored = self._edges.get(key)
+                if stored is None:
+                    edge.edge_entity = self._intern(edge.edge_entity)
+                    self._edges[key] = stored = edge
+                    new_edges.append(edge)
+                edges.append(stored)
+            self.index.add_edges(new_edges)
+            return tuple(nodes), tuple(edges)
+
+    def graph(self) -> KnowledgeGraph:
+        """The merged graph of all the asks"""
+        with self._lock:
+            return KnowledgeGraph.construct(nodes=list(self.index.nodes.values()), edges=list(self._edges.values()))
+
+    def clear(self):
+        with self._lock:
+            self.index = KnowledgeGraphIndex()
+            self._edges.clear()
+            self._entities.clear()
+            self._asks.clear()
+
+    def _intern(self, entity: Any) -> Any:
+        key = _entity_key(entity)
+        if key is None:
+            return entity
+        return self._entities.setdefault(key, entity)
+
+    def _check_context(self):
+        # the api key is hashed in the context key, it is not kept in the store
+        context = self.kg.http_client.context_key()
+        with self._lock:
+            if context != self._context:
+                if self._context is not None:
+                    self.clear()
+                self._context = context
+
+    @staticmethod
+    def _ask_key(params: GetKnowledgeGraphRequest) -> str:
+        request = _request_fields(params).dict(exclude={'use_cache'})
+        request['ask'] = request['ask'].strip()
+        return json.dumps(request, sort_keys=True, default=str)
+
+    @staticmethod
+    def _response(nodes, edges) -> GetKnowledgeGraphResponse:
+        return GetKnowledgeGraphResponse.construct(graph=KnowledgeGraph.construct(nodes=list(nodes), edges=list(edges)))
@@ -14,4 +14,5 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .query import *
\ No newline at end of file
+from .query import *
+from .plot_executor import PlotExecutor, PlotFrame, PlotExecutionResult, PlotExecutionError
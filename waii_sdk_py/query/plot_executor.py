@@ -0,0 +1,326 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import multiprocessing
+import pickle
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from ..my_pydantic import WaiiBaseModel
+
+
+class PlotExecutionError(Exception):
+    def __init__(self, message: str, traceback: Optional[str] = None, code: Optional[str] = None):
+        super().__init__(message)
+        # traceback of the exception raised by the plot code in the worker process
+        self.traceback = traceback
+        self.code = code
+
+
+class PlotExecutionResult(WaiiBaseModel):
+    code: str
+    # rendered figures (one per matplotlib figure left open by the code), in `image_format`
+    images: List[bytes] = []
+    image_format: str = 'png'
+    # number of executions, including the ones of the code before it was fixed
+    attempts: int = 1
+
+
+def _limit_memory(max_memory_bytes: Optional[int]):
+    if not max_memory_bytes:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory_bytes, max_memory_bytes))
+    except (ImportError, ValueError, OSError):
+        # not supported on this platform (e.g. windows)
+        pass
+
+
+def _load_frame(frame_ref: Tuple):
+    kind, payload = frame_ref[1], frame_ref[2]
+    if kind == 'pickle':
+        return pickle.loads(payload)
+
+    import pyarrow as pa
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=payload)
+    try:
+        # copy out of the shared memory, so that it can be closed (and unlinked by the parent) right away
+        table = pa.ipc.open_stream(pa.py_buffer(bytes(shm.buf[:frame_ref[3]]))).read_all()
+    finally:
+        shm.close()
+    return table.to_pandas()
+
+
+_PLOT_FILENAME = '<plot>'
+
+
+def _worker_main(connection, max_memory_bytes: Optional[int], image_format: str):
+    """Worker process: imports the plotting libraries once, then runs plot code sent by the PlotExecutor"""
+    import gc
+    import io
+    import linecache
+    import traceback
+
+    _limit_memory(max_memory_bytes)
+
+    import numpy as np
+    import pandas as pd
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        plt = None
+
+    frame_token, frame = None, None
+    connection.send(('ready',))
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task[0] == 'stop':
+            return
+
+        _, code, frame_ref = task
+        try:
+            if frame_ref[0] != frame_token:
+                frame_token, frame = None, None
+                frame = _load_frame(frame_ref)
+                frame_token = frame_ref[0]
+            scope = {'__name__': '__main__', 'df': frame.copy(), 'pd': pd, 'np': np, 'plt': plt}
+            # registered in linecache, so that the traceback shows the failing lines of the code
+            linecache.cache[_PLOT_FILENAME] = (len(code), None, code.splitlines(True), _PLOT_FILENAME)
+            exec(compile(code, _PLOT_FILENAME, 'exec'), scope)
+
+            images = []
+            if plt is not None:
+                for number in plt.get_fignums():
+                    buffer = io.BytesIO()
+                    plt.figure(number).savefig(buffer, format=image_format)
+                    images.append(buffer.getvalue())
+            connection.send(('ok', images))
+        except BaseException as e:
+            # without the frame of this function
+            formatted = traceback.format_exception(type(e), e, e.__traceback__.tb_next)
+            connection.send(('error', f"{type(e).__name__}: {e}", ''.join(formatted)))
+
+        # clean up after replying, while the caller handles the result
+        scope = None
+        if plt is not None:
+            plt.close('all')
+        gc.collect()
+
+
+class _Worker:
+    def __init__(self, context, max_memory_bytes: Optional[int], image_format: str):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_connection, max_memory_bytes, image_format), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+
+    def wait_ready(self, timeout: Optional[float]) -> bool:
+        return self.connection.poll(timeout) and self.connection.recv()[0] == 'ready'
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.connection.close()
+
+
+class PlotFrame:
+    """A dataframe shared with the plot workers (Arrow IPC in shared memory, or pickled when pyarrow is missing)"""
+
+    def __init__(self, df):
+        self.token = uuid.uuid4().hex
+        self._shm = None
+
+        table = None
+        try:
+            import pyarrow as pa
+            try:
+                table = pa.Table.from_pandas(df)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                # columns Arrow cannot represent (e.g. mixed types)
+                pass
+        except ImportError:
+            pass
+
+        if table is None:
+            self.ref = (self.token, 'pickle', pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+            return
+
+        from multiprocessing import shared_memory
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        data = sink.getvalue()
+        self._shm = shared_memory.SharedMemory(create=True, size=max(data.size, 1))
+        self._shm.buf[:data.size] = memoryview(data).cast("B")
+        self.ref = (self.token, 'arrow', self._shm.name, data.size)
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "PlotFrame":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PlotExecutor:
+    """
+    Runs generated plot code in a pool of pre-warmed worker processes (pandas, numpy and matplotlib already
+    imported), so that the code can't crash or block the calling process.
+
+    Each execution is limited to `timeout` seconds and, optionally, each worker to `max_memory_mb` (address space
+    limit, on platforms which support it; numpy, pyarrow and matplotlib reserve a lot of address space, keep it well
+    above the memory actually needed); a worker which times out or dies is replaced in the background. The dataframe
+    is passed to the workers through shared memory as Arrow IPC, and cached by the workers across executions of the
+    same PlotFrame (e.g. retries with fixed code).
+
+    Starting the workers takes a few seconds, create the executor once and reuse it. With the 'spawn' (and
+    'forkserver') start method the workers import the main module, so a script creating an executor must do it under
+    `if __name__ == "__main__":`.
+    """
+
+    def __init__(
+            self,
+            n_workers: int = 2,
+            timeout: float = 30.0,
+            max_memory_mb: Optional[int] = None,
+            image_format: str = 'png',
+            start_method: str = 'spawn',
+            startup_timeout: float = 60.0,
+    ):
+        self.n_workers = n_workers
+        self.timeout = timeout
+        self.image_format = image_format
+        self.startup_timeout = startup_timeout
+        self._max_memory_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        self._context = multiprocessing.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=n_workers)
+        for _ in range(n_workers):
+            self._start_worker()
+
+    def frame(self, df) -> PlotFrame:
+        return PlotFrame(df)
+
+    def submit(self, code: str, frame: PlotFrame) -> "Future[List[bytes]]":
+        """Run `code` with the dataframe as `df`, the future returns the rendered figures"""
+        if self._closed:
+            raise RuntimeError("PlotExecutor is closed")
+        return self._executor.submit(self._run, code, frame)
+
+    def execute(self, code: str, df) -> PlotExecutionResult:
+        with self.frame(df) as frame:
+            images = self.submit(code, frame).result()
+        return PlotExecutionResult(code=code, images=images, image_format=self.image_format)
+
+    def close(self):
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self) -> "PlotExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _start_worker(self):
+        worker = _Worker(self._context, self._max_memory_bytes, self.image_format)
+        with self._lock:
+            self._workers.append(worker)
+        threading.Thread(target=self._wait_ready, args=(worker,), daemon=True).start()
+
+    def _wait_ready(self, worker: _Worker):
+        try:
+            ready = worker.wait_ready(self.startup_timeout)
+        except (EOFError, OSError):
+            ready = False
+        if ready:
+            self._idle.put(worker)
+        else:
+            self._discard(worker)
+
+    def _discard(self, worker: _Worker):
+        with self._lock:
+            if worker not in self._workers:
+                return
+            self._workers.remove(worker)
+        worker.kill()
+        if not self._closed:
+            # replace it in the background, the caller doesn't wait for the new process
+            self._start_worker()
+
+    def _run(self, code: str, frame: PlotFrame) -> List[bytes]:
+        try:
+            worker = self._idle.get(timeout=self.startup_timeout)
+        except queue.Empty:
+            raise PlotExecutionError(f"WorkerError: no plot worker available after {self.startup_timeout} seconds",
+                                     code=code)
+        try:
+            worker.connection.send(('run', code, frame.ref))
+            if not worker.connection.poll(self.timeout):
+                self._discard(worker)
+                worker = None
+                raise PlotExecutionError(f"TimeoutError: plot code did not finish in {self.timeout} seconds",
+                                         code=code)
+            reply = worker.connection.recv()
+        except (EOFError, OSError):
+            self._discard(worker)
+            worker = None
+            raise PlotExecutionError("WorkerError: the plot worker process died (memory limit exceeded?)",
+                                     code=code)
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+
+        if reply[0] == 'error':
+            raise PlotExecutionError(reply[1], traceback=reply[2], code=code)
+        return reply[1]
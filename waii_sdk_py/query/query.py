@@ -27,6 +27,8 @@ from ..my_pydantic import WaiiBaseModel, Field
 
 from ..common import CommonRequest, LLMBasedRequest, GetObjectRequest, AsyncObjectResponse, CommonResponse
 from ..database import SearchContext, TableName, ColumnDefinition, SchemaName
+from ..dataframe import infer_column_definitions
+from .plot_executor import PlotExecutor, PlotExecutionError, PlotExecutionResult
 from ..semantic_context import SemanticStatement
 from ..waii_http_client import WaiiHttpClient
 from waii_sdk_py.utils import wrap_methods_with_async
@@ -143,6 +145,9 @@ class AccessRuleProtectionState(str, Enum):
     unprotected = "unprotected"  # Query is not guaranteed to be protected, see error msg for details
     uncompilable = "uncompilable"
     unexplainable = "unexplainable"
+    # set by TableAccessRuleIndex when it skips the server: no rule it knows of applies to the tables named in the
+    # query, tables reached through views or synonyms were not checked
+    not_checked = "not_checked"
 
 
 class AccessRuleProtectionStatus(WaiiBaseModel):
@@ -412,8 +417,10 @@ def _print_dot(stop_event):
 
 class QueryImpl:
 
-    def __init__(self, http_client: WaiiHttpClient):
+    def __init__(self, http_client: WaiiHttpClient, plot_executor: Optional[PlotExecutor] = None):
         self.http_client = http_client
+        # when set, plot() runs the generated code in its worker processes instead of this process
+        self.plot_executor = plot_executor
 
     @show_progress
     def generate(self, params: QueryGenerationRequest, verbose=True) -> GeneratedQuery:
@@ -480,38 +487,26 @@ class QueryImpl:
 
     @show_progress
     def plot(
-        self, df, ask=None, automatically_exec=True, verbose=True, max_retry=2, model=None
+        self, df, ask=None, automatically_exec=True, verbose=True, max_retry=2, model=None, column_stats=False,
+        executor: Optional[PlotExecutor] = None,
     ) -> str:
+        """
+        Generate plot code for df and return it. With automatically_exec, the code is exec-ed in this process,
+        retrying with the error up to max_retry times.
+
+        With an `executor` (or the plot_executor of this QueryImpl), the code runs in a worker process of the
+        executor instead, like render_plot, and the rendered figures are displayed when running in IPython / Jupyter.
+        """
+        executor = executor or self.plot_executor
+        if automatically_exec and executor is not None:
+            return self._plot_in_executor(df, ask, executor, verbose, max_retry, model, column_stats)
+
         if df is None or df.empty:
             raise ValueError("(Plot) Input dataframe is empty")
 
-        # create ColumnDefinition from df.columns, use first row to get type
-        cols = []
-        for col in df.columns:
-            cols.append(ColumnDefinition(name=col, type=df[col][0].__class__.__name__))
-
-        params = PythonPlotRequest(dataframe_cols=cols, ask=ask, model=model)
-        plot_response = self.http_client.common_fetch(
-            PLOT_ENDPOINT, params, PythonPlotResponse
-        )
-        p = plot_response.plots[0]
-
-        # if the p include ``` ... ```, only include lines between them, handle the case like
-        # ```python
-        # ...
-        # ```
-        # or
-        # ```
-        # <python code>
-        # ```
-
-        if p.startswith("```"):
-            p = p[3:]
-            if p.startswith("python"):
-                p = p[6:]
-            p = p.strip()
-            p = p[:-3]
-            p = p.strip()
+        # create ColumnDefinition from the dtypes of df
+        cols = infer_column_definitions(df, stats=column_stats)
+        p = self._generate_plot_code(cols, ask, model)
 
         retried = False
         if automatically_exec:
@@ -523,17 +518,14 @@ class QueryImpl:
                     print(
                         f"Trying to fix error={str(e)}, Retry with max_retry={max_retry}"
                     )
-                    fix_msg = "Fix the error and generate plot, find the following code and exception:"
-                    if not ask:
-                        ask = ""
                     return self.plot(
                         df,
-                        ask=fix_msg
-                        + f'"{ask}"'
-                        + f"\ncode:```{p}```\nException:{str(e)}",
+                        ask=_plot_fix_ask(ask, p, str(e)),
                         automatically_exec=automatically_exec,
                         verbose=verbose,
                         max_retry=max_retry - 1,
+                        model=model,
+                        column_stats=column_stats,
                     )
                 else:
                     # print the code when not verbose (because finally will print the code if it is verbose)
@@ -548,6 +540,67 @@ class QueryImpl:
             print(p)
         return p
 
+    def _plot_in_executor(self, df, ask, executor: PlotExecutor, verbose, max_retry, model, column_stats) -> str:
+        try:
+            result = self.render_plot(
+                df, ask=ask, executor=executor, max_retry=max_retry, model=model, column_stats=column_stats
+            )
+        except PlotExecutionError as e:
+            if e.code is not None:
+                print("=== generated code ===")
+                print(e.code)
+            if e.traceback:
+                print(e.traceback)
+            raise
+        _display_plot(result)
+        if verbose:
+            print("=== generated code ===")
+            print(result.code)
+        return result.code
+
+    def render_plot(
+        self, df, ask=None, executor: Optional[PlotExecutor] = None, max_retry=2, model=None, column_stats=False
+    ) -> PlotExecutionResult:
+        """
+        Generate plot code for df and run it in a worker process of `executor` (by default the plot_executor of this
+        QueryImpl, or a temporary one with a single worker) instead of exec-ing it in this process. Returns the
+        rendered images.
+
+        When the code fails, the fixed code is requested with the traceback of the failure while the worker cleans
+        up (or is replaced, after a timeout or a crash), up to max_retry times.
+        """
+        if df is None or df.empty:
+            raise ValueError("(Plot) Input dataframe is empty")
+
+        cols = infer_column_definitions(df, stats=column_stats)
+        executor = executor or self.plot_executor
+        own_executor = executor is None
+        if own_executor:
+            executor = PlotExecutor(n_workers=1)
+
+        try:
+            with executor.frame(df) as frame:
+                plot_ask = ask
+                for attempt in range(1, max_retry + 2):
+                    code = self._generate_plot_code(cols, plot_ask, model)
+                    try:
+                        images = executor.submit(code, frame).result()
+                        return PlotExecutionResult(
+                            code=code, images=images, image_format=executor.image_format, attempts=attempt
+                        )
+                    except PlotExecutionError as e:
+                        if attempt > max_retry:
+                            raise
+                        plot_ask = _plot_fix_ask(ask, code, e.traceback or str(e))
+        finally:
+            if own_executor:
+                executor.close()
+
+    def _generate_plot_code(self, cols: List[ColumnDefinition], ask: Optional[str], model: Optional[str]) -> str:
+        params = PythonPlotRequest(dataframe_cols=cols, ask=ask, model=model)
+        plot_response = self.http_client.common_fetch(PLOT_ENDPOINT, params, PythonPlotResponse)
+        return _extract_plot_code(plot_response.plots[0])
+
     def generate_question(
         self, params: GenerateQuestionRequest
     ) -> GenerateQuestionResponse:
@@ -603,6 +656,43 @@ class QueryImpl:
         )
 
 
+def _extract_plot_code(p: str) -> str:
+    # if the p include ``` ... ```, only include lines between them, handle the case like
+    # ```python
+    # ...
+    # ```
+    # or
+    # ```
+    # <python code>
+    # ```
+    if p.startswith("```"):
+        p = p[3:]
+        if p.startswith("python"):
+            p = p[6:]
+        p = p.strip()
+        p = p[:-3]
+        p = p.strip()
+    return p
+
+
+def _display_plot(result: PlotExecutionResult):
+    """Display the rendered figures inline when running in IPython / Jupyter"""
+    try:
+        from IPython import get_ipython
+        from IPython.display import Image, SVG, display
+    except ImportError:
+        return
+    if get_ipython() is None:
+        return
+    for image in result.images:
+        display(SVG(data=image) if result.image_format == 'svg' else Image(data=image, format=result.image_format))
+
+
+def _plot_fix_ask(ask: Optional[str], code: str, error: str) -> str:
+    fix_msg = "Fix the error and generate plot, find the following code and exception:"
+    return fix_msg + f'"{ask or ""}"' + f"\ncode:```{code}```\nException:{error}"
+
+
 class AsyncQueryImpl:
     """
     Asynchronous wrapper for QueryImpl that automatically converts all public methods to async.
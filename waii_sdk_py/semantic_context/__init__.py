@@ -14,4 +14,12 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .semantic_context import *
\ No newline at end of file
+from .semantic_context import *
+from .semantic_context_store import SemanticStatementStore
+from .semantic_context_mirror import SemanticContextMirror
+from .semantic_context_import import (
+    SemanticContextBulkImporter,
+    BulkImportSemanticContextResponse,
+    SemanticStatementImportFailure,
+    read_statements,
+)
@@ -14,7 +14,10 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from typing import List, Optional, Literal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Optional, Literal, Iterator, Iterable, TYPE_CHECKING
 
 from ..common import LLMBasedRequest, CommonRequest, CommonResponse
 from ..database import SearchContext
@@ -22,6 +25,10 @@ from ..my_pydantic import WaiiBaseModel
 from waii_sdk_py.utils import wrap_methods_with_async
 from ..waii_http_client import WaiiHttpClient
 
+if TYPE_CHECKING:
+    from .semantic_context_store import SemanticStatementStore
+    from .semantic_context_import import BulkImportSemanticContextResponse
+
 MODIFY_ENDPOINT = 'update-semantic-context'
 GET_ENDPOINT = 'get-semantic-context'
 ENABLE_ENDPOINT = 'enable-semantic-context'
@@ -140,6 +147,82 @@ class SemanticContextImpl:
     def disable_semantic_context(self, params: DisableSemanticContextRequest) -> DisableSemanticContextResponse:
         return self.http_client.common_fetch(DISABLE_ENDPOINT, params, DisableSemanticContextResponse)
 
+    def iter_statements(
+            self,
+            filter: Optional[GetSemanticContextRequestFilter] = None,
+            page_size: int = 1000,
+            prefetch: int = 2,
+            search_text: Optional[str] = None,
+            search_context: Optional[List[SearchContext]] = None,
+            store: Optional["SemanticStatementStore"] = None,
+    ) -> Iterator[SemanticStatement]:
+        """
+        Iterate over all the semantic statements matching the filter, page by page.
+
+        While the statements of a page are being consumed, the next `prefetch` pages are fetched concurrently.
+        If `store` is given, every statement is also added to it.
+        """
+        if filter is None:
+            filter = GetSemanticContextRequestFilter()
+
+        def fetch(offset: int) -> GetSemanticContextResponse:
+            return self.get_semantic_context(GetSemanticContextRequest(
+                filter=filter, offset=offset, limit=page_size, search_text=search_text, search_context=search_context
+            ))
+
+        page = fetch(0)
+        total = page.available_statements or 0
+        if total <= page_size:
+            # single page, or the server didn't report the number of statements: page sequentially
+            offset = 0
+            while True:
+                statements = page.semantic_context or []
+                for statement in statements:
+                    if store is not None:
+                        store.add(statement)
+                    yield statement
+                if total or len(statements) < page_size:
+                    return
+                offset += page_size
+                page = fetch(offset)
+
+        offsets = iter(range(page_size, total, page_size))
+        with ThreadPoolExecutor(max_workers=max(1, prefetch)) as executor:
+            futures = deque(executor.submit(fetch, offset) for offset in islice(offsets, max(1, prefetch)))
+            try:
+                while True:
+                    for statement in page.semantic_context or []:
+                        if store is not None:
+                            store.add(statement)
+                        yield statement
+                    if not futures:
+                        return
+                    page = futures.popleft().result()
+                    next_offset = next(offsets, None)
+                    if next_offset is not None:
+                        futures.append(executor.submit(fetch, next_offset))
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def bulk_import(
+            self,
+            statements: Iterable[SemanticStatement],
+            chunk_size: int = 500,
+            max_concurrent: int = 4,
+            skip_unchanged: bool = True,
+            existing: Optional["SemanticStatementStore"] = None,
+    ) -> "BulkImportSemanticContextResponse":
+        """
+        Import many statements (e.g. from `read_statements`): duplicates are dropped, statements identical to the
+        server state are skipped, and the rest is upserted in concurrent chunks of `chunk_size`.
+        See SemanticContextBulkImporter.
+        """
+        from .semantic_context_import import SemanticContextBulkImporter
+        return SemanticContextBulkImporter(self, chunk_size=chunk_size, max_concurrent=max_concurrent).run(
+            statements, existing=existing, skip_unchanged=skip_unchanged
+        )
+
 
 class AsyncSemanticContextImpl:
     def __init__(self, http_client: WaiiHttpClient):
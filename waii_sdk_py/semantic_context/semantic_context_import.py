@@ -0,0 +1,220 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from ..my_pydantic import WaiiBaseModel
+from .semantic_context import (
+    SemanticContextImpl,
+    SemanticStatement,
+    ModifySemanticContextRequest,
+    ModifySemanticContextResponse,
+)
+from .semantic_context_store import SemanticStatementStore
+
+# fields which are not part of the content of a statement when comparing with the server state
+_IGNORED_FIELDS = {'id', 'warnings', 'entity_type'}
+
+
+class SemanticStatementImportFailure(WaiiBaseModel):
+    statement: SemanticStatement
+    error: str
+
+
+class BulkImportSemanticContextResponse(WaiiBaseModel):
+    # statements created or updated, as returned by the server
+    updated: List[SemanticStatement] = []
+    # statements dropped because the same (normalized statement, scope) appeared again later in the input
+    n_duplicates: int = 0
+    # statements skipped because they are identical to the server state
+    n_unchanged: int = 0
+    failures: List[SemanticStatementImportFailure] = []
+
+
+def read_statements(
+        source: Union[str, os.PathLike, TextIO],
+        format: Optional[str] = None,
+) -> Iterator[SemanticStatement]:
+    """
+    Read semantic statements from a JSONL or YAML file (path or text stream), one statement at a time.
+
+    For JSONL, each non-empty line is a statement object. For YAML, each document is either a statement or a list of
+    statements. The format is guessed from the file extension when not given (default: jsonl).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if format is None:
+            format = 'yaml' if os.fspath(source).lower().endswith(('.yaml', '.yml')) else 'jsonl'
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from read_statements(f, format)
+        return
+
+    if format is None:
+        format = 'yaml' if getattr(source, 'name', '').lower().endswith(('.yaml', '.yml')) else 'jsonl'
+
+    if format == 'jsonl':
+        for line_number, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON at line {line_number}: {e}")
+            yield SemanticStatement(**obj)
+    elif format == 'yaml':
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Cannot find yaml module. Please install PyYAML to read YAML files (pip install pyyaml)")
+        for document in yaml.safe_load_all(source):
+            if document is None:
+                continue
+            for obj in (document if isinstance(document, list) else [document]):
+                yield SemanticStatement(**obj)
+    else:
+        raise ValueError(f"Unsupported format: {format}, must be one of jsonl, yaml")
+
+
+def normalized_key(statement: SemanticStatement) -> Tuple[str, str]:
+    """Key used to dedupe statements: whitespace-collapsed, lower-cased statement text and scope"""
+    return ' '.join(statement.statement.lower().split()), (statement.scope or '').strip().lower()
+
+
+def _content(statement: SemanticStatement) -> dict:
+    content = statement.dict(include=set(SemanticStatement.__fields__) - _IGNORED_FIELDS)
+    if content.get('labels'):
+        content['labels'] = sorted(content['labels'])
+    return content
+
+
+class SemanticContextBulkImporter:
+    """
+    Import a large number of semantic statements: dedupe the input, diff it against the current server state, and
+    send the remaining statements with modify_semantic_context in concurrent chunks.
+
+    The statements of the chunks which fail are retried one by one once all the chunks are sent, so a bad statement
+    only fails itself. Since a chunk may have been applied before the failure (e.g. a timeout), the server state is
+    read again (once) first: new statements which already landed are not sent a second time.
+    """
+
+    def __init__(
+            self,
+            semantic_context: SemanticContextImpl,
+            chunk_size: int = 500,
+            max_concurrent: int = 4,
+    ):
+        self.semantic_context = semantic_context
+        self.chunk_size = chunk_size
+        self.max_concurrent = max_concurrent
+
+    def run(
+            self,
+            statements: Iterable[SemanticStatement],
+            existing: Optional[SemanticStatementStore] = None,
+            skip_unchanged: bool = True,
+    ) -> BulkImportSemanticContextResponse:
+        """
+        `existing` is the current server state, e.g. a loaded SemanticContextMirror (which is then also updated with
+        the import results). If not given, it is fetched with iter_statements.
+        """
+        result = BulkImportSemanticContextResponse()
+
+        deduped: Dict[Tuple[str, str], SemanticStatement] = {}
+        for statement in statements:
+            key = normalized_key(statement)
+            if key in deduped:
+                result.n_duplicates += 1
+                del deduped[key]
+            deduped[key] = statement
+
+        if existing is None:
+            existing = SemanticStatementStore(self.semantic_context.iter_statements())
+        existing_by_key = {normalized_key(s): s for s in existing}
+
+        pending = []
+        for key, statement in deduped.items():
+            # an id unknown to the server (e.g. from another deployment) falls back to the statement text
+            current = existing.get(statement.id) if statement.id else None
+            if current is None:
+                current = existing_by_key.get(key)
+            if current is not None:
+                if skip_unchanged and _content(current) == _content(statement):
+                    result.n_unchanged += 1
+                    continue
+                statement = statement.copy(update={'id': current.id})
+            pending.append(statement)
+
+        chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+        failed: List[SemanticStatement] = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            futures = {executor.submit(self._send, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    result.updated.extend(future.result())
+                except Exception:
+                    failed.extend(futures[future])
+
+            if failed:
+                # a single retry round for the statements of all the failed chunks, one by one
+                retry, landed, failures = self._reconcile_failed(failed)
+                result.updated.extend(landed)
+                result.failures.extend(failures)
+                futures = {executor.submit(self._send, [statement]): statement for statement in retry}
+                for future in as_completed(futures):
+                    try:
+                        result.updated.extend(future.result())
+                    except Exception as e:
+                        result.failures.append(SemanticStatementImportFailure(statement=futures[future], error=str(e)))
+
+        if hasattr(existing, 'apply_modify_response'):
+            existing.apply_modify_response(ModifySemanticContextResponse(updated=result.updated))
+        return result
+
+    def _send(self, statements: List[SemanticStatement]) -> List[SemanticStatement]:
+        response = self.semantic_context.modify_semantic_context(ModifySemanticContextRequest(updated=statements))
+        return response.updated or []
+
+    def _reconcile_failed(
+            self, statements: List[SemanticStatement]
+    ) -> Tuple[List[SemanticStatement], List[SemanticStatement], List[SemanticStatementImportFailure]]:
+        """
+        Compare the new statements (without id) of the failed chunks with the server state, read once. Returns the
+        statements to retry (a new statement whose text landed with other fields gets the id of the server statement,
+        to be retried as an update), the ones which landed, and failures: when the state can't be read, new
+        statements fail, since sending them again could duplicate them.
+        """
+        if all(statement.id for statement in statements):
+            return statements, [], []
+        try:
+            current_by_key = {normalized_key(s): s for s in self.semantic_context.iter_statements()}
+        except Exception as e:
+            error = f"Cannot check whether the statement was imported before the chunk failed: {e}"
+            failures = [SemanticStatementImportFailure(statement=s, error=error) for s in statements if not s.id]
+            return [s for s in statements if s.id], [], failures
+
+        retry, landed = [], []
+        for statement in statements:
+            current = None if statement.id else current_by_key.get(normalized_key(statement))
+            if current is None:
+                retry.append(statement)
+            elif _content(current) == _content(statement):
+                landed.append(current)
+            else:
+                retry.append(statement.copy(update={'id': current.id}))
+        return retry, landed, []
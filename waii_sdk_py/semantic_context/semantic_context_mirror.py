@@ -0,0 +1,282 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re
+import threading
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Set
+
+from .semantic_context import (
+    SemanticContextImpl,
+    SemanticStatement,
+    GetSemanticContextRequestFilter,
+    GetSemanticContextResponse,
+    ModifySemanticContextRequest,
+    ModifySemanticContextResponse,
+    EnableSemanticContextRequest,
+    EnableSemanticContextResponse,
+    DisableSemanticContextRequest,
+    DisableSemanticContextResponse,
+)
+from .semantic_context_store import SemanticStatementStore
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def _words(text: Optional[str]) -> Set[str]:
+    return set(_WORD_PATTERN.findall(text.lower())) if text else set()
+
+
+class _WordIndex:
+    """
+    Inverted index from lower-cased words to statement keys, used to find candidates for a substring query:
+    every word of the query must be contained in some word of a matching text.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        # query word -> indexed words containing it, cleared whenever the vocabulary changes
+        self._vocabulary_matches: Dict[str, List[str]] = {}
+
+    def add(self, key: str, words: Iterable[str]):
+        for word in words:
+            keys = self.postings.get(word)
+            if keys is None:
+                self.postings[word] = keys = set()
+                self._vocabulary_matches.clear()
+            keys.add(key)
+
+    def remove(self, key: str, words: Iterable[str]):
+        for word in words:
+            keys = self.postings.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[word]
+                    self._vocabulary_matches.clear()
+
+    def candidates(self, text: str) -> Optional[Set[str]]:
+        # None means the text has no word to look up, the caller has to scan
+        query_words = _words(text)
+        if not query_words:
+            return None
+        result = None
+        for query_word in sorted(query_words, key=len, reverse=True):
+            matches = self._vocabulary_matches.get(query_word)
+            if matches is None:
+                matches = [word for word in self.postings if query_word in word]
+                self._vocabulary_matches[query_word] = matches
+            keys = set()
+            for word in matches:
+                keys |= self.postings[word]
+            result = keys if result is None else result & keys
+            if not result:
+                break
+        return result
+
+
+class SemanticContextMirror(SemanticStatementStore):
+    """
+    Client-side mirror of the semantic context of the activated connection.
+
+    The mirror is loaded once with `load()`, and kept current by sending modifications through
+    `modify_semantic_context`, `enable_semantic_context` and `disable_semantic_context` of the mirror (or by passing
+    the responses of those calls to the `apply_*` methods). `search()` filters the statements locally with the same
+    semantics as GetSemanticContextRequestFilter, without a server round trip.
+    """
+
+    def __init__(self, semantic_context: SemanticContextImpl):
+        self.semantic_context = semantic_context
+        self.scope: Optional[str] = None
+        self._lock = threading.RLock()
+        self._order: Dict[str, int] = {}
+        self._counter = count()
+        self._statement_index = _WordIndex()
+        self._lookup_index = _WordIndex()
+        self._labels: Dict[str, Set[str]] = {}
+        self._scopes: Dict[str, Set[str]] = {}
+        super().__init__()
+
+    def load(self, page_size: int = 1000, prefetch: int = 2) -> "SemanticContextMirror":
+        with self._lock:
+            self.clear()
+            self.scope = self.semantic_context.http_client.get_scope()
+            for _ in self.semantic_context.iter_statements(page_size=page_size, prefetch=prefetch, store=self):
+                pass
+        return self
+
+    def add(self, statement: SemanticStatement) -> str:
+        with self._lock:
+            key = self.key(statement)
+            if key in self:
+                self._unindex(key, self.get(key))
+            else:
+                self._order[key] = next(self._counter)
+            super().add(statement)
+            self._index(key, statement)
+            return key
+
+    def remove(self, key: str) -> Optional[SemanticStatement]:
+        with self._lock:
+            statement = super().remove(key)
+            if statement is not None:
+                self._unindex(key, statement)
+                del self._order[key]
+            return statement
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._order.clear()
+            self._statement_index = _WordIndex()
+            self._lookup_index = _WordIndex()
+            self._labels.clear()
+            self._scopes.clear()
+
+    def _index(self, key: str, statement: SemanticStatement):
+        self._statement_index.add(key, _words(statement.statement))
+        self._lookup_index.add(key, set().union(*[_words(s) for s in statement.lookup_summaries or []]))
+        for label in statement.labels or []:
+            self._labels.setdefault(label.lower(), set()).add(key)
+        self._scopes.setdefault((statement.scope or '').lower(), set()).add(key)
+
+    def _unindex(self, key: str, statement: SemanticStatement):
+        self._statement_index.remove(key, _words(statement.statement))
+        self._lookup_index.remove(key, set().union(*[_words(s) for s in statement.lookup_summaries or []]))
+        for label in statement.labels or []:
+            _discard(self._labels, label.lower(), key)
+        _discard(self._scopes, (statement.scope or '').lower(), key)
+
+    # keep the mirror current
+
+    def apply_modify_response(self, response: ModifySemanticContextResponse):
+        with self._lock:
+            for statement in response.updated or []:
+                self.add(statement)
+            for statement_id in response.deleted or []:
+                self.remove(statement_id)
+
+    def apply_enable_response(self, response: EnableSemanticContextResponse):
+        self._set_enabled(response.statement_ids, True)
+
+    def apply_disable_response(self, response: DisableSemanticContextResponse):
+        self._set_enabled(response.statement_ids, False)
+
+    def _set_enabled(self, statement_ids: List[str], enabled: bool):
+        with self._lock:
+            for statement_id in statement_ids:
+                statement = self.get(statement_id)
+                if statement is not None:
+                    statement.enabled = enabled
+
+    def modify_semantic_context(self, params: ModifySemanticContextRequest) -> ModifySemanticContextResponse:
+        response = self.semantic_context.modify_semantic_context(params)
+        self.apply_modify_response(response)
+        return response
+
+    def enable_semantic_context(self, params: EnableSemanticContextRequest) -> EnableSemanticContextResponse:
+        response = self.semantic_context.enable_semantic_context(params)
+        self.apply_enable_response(response)
+        return response
+
+    def disable_semantic_context(self, params: DisableSemanticContextRequest) -> DisableSemanticContextResponse:
+        response = self.semantic_context.disable_semantic_context(params)
+        self.apply_disable_response(response)
+        return response
+
+    # local search
+
+    def search(
+            self,
+            filter: Optional[GetSemanticContextRequestFilter] = None,
+            search_text: Optional[str] = None,
+            offset: int = 0,
+            limit: int = 1000,
+    ) -> GetSemanticContextResponse:
+        """
+        Search the mirrored statements, the response has the same shape as get_semantic_context.
+
+        Filter fields are AND-ed and matched as case-insensitive substrings; each of `filter.labels` has to match one of
+        the labels of a statement. `search_text` is a case-insensitive substring match against the statement or any of
+        its lookup_summaries (the server side search_text uses semantic search instead).
+        """
+        if filter is None:
+            filter = GetSemanticContextRequestFilter()
+        with self._lock:
+            candidates = self._candidates(filter, search_text)
+            keys = self._order.keys() if candidates is None else sorted(candidates, key=self._order.__getitem__)
+            matched = [s for s in (self.get(k) for k in keys) if _matches(s, filter, search_text)]
+        return GetSemanticContextResponse(
+            semantic_context=matched[offset:offset + limit],
+            available_statements=len(matched)
+        )
+
+    def _candidates(self, filter: GetSemanticContextRequestFilter, search_text: Optional[str]) -> Optional[Set[str]]:
+        candidate_sets = []
+        for label in filter.labels or []:
+            candidate_sets.append(_union(self._labels, label.lower()))
+        if filter.scope:
+            candidate_sets.append(_union(self._scopes, filter.scope.lower()))
+        if filter.statement:
+            candidate_sets.append(self._statement_index.candidates(filter.statement))
+        if search_text:
+            statement_keys = self._statement_index.candidates(search_text)
+            lookup_keys = self._lookup_index.candidates(search_text)
+            if statement_keys is not None and lookup_keys is not None:
+                candidate_sets.append(statement_keys | lookup_keys)
+
+        result = None
+        for keys in candidate_sets:
+            if keys is None:
+                continue
+            result = keys if result is None else result & keys
+        return result
+
+
+def _discard(index: Dict[str, Set[str]], value: str, key: str):
+    keys = index.get(value)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[value]
+
+
+def _union(index: Dict[str, Set[str]], substring: str) -> Set[str]:
+    keys = set()
+    for value, value_keys in index.items():
+        if substring in value:
+            keys |= value_keys
+    return keys
+
+
+def _contains(text: Optional[str], substring: str) -> bool:
+    return text is not None and substring.lower() in text.lower()
+
+
+def _matches(statement: SemanticStatement, filter: GetSemanticContextRequestFilter, search_text: Optional[str]) -> bool:
+    if filter.always_include is not None and bool(statement.always_include) != filter.always_include:
+        return False
+    for label in filter.labels or []:
+        if not any(_contains(statement_label, label) for statement_label in statement.labels or []):
+            return False
+    if filter.scope and not _contains(statement.scope, filter.scope):
+        return False
+    if filter.statement and not _contains(statement.statement, filter.statement):
+        return False
+    if search_text and not (_contains(statement.statement, search_text)
+                            or any(_contains(s, search_text) for s in statement.lookup_summaries or [])):
+        return False
+    return True
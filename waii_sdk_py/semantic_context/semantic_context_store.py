@@ -0,0 +1,71 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+from typing import Dict, Iterable, Iterator, Optional
+
+from .semantic_context import SemanticStatement
+
+
+class SemanticStatementStore:
+    """
+    Local store of semantic statements, keyed by statement id.
+
+    Labels, scopes and user/tenant/org filters repeat across most statements of a connection, they are interned so
+    that a store holding 100k+ statements keeps a single copy of each distinct value.
+    Statements without id are keyed by (scope, statement).
+    """
+
+    def __init__(self, statements: Optional[Iterable[SemanticStatement]] = None):
+        self._statements: Dict[str, SemanticStatement] = {}
+        if statements:
+            for statement in statements:
+                self.add(statement)
+
+    @staticmethod
+    def key(statement: SemanticStatement) -> str:
+        if statement.id:
+            return statement.id
+        return f"{statement.scope or ''}\x00{statement.statement}"
+
+    def add(self, statement: SemanticStatement) -> str:
+        if statement.labels:
+            statement.labels = [sys.intern(label) for label in statement.labels]
+        for field in ('scope', 'user_id', 'tenant_id', 'org_id'):
+            value = getattr(statement, field)
+            if value:
+                setattr(statement, field, sys.intern(value))
+        key = self.key(statement)
+        self._statements[key] = statement
+        return key
+
+    def remove(self, key: str) -> Optional[SemanticStatement]:
+        return self._statements.pop(key, None)
+
+    def get(self, key: str) -> Optional[SemanticStatement]:
+        return self._statements.get(key)
+
+    def clear(self):
+        self._statements.clear()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._statements
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def __iter__(self) -> Iterator[SemanticStatement]:
+        return iter(list(self._statements.values()))
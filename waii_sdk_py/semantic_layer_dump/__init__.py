@@ -14,4 +14,21 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .semantic_layer_dump import *
\ No newline at end of file
+from .semantic_layer_dump import *
+from .dump_download import ExportSemanticLayerDumpToFileResponse, SemanticLayerDumpDownload
+from .dump_import import (
+    SemanticLayerDumpImporter,
+    SemanticLayerDumpRewriter,
+    SemanticLayerImportChunk,
+    SemanticLayerImportState,
+    ImportSemanticLayerDumpFromFileResponse,
+    ImportStateStore,
+    FileImportStateStore,
+)
+from .dump_backup import (
+    SemanticLayerBackup,
+    SemanticLayerBackupEntry,
+    SemanticLayerBackupEvent,
+    SemanticLayerBackupManifest,
+    SemanticLayerBackupStatus,
+)
@@ -0,0 +1,224 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from ..common import CheckOperationStatusResponse, OperationStatus
+from ..database import SearchContext
+from ..my_pydantic import WaiiBaseModel
+from ..utils import OperationPoller, atomic_write_text
+from .dump_download import SemanticLayerDumpDownload
+from .semantic_layer_dump import SemanticLayerDumpImpl, ExportSemanticLayerDumpRequest
+
+BACKUP_MANIFEST = 'manifest.json'
+
+
+class SemanticLayerBackupEntry(WaiiBaseModel):
+    db_conn_key: str
+    # sha256 of the dump JSON, the dump is stored (gzip-compressed) in `path`, relative to the backup directory
+    sha256: str
+    path: str
+    size: int = 0
+    dump_size: int = 0
+    op_id: Optional[str] = None
+    timestamp_ms: int = 0
+
+
+class SemanticLayerBackupManifest(WaiiBaseModel):
+    # db_conn_key -> latest dump of the connection
+    connections: Dict[str, SemanticLayerBackupEntry] = {}
+
+
+class SemanticLayerBackupStatus(str, Enum):
+    EXPORTING = "exporting"
+    # the dump changed since the previous backup (or there was none) and was stored
+    SAVED = "saved"
+    UNCHANGED = "unchanged"
+    FAILED = "failed"
+
+
+class SemanticLayerBackupEvent(WaiiBaseModel):
+    db_conn_key: str
+    status: SemanticLayerBackupStatus
+    op_id: Optional[str] = None
+    # latest dump of the connection, for saved and unchanged
+    entry: Optional[SemanticLayerBackupEntry] = None
+    error: Optional[str] = None
+
+
+class SemanticLayerBackup:
+    """
+    Backs up the semantic layer of many connections into a directory.
+
+    Exports are started for up to `max_concurrent` connections at a time, and all of them are polled (and their dumps
+    downloaded) by a single OperationPoller; the next connection is started as soon as one finishes. Dumps are stored
+    gzip-compressed under objects/, named after the sha256 of their content, and manifest.json maps every connection
+    to its latest dump. A connection whose dump has the same hash as in the manifest is reported as unchanged, and
+    nothing is written for it.
+
+    The manifest is updated after every connection, so an interrupted backup keeps the connections done so far.
+    """
+
+    def __init__(
+            self,
+            dump: SemanticLayerDumpImpl,
+            directory: str,
+            max_concurrent: int = 8,
+            search_context: Optional[List[SearchContext]] = None,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 10.0,
+            max_retries: int = 3,
+    ):
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent must be at least 1, got {max_concurrent}")
+        self.dump = dump
+        self.directory = directory
+        self.max_concurrent = max_concurrent
+        self.search_context = search_context
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_retries = max_retries
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, BACKUP_MANIFEST)
+
+    def load_manifest(self) -> SemanticLayerBackupManifest:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return SemanticLayerBackupManifest(**json.load(f))
+        except FileNotFoundError:
+            return SemanticLayerBackupManifest()
+
+    def run(self, db_conn_keys: Iterable[str], timeout: Optional[float] = None) -> Iterator[SemanticLayerBackupEvent]:
+        """
+        Back up the connections, yields an event when the export of a connection starts, and when it is saved,
+        unchanged or failed. Raises TimeoutError if exports are still running after `timeout` seconds.
+        """
+        os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+        deadline = time.time() + timeout if timeout is not None else None
+        manifest = self.load_manifest()
+        waiting = deque(dict.fromkeys(db_conn_keys))
+        downloads: Dict[str, SemanticLayerDumpDownload] = {}
+        poller = OperationPoller(
+            is_done=lambda s: s.status != OperationStatus.IN_PROGRESS,
+            poll_interval=self.poll_interval,
+            max_poll_interval=self.max_poll_interval,
+            max_workers=self.max_concurrent,
+        )
+
+        def start() -> Iterator[SemanticLayerBackupEvent]:
+            while waiting and len(downloads) < self.max_concurrent:
+                key = waiting.popleft()
+                request = ExportSemanticLayerDumpRequest(db_conn_key=key)
+                if self.search_context is not None:
+                    request.search_context = self.search_context
+                try:
+                    op_id = self.dump.export_dump(request).op_id
+                except Exception as e:
+                    yield SemanticLayerBackupEvent(db_conn_key=key, status=SemanticLayerBackupStatus.FAILED,
+                                                   error=str(e))
+                    continue
+                fd, path = tempfile.mkstemp(dir=self.directory, prefix='.incoming-', suffix='.json.gz')
+                os.close(fd)
+                download = SemanticLayerDumpDownload(self.dump.http_client, op_id, path, compress=True,
+                                                     max_retries=self.max_retries)
+                downloads[key] = download
+                poller.add(key, _safe_check(download))
+                yield SemanticLayerBackupEvent(db_conn_key=key, status=SemanticLayerBackupStatus.EXPORTING,
+                                               op_id=op_id)
+
+        try:
+            yield from start()
+            while poller.pending:
+                remaining = max(0.0, deadline - time.time()) if deadline is not None else None
+                for key, status in poller.poll(remaining):
+                    yield self._finish(manifest, key, downloads.pop(key), status)
+                    yield from start()
+        finally:
+            for download in downloads.values():
+                download.abort()
+                _remove(download.path)
+
+    def _finish(
+            self,
+            manifest: SemanticLayerBackupManifest,
+            key: str,
+            download: SemanticLayerDumpDownload,
+            status: CheckOperationStatusResponse,
+    ) -> SemanticLayerBackupEvent:
+        try:
+            if status.status != OperationStatus.SUCCEEDED:
+                download.abort()
+                raise Exception(f"export {status.status.value}: {status.info}")
+            result = download.write()
+        except Exception as e:
+            _remove(download.path)
+            return SemanticLayerBackupEvent(db_conn_key=key, status=SemanticLayerBackupStatus.FAILED,
+                                            op_id=download.op_id, error=str(e))
+
+        relative_path = os.path.join('objects', result.sha256[:2], result.sha256 + '.json.gz')
+        path = os.path.join(self.directory, relative_path)
+        previous = manifest.connections.get(key)
+        if previous is not None and previous.sha256 == result.sha256 and os.path.exists(path):
+            _remove(result.path)
+            return SemanticLayerBackupEvent(db_conn_key=key, status=SemanticLayerBackupStatus.UNCHANGED,
+                                            op_id=download.op_id, entry=previous)
+
+        if os.path.exists(path):
+            # same content as another connection (or an older backup)
+            _remove(result.path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(result.path, path)
+        entry = SemanticLayerBackupEntry(
+            db_conn_key=key,
+            sha256=result.sha256,
+            path=relative_path,
+            size=result.size,
+            dump_size=result.dump_size,
+            op_id=download.op_id,
+            timestamp_ms=int(time.time() * 1000),
+        )
+        manifest.connections[key] = entry
+        self._save_manifest(manifest)
+        return SemanticLayerBackupEvent(db_conn_key=key, status=SemanticLayerBackupStatus.SAVED,
+                                        op_id=download.op_id, entry=entry)
+
+    def _save_manifest(self, manifest: SemanticLayerBackupManifest):
+        atomic_write_text(self.manifest_path, manifest.json(indent=2), prefix='.manifest-')
+
+
+def _safe_check(download: SemanticLayerDumpDownload) -> Callable[[], CheckOperationStatusResponse]:
+    # a connection whose status can't be fetched fails on its own instead of stopping the poller
+    def check() -> CheckOperationStatusResponse:
+        try:
+            return download.check()
+        except Exception as e:
+            return CheckOperationStatusResponse(op_id=download.op_id, status=OperationStatus.FAILED, info=str(e))
+
+    return check
+
+
+def _remove(path: str):
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,274 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from typing import BinaryIO, Optional, Union
+
+import requests
+
+from ..common import CheckOperationStatusRequest, CheckOperationStatusResponse, OperationStatus
+from ..my_pydantic import WaiiBaseModel
+from ..utils import JsonObjectScanner
+from ..waii_http_client.waii_http_client import WaiiHttpClient
+from .semantic_layer_dump import EXPORT_SEMANTIC_DUMP_STATUS
+
+DUMP_CHUNK_SIZE = 1 << 20
+
+# errors after which the download of the status response is resumed
+_RETRIABLE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                     requests.exceptions.Timeout)
+# largest `info` kept from a status response which isn't the dump (e.g. an error message)
+_MAX_STATUS_INFO = 1 << 20
+_CONTENT_RANGE = re.compile(r'\s*bytes\s+(\d+)-(\d+)/(\d+|\*)\s*$')
+
+
+class ExportSemanticLayerDumpToFileResponse(WaiiBaseModel):
+    op_id: str
+    # destination file, None when the dump was written to a file object
+    path: Optional[str] = None
+    compressed: bool = False
+    # bytes written to the destination
+    size: int = 0
+    # size and sha256 of the (uncompressed) dump JSON
+    dump_size: int = 0
+    sha256: str = ""
+
+
+class _CountingWriter:
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+class SemanticLayerDumpDownload:
+    """
+    Download of the dump of an export operation to a file or a binary file object, without holding it in memory.
+
+    `check()` fetches the export status (it can be used as the check of an OperationPoller): the response is streamed,
+    only its small fields are parsed, and once the export succeeded the `info` of the response (the dump) is written
+    to the destination as it is received, gzip-compressed if `compress`. `write()` then completes the destination (a
+    path is written to a hidden part file, renamed at the end).
+
+    If the transfer of a succeeded response is interrupted, it is resumed from the received bytes with a Range
+    request, when the server answers it with the requested range (206 and a matching Content-Range); otherwise the
+    download starts over. An interrupted process doesn't resume the download, it starts over.
+    """
+
+    def __init__(
+            self,
+            http_client: WaiiHttpClient,
+            op_id: str,
+            destination: Union[str, os.PathLike, BinaryIO],
+            compress: Optional[bool] = None,
+            chunk_size: int = DUMP_CHUNK_SIZE,
+            max_retries: int = 3,
+    ):
+        self.http_client = http_client
+        self.op_id = op_id
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        if isinstance(destination, (str, os.PathLike)):
+            self.path = os.fspath(destination)
+            self.file = None
+            directory, name = os.path.split(os.path.abspath(self.path))
+            self.part_path = os.path.join(directory, f".{name}.part")
+        else:
+            self.path = None
+            self.file = destination
+            self.part_path = None
+        self.compress = compress if compress is not None else bool(self.path and self.path.endswith('.gz'))
+        # scanner of the status response being received, and its number of bytes received
+        self._scanner: Optional[JsonObjectScanner] = None
+        self._received = 0
+        self._sink: Optional[_DumpSink] = None
+        self._result: Optional[ExportSemanticLayerDumpToFileResponse] = None
+
+    def check(self) -> CheckOperationStatusResponse:
+        """
+        Status of the export. When it succeeded, the dump is written to the destination (and `info` of the returned
+        status is None), call `write()` to complete it.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._fetch_status()
+            except _RETRIABLE_ERRORS:
+                if attempt == self.max_retries:
+                    self.abort()
+                    raise
+
+    def _fetch_status(self) -> CheckOperationStatusResponse:
+        response = None
+        if self._scanner is not None:
+            response = self.http_client.common_stream(
+                EXPORT_SEMANTIC_DUMP_STATUS,
+                CheckOperationStatusRequest(op_id=self.op_id),
+                headers={'Range': f'bytes={self._received}-'},
+            )
+            if not _is_requested_range(response, self._received):
+                # the range was ignored: a whole response (200), or another range
+                if response.status_code == 206:
+                    response.close()
+                    response = None
+                self._reset()
+        if response is None:
+            response = self.http_client.common_stream(
+                EXPORT_SEMANTIC_DUMP_STATUS, CheckOperationStatusRequest(op_id=self.op_id)
+            )
+        if self._scanner is None:
+            self._scanner = JsonObjectScanner(
+                capture=('op_id', 'status', 'info'), stream=self._stream_info, max_capture_bytes=_MAX_STATUS_INFO
+            )
+
+        scanner = self._scanner
+        try:
+            for chunk in response.iter_content(self.chunk_size):
+                self._received += len(chunk)
+                scanner.feed(chunk)
+        except BaseException:
+            # only the transfer of a succeeded response is resumed (the status comes before the info)
+            if scanner.values.get('status') != OperationStatus.SUCCEEDED.value:
+                self._reset()
+            raise
+        finally:
+            response.close()
+
+        self._scanner = None
+        try:
+            values = scanner.close()
+        except ValueError:
+            self._reset()
+            raise
+        status = CheckOperationStatusResponse(
+            op_id=values.get('op_id', self.op_id),
+            status=values.get('status'),
+            info=values.get('info'),
+        )
+        if status.status != OperationStatus.SUCCEEDED:
+            self._reset()
+            return status
+        if self._sink is None:
+            # the info came before the status, it was not streamed
+            if 'info' not in values:
+                raise Exception(f"The dump of the semantic layer export {self.op_id} is larger than "
+                                f"{_MAX_STATUS_INFO} bytes and is sent before the status of the export")
+            self._open_sink().write(json.dumps(values['info']).encode('utf-8'))
+        self._result = self._sink.close(self.op_id, self.path, self.compress)
+        self._sink = None
+        status.info = None
+        return status
+
+    def _stream_info(self, name: str, first: bytes):
+        if name != 'info' or self._scanner.values.get('status') != OperationStatus.SUCCEEDED.value:
+            return None
+        return self._open_sink().write
+
+    def _open_sink(self) -> "_DumpSink":
+        out = open(self.part_path, 'wb') if self.path is not None else self.file
+        self._sink = _DumpSink(out, self.compress, owned=self.path is not None)
+        return self._sink
+
+    def _reset(self):
+        """Forget the response being received, and what was written of its dump"""
+        self._scanner = None
+        self._received = 0
+        if self._sink is not None:
+            self._sink.discard()
+            self._sink = None
+        if self.part_path is not None:
+            self._remove(self.part_path)
+
+    def write(self) -> ExportSemanticLayerDumpToFileResponse:
+        """Complete the destination with the dump of a succeeded export (downloaded by `check()`)"""
+        if self._result is None:
+            raise Exception(f"The semantic layer export {self.op_id} is not downloaded, check its status first")
+        if self.path is not None:
+            os.replace(self.part_path, self.path)
+        return self._result
+
+    def abort(self):
+        """Remove the downloaded data"""
+        self._reset()
+        self._result = None
+
+    @staticmethod
+    def _remove(path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class _DumpSink:
+    """Writes the dump to a file (compressed or not), counting its size and hash"""
+
+    def __init__(self, out: BinaryIO, compress: bool, owned: bool):
+        self.out = out
+        self.owned = owned
+        self.digest = hashlib.sha256()
+        self.dump_size = 0
+        self.start = out.tell() if not owned and out.seekable() else None
+        self.counter = _CountingWriter(out)
+        self.sink = gzip.GzipFile(fileobj=self.counter, mode='wb', mtime=0) if compress else self.counter
+
+    def write(self, data: bytes):
+        self.digest.update(data)
+        self.dump_size += len(data)
+        self.sink.write(data)
+
+    def close(self, op_id: str, path: Optional[str], compress: bool) -> ExportSemanticLayerDumpToFileResponse:
+        if self.sink is not self.counter:
+            self.sink.close()
+        self.out.flush()
+        if self.owned:
+            self.out.close()
+        return ExportSemanticLayerDumpToFileResponse(
+            op_id=op_id,
+            path=path,
+            compressed=compress,
+            size=self.counter.size,
+            dump_size=self.dump_size,
+            sha256=self.digest.hexdigest(),
+        )
+
+    def discard(self):
+        if self.sink is not self.counter:
+            # closed now, it would write its trailer to the file whenever it is garbage collected otherwise
+            self.sink.close()
+        if self.owned:
+            self.out.close()
+        elif self.counter.size:
+            if self.start is None:
+                raise Exception("The download of the semantic layer dump must start over, but the destination file "
+                                "object is not seekable")
+            self.out.seek(self.start)
+            self.out.truncate()
+
+
+def _is_requested_range(response, offset: int) -> bool:
+    """Whether the response is the part of the body starting at `offset` (e.g. Content-Range: bytes 4000-9999/10000)"""
+    if response.status_code != 206:
+        return False
+    match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+    return match is not None and int(match.group(1)) == offset
@@ -0,0 +1,458 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from ..common import CheckOperationStatusRequest, CheckOperationStatusResponse, OperationStatus
+from ..database import SearchContext
+from ..my_pydantic import WaiiBaseModel
+from ..utils import JsonArrayItems, JsonObjectScanner, OperationPoller, atomic_write_text
+from .dump_download import DUMP_CHUNK_SIZE
+from .semantic_layer_dump import SemanticLayerDumpImpl, ImportSemanticLayerDumpRequest
+
+# members of the dump which are sent with every chunk
+_CONTEXT_MEMBERS = ('version', 'metadata')
+
+# fields holding a schema name, a database name, SQL, or qualified names (scope), by member of the dump. Paths are
+# relative to each item of the members which are lists, "*" stands for every item of a nested list
+_REWRITTEN_FIELDS: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {
+    'metadata': [(('source_database',), 'database')],
+    'database': [
+        (('content_filters', '*', 'search_context', '*', 'schema_name'), 'schema'),
+        (('content_filters', '*', 'search_context', '*', 'db_name'), 'database'),
+    ],
+    'tables': [
+        (('schema_name',), 'schema'),
+        (('database_name',), 'database'),
+        (('name', 'schema_name'), 'schema'),
+        (('name', 'database_name'), 'database'),
+    ],
+    'schemas': [
+        (('name',), 'schema'),
+        (('database_name',), 'database'),
+        (('name', 'schema_name'), 'schema'),
+        (('name', 'database_name'), 'database'),
+    ],
+    'liked_queries': [(('query',), 'sql')],
+    'semantic_contexts': [(('scope',), 'scope')],
+}
+
+# chains of (optionally quoted) identifiers separated by dots, e.g. db.schema.table, "Sales".orders
+_IDENTIFIER = r'(?:"[^"]+"|[A-Za-z_][\w$]*)'
+_QUALIFIED_NAME = re.compile(rf'(?<![\w$".]){_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})+')
+_NAME_PART = re.compile(rf'{_IDENTIFIER}|\s*\.\s*')
+# tokens of a SQL statement: string literals and comments (kept as they are), names, commas
+_SQL_TOKEN = re.compile(
+    rf"(?P<skip>'(?:[^']|'')*'?|--[^\n]*|/\*.*?(?:\*/|$))"
+    rf"|(?<![\w$]){_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})*"
+    rf"|(?P<comma>,)",
+    re.DOTALL,
+)
+# keywords followed by a table reference, and keywords ending a list of table references
+_TABLE_KEYWORDS = {'FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE'}
+_CLAUSE_KEYWORDS = {'SELECT', 'WHERE', 'ON', 'USING', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'SET', 'VALUES',
+                    'UNION', 'EXCEPT', 'INTERSECT', 'WINDOW', 'QUALIFY', 'RETURNING', 'WITH'}
+
+
+class SemanticLayerDumpRewriter:
+    """
+    Applies schema and database mappings to the content of a semantic layer dump on the client, before it is
+    imported.
+
+    Only the known fields of the members of the dump are rewritten (see _REWRITTEN_FIELDS): fields holding a schema
+    or database name (the schema_name of a table, the name of a schema, the source_database of the metadata, ...) are
+    mapped as a whole, and qualified names in scopes and SQL (the scope of a semantic context, the query of a liked
+    query) are mapped part by part: database.schema[.table] and schema.table. Other fields, even when they are named
+    schema or database, and descriptions are left as they are.
+
+    In SQL, string literals and comments are left as they are, and two-part names are only mapped where a table is
+    referenced (after FROM, JOIN, INTO, ...), so alias.column is never taken for schema.table. Names are matched
+    case-insensitively.
+    """
+
+    def __init__(self, schema_mapping: Optional[Dict[str, str]] = None,
+                 database_mapping: Optional[Dict[str, str]] = None):
+        self.schema_mapping = {k.lower(): v for k, v in (schema_mapping or {}).items()}
+        self.database_mapping = {k.lower(): v for k, v in (database_mapping or {}).items()}
+        # kind of field -> rewriter of its string values
+        self._rewriters: Dict[str, Callable[[str], str]] = {
+            'schema': self._schema,
+            'database': self._database,
+            'sql': self.rewrite_sql,
+            'scope': self.rewrite_scope,
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.schema_mapping or self.database_mapping)
+
+    def rewrite(self, value: Any, section: str) -> Any:
+        """
+        Rewrite an item of a member of the dump which is a list (e.g. a table of "tables"), or the value of another
+        member (e.g. "metadata"), in place
+        """
+        if not self:
+            return value
+        for path, kind in _REWRITTEN_FIELDS.get(section, ()):
+            self._rewrite(value, path, self._rewriters[kind])
+        return value
+
+    def _rewrite(self, value: Any, path: Tuple[str, ...], rewriter: Callable[[str], str]):
+        key, rest = path[0], path[1:]
+        if key == '*':
+            if isinstance(value, list):
+                for item in value:
+                    self._rewrite(item, rest, rewriter)
+        elif isinstance(value, dict) and key in value:
+            if not rest:
+                if isinstance(value[key], str):
+                    value[key] = rewriter(value[key])
+            else:
+                self._rewrite(value[key], rest, rewriter)
+
+    def rewrite_scope(self, text: str) -> str:
+        """Map the database and schema of the qualified names of a scope (e.g. db.schema.table, schema.*)"""
+        return _QUALIFIED_NAME.sub(lambda match: self._qualified_name(match.group(0)), text)
+
+    def rewrite_sql(self, text: str) -> str:
+        """Map the database and schema of the table (and column) references of a SQL statement"""
+        parts = []
+        position = 0
+        # in a FROM list (a comma is followed by another table), and whether the next name is a table
+        in_from = expect_table = False
+        for match in _SQL_TOKEN.finditer(text):
+            if match.group('skip') is not None:
+                continue
+            if match.group('comma') is not None:
+                expect_table = in_from
+                continue
+            name = match.group(0)
+            n_parts = len(_NAME_PART.findall(name)) // 2 + 1
+            if n_parts == 1:
+                keyword = '' if name.startswith('"') else name.upper()
+                if keyword in _TABLE_KEYWORDS:
+                    in_from = keyword in ('FROM', 'JOIN')
+                    expect_table = True
+                elif keyword in _CLAUSE_KEYWORDS:
+                    in_from = expect_table = False
+                elif keyword not in ('LATERAL', 'ONLY'):
+                    expect_table = False
+                continue
+            if expect_table or n_parts >= 3:
+                # a table reference, or a name of 3+ parts (database.schema.table, schema.table.column)
+                parts.append(text[position:match.start()])
+                parts.append(self._qualified_name(name))
+                position = match.end()
+            expect_table = False
+        parts.append(text[position:])
+        return ''.join(parts)
+
+    def _qualified_name(self, name: str) -> str:
+        tokens = _NAME_PART.findall(name)
+        names = tokens[::2]
+        keys = [name.strip('"').lower() for name in names]
+        if keys[0] in self.database_mapping and (len(names) >= 3 or keys[0] not in self.schema_mapping) \
+                or len(names) >= 3 and keys[1] in self.schema_mapping:
+            # database.schema[.table...]
+            names[0] = _mapped(names[0], self.database_mapping)
+            names[1] = _mapped(names[1], self.schema_mapping)
+        elif keys[0] in self.schema_mapping:
+            # schema.table[.column]
+            names[0] = _mapped(names[0], self.schema_mapping)
+        else:
+            return name
+        tokens[::2] = names
+        return ''.join(tokens)
+
+    def _schema(self, name: str) -> str:
+        return self.schema_mapping.get(name.lower(), name)
+
+    def _database(self, name: str) -> str:
+        return self.database_mapping.get(name.lower(), name)
+
+
+def _mapped(name: str, mapping: Dict[str, str]) -> str:
+    quoted = name.startswith('"')
+    target = mapping.get(name.strip('"').lower())
+    if target is None:
+        return name
+    return f'"{target}"' if quoted else target
+
+
+class SemanticLayerImportState(WaiiBaseModel):
+    # content hash of the chunks already imported -> op_id of their import
+    applied: Dict[str, str] = {}
+
+
+class ImportStateStore(ABC):
+    """Persists the chunks applied by semantic layer imports, so that re-imports skip them"""
+
+    @abstractmethod
+    def load(self) -> SemanticLayerImportState:
+        pass
+
+    @abstractmethod
+    def save(self, state: SemanticLayerImportState):
+        pass
+
+
+class FileImportStateStore(ImportStateStore):
+    """Stores the import state in a local JSON file, replaced atomically"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> SemanticLayerImportState:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return SemanticLayerImportState(**json.load(f))
+        except FileNotFoundError:
+            return SemanticLayerImportState()
+
+    def save(self, state: SemanticLayerImportState):
+        atomic_write_text(self.path, state.json(), prefix='.import-state-')
+
+
+class SemanticLayerImportChunk(WaiiBaseModel):
+    # member of the dump (tables, schemas, liked_queries, ...), "" for the chunk of the members which aren't lists, or
+    # of the whole dump when it is not imported in chunks
+    section: str
+    index: int = 0
+    n_items: int = 0
+    # content hash of the chunk (with the target connection)
+    sha256: str
+    op_id: Optional[str] = None
+    status: Optional[OperationStatus] = None
+    info: Optional[Any] = None
+    # already applied by a previous import
+    skipped: bool = False
+
+
+class ImportSemanticLayerDumpFromFileResponse(WaiiBaseModel):
+    chunks: List[SemanticLayerImportChunk] = []
+
+    @property
+    def failed(self) -> List[SemanticLayerImportChunk]:
+        return [c for c in self.chunks if not c.skipped and c.status != OperationStatus.SUCCEEDED]
+
+
+class SemanticLayerDumpImporter:
+    """
+    Imports a semantic layer dump file (JSON, gzip-compressed if the path ends with .gz).
+
+    By default the dump is imported with a single import request, as the import endpoint does.
+
+    With `chunk_size`, the dump is read as a stream: the members which are lists (tables, schemas, semantic contexts,
+    liked queries, ...) are split into chunks of `chunk_size` items, each chunk is imported separately (with the
+    version and metadata of the dump), and the other members are imported as one more chunk. At most `max_concurrent`
+    imports are in flight, their status is polled by a single OperationPoller. Only use it with a server which merges
+    each import into the semantic layer of the connection (rather than replacing it with the imported dump), and
+    where concurrent imports into the same connection don't conflict.
+
+    Schema and database mappings are applied on the client (see SemanticLayerDumpRewriter). With a `state_store`,
+    chunks whose content was imported successfully into the same connection before are skipped.
+    """
+
+    def __init__(
+            self,
+            dump: SemanticLayerDumpImpl,
+            db_conn_key: str,
+            schema_mapping: Optional[Dict[str, str]] = None,
+            database_mapping: Optional[Dict[str, str]] = None,
+            search_context: Optional[List[SearchContext]] = None,
+            chunk_size: Optional[int] = None,
+            max_concurrent: int = 4,
+            state_store: Optional[ImportStateStore] = None,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 10.0,
+    ):
+        if chunk_size is not None and chunk_size < 1 or max_concurrent < 1:
+            raise ValueError("chunk_size and max_concurrent must be at least 1")
+        self.dump = dump
+        self.db_conn_key = db_conn_key
+        self.rewriter = SemanticLayerDumpRewriter(schema_mapping, database_mapping)
+        self.search_context = search_context
+        self.chunk_size = chunk_size
+        self.max_concurrent = max_concurrent
+        self.state_store = state_store
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+
+    def run(self, source: Union[str, os.PathLike, BinaryIO],
+            timeout: Optional[float] = None) -> ImportSemanticLayerDumpFromFileResponse:
+        deadline = time.time() + timeout if timeout is not None else None
+        state = self.state_store.load() if self.state_store is not None else SemanticLayerImportState()
+        chunks: List[SemanticLayerImportChunk] = []
+        # op_id -> chunk
+        in_flight: Dict[str, SemanticLayerImportChunk] = {}
+        poller = OperationPoller(
+            is_done=lambda s: s.status != OperationStatus.IN_PROGRESS,
+            poll_interval=self.poll_interval,
+            max_poll_interval=self.max_poll_interval,
+            max_workers=self.max_concurrent,
+        )
+
+        def remaining() -> Optional[float]:
+            return max(0.0, deadline - time.time()) if deadline is not None else None
+
+        def finished(op_id: str, status: CheckOperationStatusResponse):
+            chunk = in_flight.pop(op_id)
+            chunk.status = status.status
+            chunk.info = status.info
+            if status.status == OperationStatus.SUCCEEDED:
+                state.applied[chunk.sha256] = op_id
+                if self.state_store is not None:
+                    self.state_store.save(state)
+
+        def submit(chunk: SemanticLayerImportChunk, configuration: Dict[str, Any]):
+            chunks.append(chunk)
+            if chunk.sha256 in state.applied:
+                chunk.skipped = True
+                chunk.op_id = state.applied[chunk.sha256]
+                return
+            while len(in_flight) >= self.max_concurrent:
+                for op_id, status in poller.poll(remaining()):
+                    finished(op_id, status)
+                    break
+            request = ImportSemanticLayerDumpRequest(db_conn_key=self.db_conn_key, configuration=configuration)
+            if self.search_context is not None:
+                request.search_context = self.search_context
+            chunk.op_id = self.dump.import_dump(request).op_id
+            in_flight[chunk.op_id] = chunk
+            poller.add(chunk.op_id, self._status_check(chunk.op_id))
+
+        try:
+            with _open_dump(source) as file:
+                self._read_chunks(file, submit)
+        except Exception:
+            # wait for the imports already started, so that those which succeed are recorded in the state and
+            # skipped when the import is run again
+            try:
+                for op_id, status in poller.poll(remaining()):
+                    finished(op_id, status)
+            except Exception:
+                pass
+            raise
+        for op_id, status in poller.poll(remaining()):
+            finished(op_id, status)
+        return ImportSemanticLayerDumpFromFileResponse(chunks=chunks)
+
+    def _read_chunks(self, file: BinaryIO, submit: Callable[[SemanticLayerImportChunk, Dict[str, Any]], None]):
+        if self.chunk_size is None:
+            dump = json.load(file)
+            for name, value in dump.items():
+                if isinstance(value, list):
+                    for item in value:
+                        self.rewriter.rewrite(item, name)
+                else:
+                    self.rewriter.rewrite(value, name)
+            submit(*self._chunk('', 0, 0, dump))
+            return
+
+        # first pass: the members which aren't lists (small), the context of every chunk
+        others: Dict[str, List[bytes]] = {}
+
+        def scan_member(name: str, first: bytes):
+            if first == b'[':
+                return None
+            return others.setdefault(name, []).append
+
+        _scan(file, JsonObjectScanner(stream=scan_member))
+        members = {name: self.rewriter.rewrite(json.loads(b''.join(parts)), name) for name, parts in others.items()}
+        context = {name: members[name] for name in _CONTEXT_MEMBERS if name in members}
+        if len(members) > len(context):
+            submit(*self._chunk('', 0, 0, members))
+
+        # second pass: the items of the lists, chunk by chunk
+        batch: List[Any] = []
+        counts: Dict[str, int] = {}
+
+        def flush(section: str):
+            if batch:
+                index = counts.get(section, 0)
+                counts[section] = index + 1
+                submit(*self._chunk(section, index, len(batch), {**context, section: list(batch)}))
+                batch.clear()
+
+        # (name, items) of the list being read
+        current = []
+
+        def end_section():
+            if current:
+                name, items = current
+                items.close()
+                flush(name)
+                current.clear()
+
+        def read_section(name: str, first: bytes):
+            if first != b'[':
+                return None
+            end_section()
+
+            def on_item(item: Any):
+                batch.append(self.rewriter.rewrite(item, name))
+                if len(batch) >= self.chunk_size:
+                    flush(name)
+
+            items = JsonArrayItems(on_item)
+            current.extend((name, items))
+            return items.feed
+
+        file.seek(0)
+        _scan(file, JsonObjectScanner(stream=read_section))
+        end_section()
+
+    def _chunk(self, section: str, index: int, n_items: int, configuration: Dict[str, Any]):
+        content = json.dumps({'db_conn_key': self.db_conn_key, 'configuration': configuration},
+                             sort_keys=True, separators=(',', ':'), default=str)
+        chunk = SemanticLayerImportChunk(
+            section=section, index=index, n_items=n_items, sha256=hashlib.sha256(content.encode()).hexdigest()
+        )
+        return chunk, configuration
+
+    def _status_check(self, op_id: str) -> Callable[[], CheckOperationStatusResponse]:
+        return lambda: self.dump.import_dump_status(CheckOperationStatusRequest(op_id=op_id))
+
+
+def _scan(file: BinaryIO, scanner: JsonObjectScanner):
+    for chunk in iter(lambda: file.read(DUMP_CHUNK_SIZE), b''):
+        scanner.feed(chunk)
+    scanner.close()
+
+
+@contextmanager
+def _open_dump(source: Union[str, os.PathLike, BinaryIO]) -> Iterator[BinaryIO]:
+    """The dump as a seekable binary file (it is read twice), decompressed if it is a .gz path"""
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        with (gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')) as file:
+            yield file
+    elif source.seekable():
+        yield source
+    else:
+        with tempfile.TemporaryFile() as file:
+            shutil.copyfileobj(source, file, DUMP_CHUNK_SIZE)
+            file.seek(0)
+            yield file
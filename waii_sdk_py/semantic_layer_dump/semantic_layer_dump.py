@@ -23,8 +23,14 @@ from waii_sdk_py.query import LikedQuery
 from waii_sdk_py.semantic_context import SemanticStatement
 from waii_sdk_py.waii_http_client.waii_http_client import WaiiHttpClient
 
-from typing import Dict, Any, Union
+from typing import Dict, Any, Union, BinaryIO, Iterable, Iterator, TYPE_CHECKING
 from enum import Enum
+import os
+
+if TYPE_CHECKING:
+    from .dump_download import ExportSemanticLayerDumpToFileResponse
+    from .dump_import import ImportSemanticLayerDumpFromFileResponse, ImportStateStore
+    from .dump_backup import SemanticLayerBackupEvent
 
 
 IMPORT_SEMANTIC_DUMP = "semantic-layer/import"
@@ -91,5 +97,101 @@ class SemanticLayerDumpImpl:
             params,
             CheckOperationStatusResponse
         )
-    
+
+    def export_dump_to_file(
+            self,
+            params: ExportSemanticLayerDumpRequest,
+            destination: Union[str, os.PathLike, BinaryIO],
+            compress: Optional[bool] = None,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 10.0,
+            timeout: Optional[float] = None,
+            max_retries: int = 3,
+    ) -> "ExportSemanticLayerDumpToFileResponse":
+        """
+        Export the semantic layer, wait for the export to finish and write the dump (the `info` of the export status,
+        as JSON) to a file path or a binary file object, chunk by chunk.
+
+        The dump is gzip-compressed when `compress` is true (by default: when the path ends with .gz).
+        """
+        op_id = self.export_dump(params).op_id
+        return self.download_export_dump(
+            op_id, destination, compress, poll_interval, max_poll_interval, timeout, max_retries
+        )
+
+    def download_export_dump(
+            self,
+            op_id: str,
+            destination: Union[str, os.PathLike, BinaryIO],
+            compress: Optional[bool] = None,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 10.0,
+            timeout: Optional[float] = None,
+            max_retries: int = 3,
+    ) -> "ExportSemanticLayerDumpToFileResponse":
+        """
+        Same as export_dump_to_file for an export which was already started.
+        """
+        from .dump_download import SemanticLayerDumpDownload
+        from ..common import OperationStatus
+        from ..utils import OperationPoller
+
+        download = SemanticLayerDumpDownload(self.http_client, op_id, destination, compress, max_retries=max_retries)
+        poller = OperationPoller(
+            is_done=lambda s: s.status != OperationStatus.IN_PROGRESS,
+            poll_interval=poll_interval,
+            max_poll_interval=max_poll_interval,
+            max_workers=1,
+        )
+        poller.add(op_id, download.check)
+        status = None
+        for _, status in poller.poll(timeout):
+            pass
+        if status.status != OperationStatus.SUCCEEDED:
+            download.abort()
+            raise Exception(f"Semantic layer export {op_id} {status.status.value}: {status.info}")
+        return download.write()
+
+    def import_dump_from_file(
+            self,
+            db_conn_key: str,
+            source: Union[str, os.PathLike, BinaryIO],
+            schema_mapping: Optional[Dict[str, str]] = None,
+            database_mapping: Optional[Dict[str, str]] = None,
+            search_context: Optional[List[SearchContext]] = None,
+            chunk_size: Optional[int] = None,
+            max_concurrent: int = 4,
+            state_store: Optional["ImportStateStore"] = None,
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 10.0,
+            timeout: Optional[float] = None,
+    ) -> "ImportSemanticLayerDumpFromFileResponse":
+        """
+        Import a dump file (e.g. written by export_dump_to_file), with the schema and database mappings applied on the
+        client. The dump is imported with one request, or in chunks of `chunk_size` items imported concurrently when
+        the server merges imports. See SemanticLayerDumpImporter.
+        """
+        from .dump_import import SemanticLayerDumpImporter
+
+        importer = SemanticLayerDumpImporter(
+            self, db_conn_key, schema_mapping, database_mapping, search_context, chunk_size, max_concurrent,
+            state_store, poll_interval, max_poll_interval,
+        )
+        return importer.run(source, timeout)
+
+    def backup(
+            self,
+            db_conn_keys: Iterable[str],
+            directory: str,
+            max_concurrent: int = 8,
+            timeout: Optional[float] = None,
+    ) -> Iterator["SemanticLayerBackupEvent"]:
+        """
+        Back up the semantic layer of many connections into `directory`, exporting up to `max_concurrent` of them at
+        a time. Yields the status of every connection as it changes. See SemanticLayerBackup.
+        """
+        from .dump_backup import SemanticLayerBackup
+
+        return SemanticLayerBackup(self, directory, max_concurrent).run(db_conn_keys, timeout)
+
 SemanticLayerDump = SemanticLayerDumpImpl(WaiiHttpClient.get_instance())
\ No newline at end of file
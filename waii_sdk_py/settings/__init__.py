@@ -15,3 +15,4 @@ limitations under the License.
 """
 
 from .settings import *
+from .parameter_cache import ParameterCache, ParameterContext
@@ -0,0 +1,211 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Union
+
+from ..user import CommonResponse
+from .settings import (
+    SettingsImpl,
+    Parameters,
+    ParameterInfo,
+    UpdateParameterRequest,
+    DeleteParameterRequest,
+)
+
+_TRUE_VALUES = {'true', '1', 'yes', 'on', 'enabled'}
+
+
+class ParameterContext(NamedTuple):
+    """What the values of the parameters depend on: the connection (scope), the org and the (impersonated) user"""
+    scope: str
+    org_id: str
+    user_id: str
+    impersonate_user_id: str
+
+    @property
+    def effective_user_id(self) -> str:
+        return self.impersonate_user_id or self.user_id
+
+
+class _CacheEntry:
+    def __init__(self, parameters: Dict[str, ParameterInfo], loaded_at: float):
+        self.parameters = parameters
+        self.values = {name: info.value for name, info in parameters.items()}
+        self.loaded_at = loaded_at
+        self.used_at = loaded_at
+
+
+class ParameterCache:
+    """
+    Cache of the parameter values returned by `list_parameters`.
+
+    The values the server resolves for a caller depend on the connection, the org, the tenant and the user, so they
+    are cached per context (scope, org, user and impersonated user of the http client at the time of the read). Reads
+    are dictionary lookups; a context is loaded on its first read and again once it is older than `ttl_seconds`.
+
+    `update_parameter` / `delete_parameter` of the cache invalidate every context the change could target: contexts
+    of another connection, org or user than the target are kept, anything else (e.g. a tenant-level change) is
+    reloaded on its next read.
+
+    With `refresh_interval`, a background thread reloads the contexts read within the last `ttl_seconds` every
+    `refresh_interval` seconds, so reads on a hot path don't wait for the reload. Call `close()` to stop it.
+    """
+
+    def __init__(
+            self,
+            settings: SettingsImpl,
+            ttl_seconds: Optional[float] = 60,
+            refresh_interval: Optional[float] = None,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.settings = settings
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._entries: Dict[ParameterContext, _CacheEntry] = {}
+        # incremented by invalidations, a load which started before is not kept
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        if refresh_interval is not None:
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._refresher.start()
+
+    def context(self) -> ParameterContext:
+        http_client = self.settings.http_client
+        return ParameterContext(http_client.scope, http_client.orgId, http_client.userId,
+                                http_client.impersonateUserId)
+
+    def get(self, parameter: Union[Parameters, str], default: Any = None) -> Any:
+        """Value of the parameter for the current context, `default` when it isn't set"""
+        value = self._entry().values.get(_name(parameter))
+        return default if value is None else value
+
+    def is_enabled(self, parameter: Union[Parameters, str], default: bool = False) -> bool:
+        value = self.get(parameter)
+        if value is None:
+            return default
+        if isinstance(value, str):
+            return value.strip().lower() in _TRUE_VALUES
+        return bool(value)
+
+    def parameters(self) -> Dict[str, ParameterInfo]:
+        """All parameters of the current context, with their possible values"""
+        return dict(self._entry().parameters)
+
+    def update_parameter(self, params: UpdateParameterRequest) -> CommonResponse:
+        try:
+            return self.settings.update_parameter(params)
+        finally:
+            self._invalidate_target(params.target_connection_key, params.target_org_id, params.target_user_id)
+
+    def delete_parameter(self, params: DeleteParameterRequest) -> CommonResponse:
+        try:
+            return self.settings.delete_parameter(params)
+        finally:
+            self._invalidate_target(params.target_connection_key, params.target_org_id, params.target_user_id)
+
+    def invalidate(self, context: Optional[ParameterContext] = None):
+        """Drop the values of a context, of all contexts by default"""
+        with self._lock:
+            self._generation += 1
+            if context is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(context, None)
+
+    def refresh(self, context: Optional[ParameterContext] = None):
+        """Reload the values of a context (by default: the current one) now"""
+        context = context or self.context()
+        generation = self._generation
+        entry = self._load(context)
+        with self._lock:
+            if generation == self._generation:
+                previous = self._entries.get(context)
+                if previous is not None:
+                    entry.used_at = previous.used_at
+                self._entries[context] = entry
+
+    def close(self):
+        self._stopped.set()
+        if self._refresher is not None:
+            self._refresher.join()
+
+    def __enter__(self) -> "ParameterCache":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _entry(self) -> _CacheEntry:
+        context = self.context()
+        entry = self._entries.get(context)
+        now = self._clock()
+        if entry is None or (self.ttl_seconds is not None and now - entry.loaded_at > self.ttl_seconds):
+            generation = self._generation
+            entry = self._load(context)
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[context] = entry
+        entry.used_at = now
+        return entry
+
+    def _load(self, context: ParameterContext) -> _CacheEntry:
+        # a copy of the client, so that switching connection or user while loading (or loading another context
+        # from the refresher thread) can't mix contexts
+        http_client = copy.copy(self.settings.http_client)
+        http_client.scope, http_client.orgId, http_client.userId, http_client.impersonateUserId = context
+        return _CacheEntry(SettingsImpl(http_client).list_parameters().parameters, self._clock())
+
+    def _invalidate_target(self, connection_key: Optional[str], org_id: Optional[str], user_id: Optional[str]):
+        with self._lock:
+            self._generation += 1
+            for context in list(self._entries):
+                if connection_key is not None and context.scope != connection_key:
+                    continue
+                if org_id is not None and context.org_id and context.org_id != org_id:
+                    continue
+                if user_id is not None and context.effective_user_id != user_id:
+                    continue
+                del self._entries[context]
+
+    def _refresh_loop(self):
+        while not self._stopped.wait(self.refresh_interval):
+            now = self._clock()
+            with self._lock:
+                contexts = list(self._entries.items())
+            for context, entry in contexts:
+                if self._stopped.is_set():
+                    return
+                if self.ttl_seconds is not None and now - entry.used_at > self.ttl_seconds:
+                    # not read lately, loaded again on the next read
+                    with self._lock:
+                        if self._entries.get(context) is entry:
+                            del self._entries[context]
+                    continue
+                try:
+                    self.refresh(context)
+                except Exception:
+                    # the entry is kept, and loaded again on read once it expires
+                    pass
+
+
+def _name(parameter: Union[Parameters, str]) -> str:
+    return parameter.value if isinstance(parameter, Parameters) else parameter
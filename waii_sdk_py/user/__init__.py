@@ -14,4 +14,15 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .user import *
\ No newline at end of file
+from .user import *
+from .provisioning import (
+    ProvisioningManifest,
+    ProvisioningEntityType,
+    ProvisioningOperation,
+    ProvisioningAction,
+    ProvisioningActionStatus,
+    ProvisioningActionResult,
+    ProvisioningResult,
+    ProvisioningJournal,
+    ProvisioningEngine,
+)
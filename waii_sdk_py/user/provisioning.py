@@ -0,0 +1,395 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from ..my_pydantic import WaiiBaseModel
+from .user import (
+    UserImpl,
+    Organization,
+    Tenant,
+    User,
+    CreateOrganizationRequest,
+    UpdateOrganizationRequest,
+    ListOrganizationsRequest,
+    CreateTenantRequest,
+    UpdateTenantRequest,
+    DeleteTenantRequest,
+    ListTenantsRequest,
+    CreateUserRequest,
+    UpdateUserRequest,
+    DeleteUserRequest,
+    ListUsersRequest,
+)
+
+
+class ProvisioningManifest(WaiiBaseModel):
+    """Desired state: the orgs, tenants and users (with their roles) which must exist"""
+    orgs: List[Organization] = []
+    tenants: List[Tenant] = []
+    users: List[User] = []
+
+
+class ProvisioningEntityType(str, Enum):
+    ORG = "org"
+    TENANT = "tenant"
+    USER = "user"
+
+
+class ProvisioningOperation(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class ProvisioningAction(WaiiBaseModel):
+    entity_type: ProvisioningEntityType
+    operation: ProvisioningOperation
+    id: str
+    # org of the tenant or user (None: the org of the caller), ids of tenants and users are only unique within an org
+    org_id: Optional[str] = None
+    # the Organization / Tenant / User to create or update, None for deletes (not a Union, which would convert
+    # a tenant to an organization)
+    entity: Optional[Any] = None
+
+    def key(self) -> str:
+        """Identity of the action (including the content of the entity) in the journal"""
+        content = json.dumps(
+            [self.entity_type.value, self.operation.value, self.org_id, self.id,
+             self.entity.dict() if self.entity else None],
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ProvisioningActionStatus(str, Enum):
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    # applied by a previous run, according to the journal
+    SKIPPED = "skipped"
+
+
+class ProvisioningActionResult(WaiiBaseModel):
+    action: ProvisioningAction
+    status: ProvisioningActionStatus
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+class ProvisioningResult(WaiiBaseModel):
+    results: List[ProvisioningActionResult] = []
+
+    @property
+    def failed(self) -> List[ProvisioningActionResult]:
+        return [r for r in self.results if r.status == ProvisioningActionStatus.FAILED]
+
+
+# (org id, id) of an entity, the org id of an org is None
+_EntityKey = Tuple[Optional[str], str]
+
+# creates and updates, then deletes (users before the tenants they belong to)
+_PHASES = [
+    (ProvisioningEntityType.ORG, (ProvisioningOperation.CREATE, ProvisioningOperation.UPDATE)),
+    (ProvisioningEntityType.TENANT, (ProvisioningOperation.CREATE, ProvisioningOperation.UPDATE)),
+    (ProvisioningEntityType.USER, (ProvisioningOperation.CREATE, ProvisioningOperation.UPDATE)),
+    (ProvisioningEntityType.USER, (ProvisioningOperation.DELETE,)),
+    (ProvisioningEntityType.TENANT, (ProvisioningOperation.DELETE,)),
+]
+
+
+class ProvisioningJournal:
+    """
+    Append-only JSONL record of the provisioning actions applied (or failed), one line per action. Actions recorded
+    as succeeded are skipped when the same manifest is applied again, e.g. after a failure mid-way.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def succeeded(self) -> Set[str]:
+        """Keys of the actions which succeeded"""
+        keys = set()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line of an interrupted run
+                        continue
+                    if entry.get('status') == ProvisioningActionStatus.SUCCEEDED.value:
+                        keys.add(entry['key'])
+        except FileNotFoundError:
+            pass
+        return keys
+
+    def record(self, result: ProvisioningActionResult):
+        action = result.action
+        entry = {
+            'key': action.key(),
+            'timestamp_ms': int(time.time() * 1000),
+            'entity_type': action.entity_type.value,
+            'operation': action.operation.value,
+            'org_id': action.org_id,
+            'id': action.id,
+            'status': result.status.value,
+            'attempts': result.attempts,
+            'error': result.error,
+        }
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class ProvisioningEngine:
+    """
+    Provisions orgs, tenants and users from a desired-state manifest.
+
+    `plan()` compares the manifest with the current state (list_orgs, and list_tenants / list_users of every org of
+    the manifest) and returns the minimal set of actions: entities which don't exist are created, entities whose
+    fields (those set in the manifest) differ are updated, and with `delete_missing`, tenants and users of the orgs of
+    the manifest which are not in the manifest are deleted. Tenants and users are matched by (org, id). Orgs are never
+    deleted, and `delete_missing` requires the manifest to list its orgs, with the org of every tenant and user.
+
+    `apply()` runs the actions by phase (orgs, then tenants, then users, then deletes of users, then of tenants),
+    concurrently within a phase (`max_concurrent`), retrying failed calls with an exponential backoff. Actions
+    depending on an entity which couldn't be created are failed without being tried. With a `journal`, every action
+    is recorded, and actions which succeeded are skipped when the manifest is applied again.
+    """
+
+    def __init__(
+            self,
+            user: UserImpl,
+            max_concurrent: int = 16,
+            max_retries: int = 3,
+            retry_interval: float = 1.0,
+            backoff: float = 2.0,
+            journal: Optional[ProvisioningJournal] = None,
+            delete_missing: bool = False,
+            on_result: Optional[Callable[[ProvisioningActionResult], None]] = None,
+    ):
+        self.user = user
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.backoff = backoff
+        self.journal = journal
+        self.delete_missing = delete_missing
+        self.on_result = on_result
+
+    def plan(self, manifest: ProvisioningManifest) -> List[ProvisioningAction]:
+        if self.delete_missing:
+            _check_orgs_named(manifest)
+        orgs = {(None, o.id): o for o in self.user.list_orgs(ListOrganizationsRequest()).organizations}
+        # orgs whose tenants and users are compared (None: the org of the caller)
+        org_ids = list(dict.fromkeys(
+            [o.id for o in manifest.orgs] + [t.org_id for t in manifest.tenants] + [u.org_id for u in manifest.users]
+        ))
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            tenant_lists = list(executor.map(self._list_tenants, org_ids))
+            user_lists = list(executor.map(self._list_users, org_ids))
+        tenants = {(org_id, t.id): t for org_id, tenant_list in zip(org_ids, tenant_lists) for t in tenant_list}
+        users = {(org_id, u.id): u for org_id, user_list in zip(org_ids, user_lists) for u in user_list}
+
+        actions = []
+        actions += _diff(ProvisioningEntityType.ORG, {(None, o.id): o for o in manifest.orgs}, orgs, False)
+        actions += _diff(ProvisioningEntityType.TENANT, {(t.org_id, t.id): t for t in manifest.tenants}, tenants,
+                         self.delete_missing)
+        actions += _diff(ProvisioningEntityType.USER, {(u.org_id, u.id): u for u in manifest.users}, users,
+                         self.delete_missing)
+        # the caller is never deleted
+        caller, caller_org = self.user.http_client.userId, self.user.http_client.orgId
+        return [a for a in actions if not (a.entity_type == ProvisioningEntityType.USER
+                                           and a.operation == ProvisioningOperation.DELETE and a.id == caller
+                                           and (not caller_org or a.org_id == caller_org))]
+
+    def apply(self, manifest: Union[ProvisioningManifest, List[ProvisioningAction]]) -> ProvisioningResult:
+        actions = self.plan(manifest) if isinstance(manifest, ProvisioningManifest) else manifest
+        done = self.journal.succeeded() if self.journal is not None else set()
+        result = ProvisioningResult()
+        # (org id, id) of the orgs and tenants which couldn't be created
+        failed_ids: Dict[ProvisioningEntityType, Set[_EntityKey]] = {t: set() for t in ProvisioningEntityType}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            for entity_type, operations in _PHASES:
+                phase = [a for a in actions if a.entity_type == entity_type and a.operation in operations]
+                futures = []
+                for action in phase:
+                    if action.key() in done:
+                        self._report(result, ProvisioningActionResult(action=action,
+                                                                      status=ProvisioningActionStatus.SKIPPED))
+                        continue
+                    failed_dependency = _failed_dependency(action, failed_ids)
+                    if failed_dependency is not None:
+                        self._report(result, ProvisioningActionResult(
+                            action=action, status=ProvisioningActionStatus.FAILED, error=failed_dependency
+                        ))
+                        continue
+                    futures.append(executor.submit(self._run, action))
+                for future in futures:
+                    action_result = future.result()
+                    if action_result.status == ProvisioningActionStatus.FAILED \
+                            and action_result.action.operation == ProvisioningOperation.CREATE:
+                        failed_ids[entity_type].add((action_result.action.org_id, action_result.action.id))
+                    self._report(result, action_result)
+        return result
+
+    def _report(self, result: ProvisioningResult, action_result: ProvisioningActionResult):
+        result.results.append(action_result)
+        if self.journal is not None and action_result.status != ProvisioningActionStatus.SKIPPED:
+            self.journal.record(action_result)
+        if self.on_result is not None:
+            self.on_result(action_result)
+
+    def _run(self, action: ProvisioningAction) -> ProvisioningActionResult:
+        # the action which is called, a create turns into an update when the entity exists with other fields
+        call = action
+        interval = self.retry_interval
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                self._call(call)
+                return ProvisioningActionResult(action=action, status=ProvisioningActionStatus.SUCCEEDED,
+                                                attempts=attempt)
+            except Exception as e:
+                if call.operation == ProvisioningOperation.CREATE:
+                    # a previous attempt may have created it before failing (e.g. the response was lost), or it was
+                    # created concurrently: retrying the create would fail with "already exists"
+                    existing = self._find_existing(call)
+                    if existing is not None:
+                        if not _changed(call.entity, existing):
+                            return ProvisioningActionResult(action=action, status=ProvisioningActionStatus.SUCCEEDED,
+                                                            attempts=attempt)
+                        call = _update_action(call.entity_type, call.entity, existing, call.org_id)
+                if attempt > self.max_retries:
+                    return ProvisioningActionResult(action=action, status=ProvisioningActionStatus.FAILED,
+                                                    attempts=attempt, error=str(e))
+                time.sleep(interval)
+                interval *= self.backoff
+
+    def _call(self, action: ProvisioningAction):
+        entity_type, operation = action.entity_type, action.operation
+        if entity_type == ProvisioningEntityType.ORG:
+            if operation == ProvisioningOperation.CREATE:
+                self.user.create_org(CreateOrganizationRequest(organization=action.entity))
+            else:
+                self.user.update_org(UpdateOrganizationRequest(organization=action.entity))
+        elif entity_type == ProvisioningEntityType.TENANT:
+            if operation == ProvisioningOperation.CREATE:
+                self.user.create_tenant(CreateTenantRequest(tenant=action.entity))
+            elif operation == ProvisioningOperation.UPDATE:
+                self.user.update_tenant(UpdateTenantRequest(tenant=action.entity))
+            else:
+                self.user.delete_tenant(DeleteTenantRequest(id=action.id))
+        else:
+            if operation == ProvisioningOperation.CREATE:
+                self.user.create_user(CreateUserRequest(user=action.entity))
+            elif operation == ProvisioningOperation.UPDATE:
+                self.user.update_user(UpdateUserRequest(user=action.entity))
+            else:
+                self.user.delete_user(DeleteUserRequest(id=action.id))
+
+    def _find_existing(self, action: ProvisioningAction) -> Optional[WaiiBaseModel]:
+        """The entity of a create action as it exists on the server, None if it doesn't (or can't be listed)"""
+        try:
+            if action.entity_type == ProvisioningEntityType.ORG:
+                entities = self.user.list_orgs(ListOrganizationsRequest()).organizations
+            elif action.entity_type == ProvisioningEntityType.TENANT:
+                entities = self._list_tenants(action.entity.org_id)
+            else:
+                entities = self._list_users(action.entity.org_id)
+        except Exception:
+            return None
+        return next((entity for entity in entities or [] if entity.id == action.id), None)
+
+    def _list_tenants(self, org_id: Optional[str]) -> List[Tenant]:
+        return self.user.list_tenants(ListTenantsRequest(lookup_org_id=org_id)).tenants
+
+    def _list_users(self, org_id: Optional[str]) -> List[User]:
+        return self.user.list_users(ListUsersRequest(lookup_org_id=org_id)).users
+
+
+def _check_orgs_named(manifest: ProvisioningManifest):
+    # deleting what is missing from the manifest is only done in orgs the manifest explicitly owns, never in the org
+    # of the caller by default
+    named = {o.id for o in manifest.orgs}
+    if not named:
+        raise ValueError("delete_missing requires the manifest to list its orgs")
+    for entity in manifest.tenants + manifest.users:
+        if entity.org_id not in named:
+            raise ValueError(f"delete_missing requires the org of {entity.id} to be one of the orgs of the manifest, "
+                             f"got {entity.org_id}")
+
+
+def _diff(entity_type: ProvisioningEntityType, desired: Dict[_EntityKey, WaiiBaseModel],
+          current: Dict[_EntityKey, WaiiBaseModel], delete_missing: bool) -> List[ProvisioningAction]:
+    actions = []
+    for key, entity in desired.items():
+        existing = current.get(key)
+        if existing is None:
+            actions.append(ProvisioningAction(entity_type=entity_type, operation=ProvisioningOperation.CREATE,
+                                              org_id=key[0], id=entity.id, entity=entity))
+        elif _changed(entity, existing):
+            actions.append(_update_action(entity_type, entity, existing, key[0]))
+    if delete_missing:
+        for org_id, entity_id in current:
+            if (org_id, entity_id) not in desired:
+                actions.append(ProvisioningAction(entity_type=entity_type, operation=ProvisioningOperation.DELETE,
+                                                  org_id=org_id, id=entity_id))
+    return actions
+
+
+def _update_action(entity_type: ProvisioningEntityType, desired: WaiiBaseModel, current: WaiiBaseModel,
+                   org_id: Optional[str]) -> ProvisioningAction:
+    # fields not set in the manifest keep their current value
+    updated = current.copy(update={field: getattr(desired, field) for field in desired.__fields_set__})
+    return ProvisioningAction(entity_type=entity_type, operation=ProvisioningOperation.UPDATE, org_id=org_id,
+                              id=desired.id, entity=updated)
+
+
+def _changed(desired: WaiiBaseModel, current: WaiiBaseModel) -> bool:
+    for field in desired.__fields_set__:
+        wanted, value = getattr(desired, field), getattr(current, field, None)
+        if field == 'roles':
+            wanted, value = set(wanted or []), set(value or [])
+        if wanted != value:
+            return True
+    return False
+
+
+def _failed_dependency(action: ProvisioningAction,
+                       failed_ids: Dict[ProvisioningEntityType, Set[_EntityKey]]) -> Optional[str]:
+    entity = action.entity
+    org_id = getattr(entity, 'org_id', None)
+    if (None, org_id) in failed_ids[ProvisioningEntityType.ORG]:
+        return f"org {org_id} could not be created"
+    tenant_id = getattr(entity, 'tenant_id', None)
+    if (action.org_id, tenant_id) in failed_ids[ProvisioningEntityType.TENANT]:
+        return f"tenant {tenant_id} could not be created"
+    return None
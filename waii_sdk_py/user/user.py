@@ -14,13 +14,16 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
 
 from waii_sdk_py.common import CommonRequest, CommonResponse
 from waii_sdk_py.waii_http_client import WaiiHttpClient
 from ..my_pydantic import WaiiBaseModel
 from waii_sdk_py.utils import wrap_methods_with_async
 
+if TYPE_CHECKING:
+    from .provisioning import ProvisioningManifest, ProvisioningJournal, ProvisioningResult
+
 LIST_ACCESS_KEY_ENDPOINT = "list-access-keys"
 DELETE_ACCESS_KEY_ENDPOINT = "delete-access-keys"
 CREATE_KEY_ENDPOINT = "create-key"
@@ -255,6 +258,24 @@ class UserImpl:
     def list_orgs(self, params: ListOrganizationsRequest):
         return self.http_client.common_fetch(LIST_ORGS_ENDPOINT, params, ListOrganizationsResponse, need_scope=False)
 
+    def provision(
+            self,
+            manifest: "ProvisioningManifest",
+            max_concurrent: int = 16,
+            max_retries: int = 3,
+            journal: Optional["ProvisioningJournal"] = None,
+            delete_missing: bool = False,
+    ) -> "ProvisioningResult":
+        """
+        Bring the orgs, tenants and users to the state of the manifest, with the minimal set of creates, updates
+        (and deletes, with `delete_missing`), see ProvisioningEngine.
+        """
+        from .provisioning import ProvisioningEngine
+
+        engine = ProvisioningEngine(self, max_concurrent=max_concurrent, max_retries=max_retries, journal=journal,
+                                    delete_missing=delete_missing)
+        return engine.apply(manifest)
+
 
 class AsyncUserImpl:
     def __init__(self, http_client: WaiiHttpClient):
@@ -14,4 +14,8 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .utils import *
\ No newline at end of file
+from .utils import *
+from .poller import OperationPoller, ConcurrencyBudget
+from .cache import LRUCache
+from .json_stream import JsonObjectScanner, JsonArrayItems
+from .storage import atomic_write_text, SqliteDatabase
@@ -0,0 +1,88 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+_MISSING = object()
+
+
+class LRUCache(Generic[T]):
+    """
+    Thread-safe in-memory cache bounded by number of entries (least recently used are evicted first) and optionally
+    by age: entries older than `ttl_seconds` are treated as missing.
+    """
+
+    def __init__(
+            self,
+            max_entries: Optional[int] = 1024,
+            ttl_seconds: Optional[float] = None,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, T]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, default: Optional[T] = None) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            stored_at, value = entry
+            if self._expired(stored_at):
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: T):
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[T] = None) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+            if entry is _MISSING or self._expired(entry[0]):
+                return default
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter([k for k, (stored_at, _) in self._entries.items() if not self._expired(stored_at)])
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
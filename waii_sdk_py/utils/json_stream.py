@@ -0,0 +1,270 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+_Callback = Callable[[bytes], Any]
+
+# structural characters, at the top level of the object (member separators) and in nested values
+_TOP_LEVEL = re.compile(rb'["{}\[\],:]')
+_NESTED = re.compile(rb'["{}\[\]]')
+_STRING = re.compile(rb'["\\]')
+_STRING_LITERAL = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_NOT_BRACKETS = bytes(c for c in range(256) if c not in b'{}[]')
+
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+_OPENING = (ord('{'), ord('['))
+_CLOSING = (ord('}'), ord(']'))
+_COMMA, _COLON = ord(','), ord(':')
+
+
+class JsonObjectScanner:
+    """
+    Incremental scanner of a JSON object read in chunks (e.g. a large response body), which only materializes some
+    of its top-level members:
+    - `capture` members are parsed and available in `values` (members larger than `max_capture_bytes` of JSON are
+      skipped),
+    - `stream` members are passed as raw JSON bytes (without the surrounding whitespace), chunk by chunk, to their
+      callback, without being parsed. `stream` is either a dict of callbacks by member name, or a function of the
+      member name and the first byte of its value (e.g. b'[' for an array) returning the callback or None.
+
+    Other members are skipped. Memory use doesn't depend on the size of the object.
+    The input is assumed to be valid JSON, only its structure is checked.
+    """
+
+    def __init__(
+            self,
+            capture: Iterable[str] = (),
+            stream: Union[Dict[str, _Callback], Callable[[str, bytes], Optional[_Callback]], None] = None,
+            max_capture_bytes: int = 1 << 20,
+    ):
+        self.capture = set(capture)
+        self.stream = stream or {}
+        self.max_capture_bytes = max_capture_bytes
+        self.values: Dict[str, Any] = {}
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # raw parts of the top-level key being read
+        self._key_parts: Optional[List[bytes]] = None
+        # key read, waiting for ':'
+        self._key: Optional[str] = None
+        # member whose value is being read
+        self._member: Optional[str] = None
+        self._captured: Optional[List[bytes]] = None
+        self._captured_size = 0
+        # whitespace around the value of the member isn't passed on
+        self._value_started = False
+        self._whitespace = b''
+        self._callback: Optional[_Callback] = None
+
+    def feed(self, data: bytes):
+        pos, n = 0, len(data)
+        key_start = 0
+        value_start = 0
+        scanned_until = 0
+        while pos < n:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING.search(data, pos)
+                if match is None:
+                    break
+                pos = match.start()
+                if data[pos] == _BACKSLASH:
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    if self._key_parts is not None:
+                        self._key_parts.append(data[key_start:pos])
+                        self._key = json.loads(b'"' + b''.join(self._key_parts) + b'"')
+                        self._key_parts = None
+                pos += 1
+                continue
+
+            if self.done:
+                if data[pos:].strip():
+                    raise ValueError("Unexpected data after the JSON object")
+                break
+            if self._depth >= 2 and pos >= scanned_until:
+                # inside a nested value: skip the strings and balanced brackets of the data at once, unless the
+                # brackets may close the member (which is then scanned below)
+                outside_strings = _STRING_LITERAL.sub(b'', data[pos:])
+                # a quote left is the start of a string which doesn't end in the data (the rest of the data)
+                incomplete = outside_strings.find(b'"')
+                if incomplete < 0:
+                    end = n
+                else:
+                    end = n - (len(outside_strings) - incomplete)
+                    outside_strings = outside_strings[:incomplete]
+                brackets = _unmatched(outside_strings.translate(None, _NOT_BRACKETS))
+                closing = len(brackets) - len(brackets.lstrip(b'}]'))
+                if self._depth - closing >= 2:
+                    self._depth += len(brackets) - 2 * closing
+                    pos = end
+                    if pos < n:
+                        self._in_string = True
+                        pos += 1
+                    continue
+                scanned_until = end
+            match = (_TOP_LEVEL if self._depth <= 1 else _NESTED).search(data, pos)
+            if match is None:
+                break
+            pos = match.start()
+            c = data[pos]
+            if c == _QUOTE:
+                self._in_string = True
+                if self._depth == 1 and self._member is None and self._key is None:
+                    self._key_parts = []
+                    key_start = pos + 1
+            elif c in _OPENING:
+                if self._depth == 0 and c != _OPENING[0]:
+                    raise ValueError("Expected a JSON object")
+                self._depth += 1
+            elif c in _CLOSING:
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._member is not None:
+                        self._end_member(data[value_start:pos])
+                    self.done = True
+            elif self._depth == 1:
+                if c == _COMMA and self._member is not None:
+                    self._end_member(data[value_start:pos])
+                elif c == _COLON and self._key is not None:
+                    self._start_member()
+                    value_start = pos + 1
+            pos += 1
+
+        if self._key_parts is not None:
+            self._key_parts.append(data[key_start:])
+        if self._member is not None:
+            self._member_data(data[value_start:])
+
+    def close(self) -> Dict[str, Any]:
+        if not self.done:
+            raise ValueError("Incomplete JSON object")
+        return self.values
+
+    def _start_member(self):
+        self._member, self._key = self._key, None
+        self._value_started, self._whitespace = False, b''
+        if self._member in self.capture:
+            self._captured, self._captured_size = [], 0
+
+    def _member_data(self, data: bytes):
+        if not self._value_started:
+            data = data.lstrip()
+            if not data:
+                return
+            self._value_started = True
+            if callable(self.stream):
+                self._callback = self.stream(self._member, data[:1])
+            else:
+                self._callback = self.stream.get(self._member)
+        stripped = data.rstrip()
+        if not stripped:
+            self._whitespace += data
+            return
+        value = self._whitespace + stripped if self._whitespace else stripped
+        self._whitespace = data[len(stripped):]
+        self._emit(value)
+
+    def _emit(self, data: bytes):
+        if self._callback is not None:
+            self._callback(data)
+        if self._captured is not None:
+            self._captured_size += len(data)
+            if self._captured_size > self.max_capture_bytes:
+                self._captured = None
+            else:
+                self._captured.append(data)
+
+    def _end_member(self, data: bytes):
+        self._member_data(data)
+        if self._captured is not None:
+            self.values[self._member] = json.loads(b''.join(self._captured))
+        self._member, self._captured, self._callback = None, None, None
+
+
+def _unmatched(brackets: bytes) -> bytes:
+    """Brackets left once matching pairs are removed: closing brackets followed by opening ones"""
+    while True:
+        reduced = brackets.replace(b'{}', b'').replace(b'[]', b'')
+        if len(reduced) == len(brackets):
+            return reduced
+        brackets = reduced
+
+
+class JsonArrayItems:
+    """
+    Incremental parser of a JSON array read in chunks (e.g. the value of a member streamed by JsonObjectScanner):
+    every item is parsed and passed to `on_item` as soon as it is complete, so only one item is held in memory.
+    """
+
+    def __init__(self, on_item: Callable[[Any], Any]):
+        self.on_item = on_item
+        self.done = False
+        self._started = False
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+
+    def feed(self, data: bytes):
+        buffer = self._buffer + self._text.decode(data)
+        pos, n = _skip(buffer, 0, ' \t\r\n'), len(buffer)
+        if not self._started and pos < n:
+            if buffer[pos] != '[':
+                raise ValueError("Expected a JSON array")
+            self._started = True
+            pos += 1
+        while self._started and not self.done:
+            pos = _skip(buffer, pos, ' \t\r\n,')
+            if pos >= n:
+                break
+            if buffer[pos] == ']':
+                self.done = True
+                pos += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the item continues in the next data
+                break
+            if isinstance(item, (int, float)) and (end == n or buffer[end] not in ' \t\r\n,]'):
+                # so may a number
+                break
+            self.on_item(item)
+            pos = end
+        if self.done and buffer[pos:].strip():
+            raise ValueError("Unexpected data after the JSON array")
+        self._buffer = buffer[pos:]
+
+    def close(self):
+        if not self.done:
+            raise ValueError("Incomplete JSON array")
+
+
+def _skip(text: str, pos: int, characters: str) -> int:
+    n = len(text)
+    while pos < n and text[pos] in characters:
+        pos += 1
+    return pos
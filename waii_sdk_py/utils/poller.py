@@ -0,0 +1,165 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class OperationPoller(Generic[T]):
+    """
+    Polls many long-running operations (async chat, ingest jobs, semantic layer dumps, ...) from a single loop.
+
+    Each operation is registered with a `check` callable returning its current status. Every round, all pending checks
+    run concurrently (bounded by `max_workers`), finished operations are yielded by `poll()` as soon as they are
+    detected, and the interval between rounds backs off from `poll_interval` up to `max_poll_interval`.
+
+    Operations can be added while `poll()` is being iterated, they are picked up in the next round.
+    """
+
+    def __init__(
+            self,
+            is_done: Callable[[T], bool],
+            poll_interval: float = 1.0,
+            max_poll_interval: float = 5.0,
+            backoff: float = 1.5,
+            max_workers: int = 8,
+            on_update: Optional[Callable[[Hashable, T], None]] = None,
+    ):
+        self.is_done = is_done
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.on_update = on_update
+        self._pending: Dict[Hashable, Callable[[], T]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: Hashable, check: Callable[[], T]):
+        with self._lock:
+            self._pending[key] = check
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def poll(self, timeout: Optional[float] = None) -> Iterator[Tuple[Hashable, T]]:
+        """
+        Yield (key, status) for every operation once `is_done(status)` is true, in completion order.
+
+        Raises TimeoutError if operations are still pending after `timeout` seconds. Closing the iterator stops polling,
+        the operations which are still pending stay registered.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        interval = self.poll_interval
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                with self._lock:
+                    checks = list(self._pending.items())
+                if not checks:
+                    return
+
+                futures = {executor.submit(check): key for key, check in checks}
+                progressed = False
+                for future in as_completed(futures):
+                    key = futures[future]
+                    status = future.result()
+                    if self.on_update:
+                        self.on_update(key, status)
+                    if self.is_done(status):
+                        progressed = True
+                        self.remove(key)
+                        yield key, status
+
+                if not self.pending:
+                    return
+                if deadline is not None and time.time() >= deadline:
+                    raise TimeoutError(f"Operations are still pending after {timeout} seconds: {list(self._pending.keys())}")
+
+                # reset the interval when something finished, new operations may have been added in the meantime
+                interval = self.poll_interval if progressed else min(interval * self.backoff, self.max_poll_interval)
+                if deadline is not None:
+                    interval = max(0.0, min(interval, deadline - time.time()))
+                time.sleep(interval)
+
+
+class ConcurrencyBudget:
+    """
+    Limits the number of operations in flight. `shared(key, limit)` returns the budget registered for `key` (e.g. a
+    tenant), so that concurrent batches of the same tenant draw from the same budget; the latest limit wins. A shared
+    budget is dropped once nothing references it anymore.
+    """
+
+    _shared: "weakref.WeakValueDictionary[Hashable, ConcurrencyBudget]" = weakref.WeakValueDictionary()
+    _shared_lock = threading.Lock()
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        self.limit = limit
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    @classmethod
+    def shared(cls, key: Hashable, limit: int) -> "ConcurrencyBudget":
+        with cls._shared_lock:
+            budget = cls._shared.get(key)
+            if budget is None:
+                budget = cls._shared[key] = ConcurrencyBudget(limit)
+        budget.set_limit(limit)
+        return budget
+
+    def set_limit(self, limit: int):
+        with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+    def acquire(
+            self, blocking: bool = True, timeout: Optional[float] = None, cancelled: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Take a slot. Returns False when none is free (not `blocking`, or after `timeout` seconds), or when `cancelled`
+        is set: call wake() after setting it to stop the wait.
+        """
+        is_cancelled = cancelled.is_set if cancelled is not None else lambda: False
+        with self._condition:
+            if not blocking:
+                if self.in_flight >= self.limit or is_cancelled():
+                    return False
+            elif not self._condition.wait_for(lambda: self.in_flight < self.limit or is_cancelled(), timeout) \
+                    or is_cancelled():
+                return False
+            self.in_flight += 1
+            return True
+
+    def wake(self):
+        """Wakes up all the acquire() calls waiting for a slot, so they check their `cancelled` event"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
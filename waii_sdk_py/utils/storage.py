@@ -0,0 +1,66 @@
+"""
+Copyright 2023–2025 Waii, Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+def atomic_write_text(path: str, text: str, prefix: str = '.tmp-'):
+    """
+    Write a text file atomically: the text goes to a temporary file of the same directory, which then replaces `path`,
+    so readers (and a later run after a crash) see either the previous or the new content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=prefix)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class SqliteDatabase:
+    """
+    SQLite connection shared by the threads of a store: statements are serialized by a lock, and every `execute` runs
+    in its own transaction
+    """
+
+    def __init__(self, path: str = ":memory:", schema: Sequence[str] = ()):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        for statement in schema:
+            self.execute(statement)
+
+    def execute(self, sql: str, parameters: Sequence[Any] = ()):
+        with self._lock, self._connection:
+            self._connection.execute(sql, parameters)
+
+    def fetchone(self, sql: str, parameters: Sequence[Any] = ()) -> Optional[Tuple]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchone()
+
+    def fetchall(self, sql: str, parameters: Sequence[Any] = ()) -> List[Tuple]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -17,7 +17,7 @@ limitations under the License.
 import asyncio
 import functools
 import inspect
-from typing import TypeVar, Callable, Awaitable, Any
+from typing import TypeVar, Callable, Awaitable, Any, Iterator, AsyncIterator
 
 from typing_extensions import ParamSpec
 
@@ -33,8 +33,40 @@ def to_async(func: Callable[P, T]) -> Callable[P, Awaitable[T]]:
     return wrapper
 
 
+def to_async_iterator(func: Callable[P, Iterator[T]]) -> Callable[P, AsyncIterator[T]]:
+    """Decorator to convert a sync generator method to an async iterator, each step runs in the executor"""
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> AsyncIterator[T]:
+        loop = asyncio.get_event_loop()
+        iterator = func(*args, **kwargs)
+        done = object()
+        try:
+            while True:
+                item = await loop.run_in_executor(None, next, iterator, done)
+                if item is done:
+                    break
+                yield item
+        finally:
+            await loop.run_in_executor(None, _close_iterator, iterator)
+    return wrapper
+
+
+def _close_iterator(iterator):
+    try:
+        iterator.close()
+    except ValueError:
+        # the generator is still running in the executor (the consumer was cancelled), it cannot be closed now
+        pass
+
+
 def wrap_methods_with_async(source_class, target_class):
     for name, method in inspect.getmembers(source_class, predicate=callable):
+        # methods implemented by the async class itself are kept
+        if hasattr(type(target_class), name):
+            continue
         if not name.startswith('_') and inspect.isroutine(method):
-            async_method = to_async(getattr(source_class, name))
+            if inspect.isgeneratorfunction(method):
+                async_method = to_async_iterator(getattr(source_class, name))
+            else:
+                async_method = to_async(getattr(source_class, name))
             setattr(target_class, name, async_method)
@@ -14,9 +14,10 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import hashlib
 import requests
 import json
-from typing import TypeVar, Generic, Optional, Dict, Union, Any
+from typing import TypeVar, Generic, Optional, Dict, Union, Any, Iterable, Tuple
 from collections import namedtuple
 from ..my_pydantic import WaiiBaseModel
 
@@ -58,6 +59,16 @@ class WaiiHttpClient(Generic[T]):
     def set_impersonate_user_id(self, userId: str):
         self.impersonateUserId = userId
 
+    def context_key(self, include_scope: bool = True) -> Tuple[str, ...]:
+        """
+        Identifies what the requests of this client are answered for: server, api key, scope (unless `include_scope`
+        is false), org, user and impersonated user. Used to keep client side caches apart, the api key is hashed so
+        that it is not kept in them.
+        """
+        api_key_hash = hashlib.sha256((self.apiKey or '').encode('utf-8')).hexdigest()
+        scope = self.scope if include_scope else None
+        return self.url, api_key_hash, scope, self.orgId, self.userId, self.impersonateUserId
+
     def common_fetch(
             self, 
             endpoint: str,
@@ -66,33 +77,111 @@ class WaiiHttpClient(Generic[T]):
             need_scope: bool = True,
             ret_json: bool = False
         ) -> Optional[T]:
+        params = self._prepare_params(req, need_scope)
+        headers = self._get_headers()
+
+        if self.verbose:
+            # print cUrl equivalent
+            print("calling endpoint: ", endpoint)
+            print(f"curl -X POST '{self.url + endpoint}' -H 'Content-Type: application/json' -H 'Authorization: Bearer {self.apiKey}' -d '{json.dumps(params, default=vars)}'")
+
+        response = requests.post(self.url + endpoint, headers=headers, data=json.dumps(params, default=vars), timeout=self.timeout/1000)  # timeout is in seconds
+
+        return self._parse_response(response, cls, ret_json)
+
+    def common_fetch_streamed(
+            self,
+            endpoint: str,
+            req: Union[Union[WaiiBaseModel, dict[str, Any]]],
+            stream_field: str,
+            chunks: Iterable[str],
+            cls: WaiiBaseModel = None,
+            need_scope: bool = True
+        ) -> Optional[T]:
+        """
+        Same as common_fetch, but the value of `stream_field` is produced by `chunks` while the request body is being
+        sent (chunked transfer encoding), so the full value never has to be held in memory.
+
+        Every chunk must already be escaped for use inside a JSON string (e.g. base64 text).
+        """
+        # the request is serialized from a copy, the caller's request is left as it is
+        if isinstance(req, WaiiBaseModel):
+            req.check_extra_fields()
+            req = req.dict()
+        params = self._prepare_params(dict(req), need_scope)
+        params.pop(stream_field, None)
+        head = json.dumps(params, default=vars)
+        # open the streamed string field as the last member of the JSON object
+        head = head[:-1] + (', ' if params else '') + json.dumps(stream_field) + ': "'
+
+        def body():
+            yield head.encode('utf-8')
+            for chunk in chunks:
+                if chunk:
+                    yield chunk.encode('utf-8')
+            yield b'"}'
+
+        if self.verbose:
+            print("calling endpoint (streamed body): ", endpoint)
+
+        response = requests.post(self.url + endpoint, headers=self._get_headers(), data=body(), timeout=self.timeout/1000)  # timeout is in seconds
+
+        return self._parse_response(response, cls, False)
+
+    def common_stream(
+            self,
+            endpoint: str,
+            req: Union[Union[WaiiBaseModel, dict[str, Any]]],
+            need_scope: bool = True,
+            headers: Optional[Dict[str, str]] = None
+        ) -> requests.Response:
+        """
+        Send the request and return the response as soon as the headers are received, the body is read by the caller
+        (e.g. response.iter_content() for large downloads).
+
+        The caller must close the response.
+        """
+        params = self._prepare_params(req, need_scope)
+        all_headers = self._get_headers()
+        if headers:
+            all_headers.update(headers)
+
+        if self.verbose:
+            print("calling endpoint (streamed response): ", endpoint)
+
+        response = requests.post(self.url + endpoint, headers=all_headers, data=json.dumps(params, default=vars), timeout=self.timeout/1000, stream=True)  # timeout is in seconds
+        if response.status_code not in (200, 206):
+            try:
+                self._parse_response(response)
+            finally:
+                response.close()
+        return response
+
+    def _prepare_params(self, req: Union[WaiiBaseModel, dict[str, Any]], need_scope: bool) -> dict[str, Any]:
         # check to ensure no additional fields are passed
         if isinstance(req, WaiiBaseModel):
             req.check_extra_fields()
             params = req.__dict__
         else:
             params = req
-        
+
         if need_scope:
             if not self.scope or self.scope.strip() == '':
                 raise Exception("You need to activate connection first, use `WAII.Database.activate_connection(...)`")
             params['scope'] = self.scope
         params['org_id'] = self.orgId
         params['user_id'] = self.userId
+        return params
 
+    def _get_headers(self) -> Dict[str, str]:
         headers = {'Content-Type': 'application/json'}
         if self.apiKey:
             headers['Authorization'] = f'Bearer {self.apiKey}'
         if self.impersonateUserId:
             headers['x-waii-impersonate-user'] = self.impersonateUserId
+        return headers
 
-        if self.verbose:
-            # print cUrl equivalent
-            print("calling endpoint: ", endpoint)
-            print(f"curl -X POST '{self.url + endpoint}' -H 'Content-Type: application/json' -H 'Authorization: Bearer {self.apiKey}' -d '{json.dumps(params, default=vars)}'")
-
-        response = requests.post(self.url + endpoint, headers=headers, data=json.dumps(params, default=vars), timeout=self.timeout/1000)  # timeout is in seconds
-
+    def _parse_response(self, response, cls: WaiiBaseModel = None, ret_json: bool = False) -> Optional[T]:
         if response.status_code != 200:
             try:
                 print(response)